@@ -0,0 +1,69 @@
+"""
+Compare two benchmark results of `run_benchmarks.py`, for example of two commits.
+
+The median time of every benchmark (with the same parameters) in both files is compared,
+a benchmark that got slower by more than the threshold is a regression::
+
+    python benchmarks/compare_benchmarks.py before.json after.json --threshold 0.1 --fail-on-regression
+"""
+
+from typing import Dict, Tuple
+import argparse
+import json
+import sys
+
+Key = Tuple[str, str]
+
+
+def load_results(filename: str) -> Tuple[dict, Dict[Key, dict]]:
+    """Load a results file, returns the meta information and the results by benchmark name and parameters."""
+    with open(filename) as file:
+        report = json.load(file)
+    results = {(result['benchmark'], json.dumps(result['params'], sort_keys=True)): result for result in report['results']}
+    return report['meta'], results
+
+
+def compare(before_filename: str, after_filename: str, threshold: float = 0.1) -> int:
+    """
+    Print the comparison of two results files.
+
+    :param before_filename: results to compare against
+    :param after_filename: new results
+    :param threshold: relative change in the median time that counts as a regression or an improvement
+    :return: the number of regressions
+    """
+    before_meta, before = load_results(before_filename)
+    after_meta, after = load_results(after_filename)
+    print(f"before: {before_meta.get('commit')}{' (dirty)' if before_meta.get('dirty') else ''}")
+    print(f"after:  {after_meta.get('commit')}{' (dirty)' if after_meta.get('dirty') else ''}")
+    print(f"{'benchmark':<15} {'params':<80} {'before ms':>10} {'after ms':>10} {'ratio':>7}")
+
+    regressions = 0
+    for key in sorted(set(before) & set(after)):
+        old, new = before[key]['median'], after[key]['median']
+        ratio = new / old if old > 0 else float('inf')
+        if ratio > 1 + threshold:
+            regressions += 1
+            verdict = 'slower'
+        elif ratio < 1 - threshold:
+            verdict = 'faster'
+        else:
+            verdict = ''
+        print(f"{key[0]:<15} {key[1]:<80} {old * 1000:10.3f} {new * 1000:10.3f} {ratio:7.2f} {verdict}")
+
+    for key in sorted(set(before) ^ set(after)):
+        print(f"{key[0]:<15} {key[1]:<80} only in {'before' if key in before else 'after'}")
+    print(f"{regressions} regression(s) of more than {threshold:.0%}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare two benchmark results.")
+    parser.add_argument('before', type=str, help="results to compare against")
+    parser.add_argument('after', type=str, help="new results")
+    parser.add_argument('--threshold', '-t', type=float, default=0.1, help="relative change that counts, 0.1 is 10%%")
+    parser.add_argument('--fail-on-regression', action='store_true', help="exit with status 1 when there's a regression")
+    args = parser.parse_args()
+
+    n_regressions = compare(args.before, args.after, args.threshold)
+    sys.exit(1 if n_regressions and args.fail_on_regression else 0)
@@ -0,0 +1,403 @@
+"""
+Benchmarks of the hot paths of the simulation, to find performance regressions between commits.
+
+Every benchmark runs over a grid of parameters (maze size, number of runners, ...) with fixed seeds,
+the results are written as JSON that `compare_benchmarks.py` can compare::
+
+    python benchmarks/run_benchmarks.py --output before.json
+    git checkout other-branch
+    python benchmarks/run_benchmarks.py --output after.json
+    python benchmarks/compare_benchmarks.py before.json after.json
+
+Use `--quick` for a smaller grid and `--filter` to run only the benchmarks with a name that contains the given text.
+
+The script runs on older versions of the simulation as well, a benchmark (or a combination of its parameters)
+that needs something the checked out version doesn't have is skipped and left out of the results.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+from collections import deque
+from itertools import product
+from pathlib import Path
+from statistics import mean, median
+from time import perf_counter
+import argparse
+import datetime
+import importlib
+import inspect
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mazerunner_sim.envs import MazeRunnerEnv, Runner  # noqa: E402
+from mazerunner_sim.envs.maze_generator import generate_maze  # noqa: E402
+from mazerunner_sim.envs.visualisation import maze_render  # noqa: E402
+from mazerunner_sim.envs.visualisation.maze_render import render_agent_in_step  # noqa: E402
+from mazerunner_sim.policies import LeafTrackerPolicy, PathFindingPolicy, PureRandomPolicy  # noqa: E402
+from mazerunner_sim.utils.batch_runner import BatchRunner  # noqa: E402
+from mazerunner_sim.utils.observation_and_action import Action  # noqa: E402
+from mazerunner_sim.utils.pathfinder import compute_explore_paths, paths_origin_targets  # noqa: E402
+
+
+def optional_import(module: str, name: str) -> Any:
+    """Import something that not every version of the simulation has, None when the checked out version doesn't have it."""
+    try:
+        return getattr(importlib.import_module(module), name)
+    except (ImportError, AttributeError):
+        return None
+
+
+generate_maze_fast = optional_import('mazerunner_sim.envs.maze_generator', 'generate_maze_fast')
+IncrementalRenderer = optional_import('mazerunner_sim.envs.visualisation.maze_render', 'IncrementalRenderer')
+HeuristicPolicy = optional_import('mazerunner_sim.policies', 'HeuristicPolicy')
+auction = optional_import('mazerunner_sim.utils.auction', 'auction')
+worth_matrix = optional_import('mazerunner_sim.utils.auction', 'worth_matrix')
+
+# Older versions point at the textures through the file of the module, which only resolves on Windows
+if not os.path.isdir(maze_render.textures_path):
+    maze_render.textures_path = Path(maze_render.__file__).parent / 'textures'
+
+SCHEMA_VERSION = 1
+SEED = 0
+
+# A benchmark gets its parameters and how many operations to time, it returns the seconds it took and the operations done
+Benchmark = Callable[..., Tuple[float, int]]
+BENCHMARKS: Dict[str, Tuple[Benchmark, Dict[str, tuple], Dict[str, tuple], int]] = {}
+
+POLICIES = {'PureRandomPolicy': PureRandomPolicy, 'PathFindingPolicy': PathFindingPolicy, 'LeafTrackerPolicy': LeafTrackerPolicy,
+            'HeuristicPolicy': HeuristicPolicy}
+# The parameters of `MazeRunnerEnv` of the checked out version
+ENV_PARAMETERS = inspect.signature(MazeRunnerEnv).parameters
+
+
+class Unavailable(Exception):
+    """A benchmark needs something the checked out version of the simulation doesn't have."""
+
+
+def require(**features) -> None:
+    """Skip the benchmark when one of the given features is missing (None or False)."""
+    missing = [name for name, feature in features.items() if feature is None or feature is False]
+    if missing:
+        raise Unavailable(', '.join(missing))
+
+
+def benchmark(name: str, grid: Dict[str, tuple], quick_grid: Dict[str, tuple], number: int):
+    """
+    Register a benchmark.
+
+    :param name: name of the benchmark in the results
+    :param grid: the values of every parameter, the benchmark runs for every combination
+    :param quick_grid: the grid for a quick run
+    :param number: number of operations to time in every repeat
+    """
+    def register(function: Benchmark) -> Benchmark:
+        BENCHMARKS[name] = function, grid, quick_grid, number
+        return function
+    return register
+
+
+def seed_everything(seed: int = SEED) -> None:
+    """Seed the random generators the simulation uses."""
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def make_env(maze_size: int, runners: int, day_length: int = 30, headless: bool = True) -> MazeRunnerEnv:
+    """Make an environment with a maze from the fixed seed, the maze is the same for every version of the simulation."""
+    seed_everything()
+    options = {'headless': headless} if 'headless' in ENV_PARAMETERS else {}
+    return MazeRunnerEnv([Runner(action_speed=0) for _ in range(runners)], maze_size=maze_size, day_length=day_length, **options)
+
+
+def random_walk(env: MazeRunnerEnv, steps: int, rng: np.random.Generator) -> None:
+    """Let the runners of the environment walk randomly, without nights."""
+    for _ in range(steps):
+        if env.time % env.day_length == 0:
+            env.time += 1
+        env.step({i: Action(int(rng.integers(0, 4)), []) for i in range(len(env.runners))})
+
+
+@benchmark('env_step', grid={'maze_size': (8, 16, 32), 'runners': (1, 4, 16), 'phase': ('day', 'night')},
+           quick_grid={'maze_size': (8, 16), 'runners': (1, 4), 'phase': ('day', 'night')}, number=200)
+def bench_env_step(maze_size: int, runners: int, phase: str, number: int) -> Tuple[float, int]:
+    """Time `MazeRunnerEnv.step` for day or night ticks, the runners walk randomly during the day and stay at night."""
+    env = make_env(maze_size, runners, day_length=10 ** 6)
+    env.get_observations(first_observation=True)
+    rng = np.random.default_rng(SEED)
+    seconds = 0.
+    for step in range(number):
+        if phase == 'night':
+            env.time = env.day_length * (step + 1)
+            actions = {i: Action(Action.STAY, [1.] * len(env.tasks)) for i in range(runners)}
+        else:
+            # Skip the night at time 0
+            env.time += env.time % env.day_length == 0
+            actions = {i: Action(int(rng.integers(0, 4)), []) for i in range(runners)}
+        start = perf_counter()
+        env.step(actions)
+        seconds += perf_counter() - start
+    return seconds, number
+
+
+@benchmark('generate_maze', grid={'maze_size': (8, 16, 32, 64), 'generator': ('generate_maze', 'generate_maze_fast')},
+           quick_grid={'maze_size': (8, 16), 'generator': ('generate_maze', 'generate_maze_fast')}, number=10)
+def bench_generate_maze(maze_size: int, generator: str, number: int) -> Tuple[float, int]:
+    """Time generating a maze."""
+    if generator == 'generate_maze_fast':
+        require(generate_maze_fast=generate_maze_fast)
+    seed_everything()
+    rng = np.random.default_rng(SEED)
+    start = perf_counter()
+    for _ in range(number):
+        if generator == 'generate_maze':
+            generate_maze(maze_size)
+        else:
+            generate_maze_fast(maze_size, rng=rng)
+    return perf_counter() - start, number
+
+
+@benchmark('auction', grid={'runners': (4, 16, 64, 256)}, quick_grid={'runners': (4, 64)}, number=20)
+def bench_auction(runners: int, number: int) -> Tuple[float, int]:
+    """Time the night-time task auction, with two tasks per runner and worths that are alike for all runners."""
+    require(auction=auction, worth_matrix=worth_matrix)
+    rng = np.random.default_rng(SEED)
+    task_worths = (rng.random(2 * runners) + 0.1 * rng.random((runners, 2 * runners))).tolist()
+    start = perf_counter()
+    for _ in range(number):
+        auction(worth_matrix(task_worths, 2 * runners))
+    return perf_counter() - start, number
+
+
+def breadth_first_order(maze: np.array, origin: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """Get the open tiles that can be reached from the origin (x, y), in breadth-first order starting with the origin."""
+    height, width = maze.shape
+    order, visited, queue = [], {origin}, deque([origin])
+    while queue:
+        x, y = queue.popleft()
+        order.append((x, y))
+        for tile in ((x, y - 1), (x - 1, y), (x + 1, y), (x, y + 1)):
+            if 0 <= tile[0] < width and 0 <= tile[1] < height and maze[tile[1], tile[0]] and tile not in visited:
+                visited.add(tile)
+                queue.append(tile)
+    return order
+
+
+def known_part_of_maze(maze_size: int, known_fraction: float) -> Tuple[np.array, np.array, Tuple[int, int]]:
+    """Get the known maze and explored map of a runner that explored a fraction of the maze, from the center outwards."""
+    seed_everything()
+    maze, _, _ = generate_maze(maze_size)
+    center = (maze.shape[1] // 2, maze.shape[0] // 2)
+    reached = breadth_first_order(maze, center)
+    seen = np.zeros(maze.shape, dtype=bool)
+    for x, y in reached[:max(int(len(reached) * known_fraction), 1)]:
+        seen[y, x] = True
+    # Every seen tile was seen with the 3x3 block around it
+    padded = np.pad(seen, 1)
+    explored = np.logical_or.reduce([padded[dy:dy + maze.shape[0], dx:dx + maze.shape[1]] for dy in range(3) for dx in range(3)])
+    return np.logical_and(maze, explored), explored, center
+
+
+EXPLORE_FUNCTIONS = ('compute_explore_paths', 'paths_origin_targets')
+
+
+@benchmark('explore_paths', grid={'maze_size': (16, 32), 'known_fraction': (0.25, 0.5, 1.), 'function': EXPLORE_FUNCTIONS},
+           quick_grid={'maze_size': (16,), 'known_fraction': (0.25, 1.), 'function': EXPLORE_FUNCTIONS}, number=20)
+def bench_explore_paths(maze_size: int, known_fraction: float, function: str, number: int) -> Tuple[float, int]:
+    """Time the path finding on a known maze that grows from the center, `paths_origin_targets` gets 16 targets."""
+    known_maze, explored, center = known_part_of_maze(maze_size, known_fraction)
+    reached = breadth_first_order(known_maze, center)[1:]
+    targets = reached[::max(len(reached) // 16, 1)][:16]
+    start = perf_counter()
+    for _ in range(number):
+        if function == 'compute_explore_paths':
+            compute_explore_paths(center, known_maze, explored)
+        else:
+            paths_origin_targets(center, targets, known_maze)
+    return perf_counter() - start, number
+
+
+@benchmark('decide_action', grid={'policy': tuple(POLICIES), 'maze_size': (8, 16), 'runners': (1, 4)},
+           quick_grid={'policy': tuple(POLICIES), 'maze_size': (8,), 'runners': (4,)}, number=200)
+def bench_decide_action(policy: str, maze_size: int, runners: int, number: int) -> Tuple[float, int]:
+    """Time the `decide_action` of a policy during an episode, per decision, the episode starts over when it's done."""
+    require(**{policy: POLICIES[policy]})
+    env = make_env(maze_size, runners)
+    policies = [POLICIES[policy]() for _ in range(runners)]
+    observations = env.get_observations(first_observation=True)
+    seconds, decisions = 0., 0
+    for _ in range(number):
+        start = perf_counter()
+        actions = {i: policies[i].decide_action(observation) for i, observation in observations.items()}
+        seconds += perf_counter() - start
+        decisions += len(actions)
+        observations, _, done, _ = env.step(actions)
+        if done:
+            env.reset()
+            for p in policies:
+                p.reset()
+            observations = env.get_observations(first_observation=True)
+    return seconds, decisions
+
+
+@benchmark('render', grid={'maze_size': (8, 16, 32), 'follow_runner_id': (None, 0), 'renderer': ('render_agent_in_step', 'incremental')},
+           quick_grid={'maze_size': (8, 16), 'follow_runner_id': (None, 0), 'renderer': ('render_agent_in_step', 'incremental')},
+           number=20)
+def bench_render(maze_size: int, follow_runner_id, renderer: str, number: int) -> Tuple[float, int]:
+    """Time rendering a frame after every step of runners walking randomly."""
+    if renderer == 'incremental':
+        require(IncrementalRenderer=IncrementalRenderer)
+    env = make_env(maze_size, 4, day_length=10 ** 6, headless=False)
+    env.rendered_background
+    rng = np.random.default_rng(SEED)
+    incremental = IncrementalRenderer(env) if renderer == 'incremental' else None
+    if incremental is not None:
+        incremental.render(follow_runner_id)
+    seconds = 0.
+    for _ in range(number):
+        random_walk(env, 1, rng)
+        start = perf_counter()
+        if incremental is None:
+            render_agent_in_step(env, follow_runner_id)
+        else:
+            incremental.render(follow_runner_id)
+        seconds += perf_counter() - start
+    return seconds, number
+
+
+class BenchmarkBatch(BatchRunner):
+    """Batch that only keeps the time an episode took."""
+
+    @staticmethod
+    def update(env: MazeRunnerEnv, data):
+        """Nothing to keep track of during the episode."""
+        return None
+
+    @staticmethod
+    def finish(env: MazeRunnerEnv, data) -> dict:
+        """Keep the time the episode took."""
+        return {'time': env.time}
+
+
+@benchmark('batch_runner', grid={'maze_size': (8, 16), 'runners': (2, 4), 'mode': ('serial', 'pool', 'threads')},
+           quick_grid={'maze_size': (8,), 'runners': (2,), 'mode': ('serial', 'pool', 'threads')}, number=16)
+def bench_batch_runner(maze_size: int, runners: int, mode: str, number: int) -> Tuple[float, int]:
+    """
+    Time running episodes of path finding runners, per episode.
+
+    The modes run them one after the other with `_run_single`, on a process pool with `run_batch`,
+    or on a thread pool with `run_batch_in_threads`.
+
+    The days are long enough for the runners to find the exit, so the episodes don't last a whole year.
+    """
+    if mode == 'threads':
+        require(run_batch_in_threads=hasattr(BatchRunner, 'run_batch_in_threads'))
+    day_length = 10 * maze_size
+    env = make_env(maze_size, runners, day_length)
+    policies = [PathFindingPolicy() for _ in range(runners)]
+    with tempfile.TemporaryDirectory() as directory:
+        batch = BenchmarkBatch(os.path.join(directory, 'results.feather'))
+        start = perf_counter()
+        if mode == 'serial':
+            for seed in range(number):
+                episode_env = make_env(maze_size, runners, day_length)
+                for p in policies:
+                    p.reset()
+                BenchmarkBatch._run_single((episode_env, policies, seed))
+        elif mode == 'pool':
+            batch.run_batch([env], policies, number)
+        else:
+            batch.run_batch_in_threads([env], policies, number)
+        return perf_counter() - start, number
+
+
+def parameter_grid(grid: Dict[str, tuple]) -> Iterable[dict]:
+    """Get every combination of the parameters of a grid."""
+    names = list(grid)
+    for values in product(*(grid[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def git_commit() -> Tuple[str, bool]:
+    """Get the commit the benchmarks run on, and whether there are uncommitted changes."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root, capture_output=True, text=True,
+                                check=True).stdout
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+
+
+def run_benchmarks(name_filter: str = '', quick: bool = False, repeat: int = 5) -> dict:
+    """
+    Run the benchmarks.
+
+    :param name_filter: only run the benchmarks with a name that contains this text
+    :param quick: run the quick grid with less repeats
+    :param repeat: number of times every benchmark is timed, the median is the main result
+    :return: the results, as they're written to the JSON file
+    """
+    commit, dirty = git_commit()
+    results: List[dict] = []
+    for name, (function, grid, quick_grid, number) in BENCHMARKS.items():
+        if name_filter not in name:
+            continue
+        for params in parameter_grid(quick_grid if quick else grid):
+            samples = []
+            try:
+                for _ in range(repeat):
+                    seconds, operations = function(number=number, **params)
+                    samples.append(seconds / max(operations, 1))
+            except Unavailable as missing:
+                print(f"{name:<15} {json.dumps(params):<80} skipped, needs {missing}", file=sys.stderr)
+                continue
+            results.append({
+                'benchmark': name,
+                'params': params,
+                'unit': 'seconds per operation',
+                'repeat': repeat,
+                'min': min(samples),
+                'median': median(samples),
+                'mean': mean(samples),
+                'operations_per_second': 1 / median(samples) if median(samples) > 0 else None,
+            })
+            print(f"{name:<15} {json.dumps(params):<80} {median(samples) * 1000:10.3f} ms", file=sys.stderr)
+
+    return {
+        'schema': SCHEMA_VERSION,
+        'meta': {
+            'commit': commit,
+            'dirty': dirty,
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'quick': quick,
+            'seed': SEED,
+        },
+        'results': results,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the benchmarks and write the results as JSON.")
+    parser.add_argument('--output', '-o', type=str, default='benchmark_results.json', help="JSON file to write the results to")
+    parser.add_argument('--filter', '-f', type=str, default='', help="only run the benchmarks with a name that contains this")
+    parser.add_argument('--quick', '-q', action='store_true', help="run a smaller grid, with less repeats")
+    parser.add_argument('--repeat', '-r', type=int, default=None, help="number of times to time every benchmark")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.filter, args.quick, args.repeat or (2 if args.quick else 5))
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {len(report['results'])} results to {args.output}", file=sys.stderr)
@@ -9,6 +9,9 @@ from mazerunner_sim.policies import PathFindingPolicy, PureRandomPolicy, LeafTra
 class CustomBatchRunner(BatchRunner):
     """Custom batch runner."""
 
+    # The explored maps of every time-step are recorded bit-packed, instead of as python lists
+    trajectory_columns = ('alive', 'explored')
+
     def __init__(self, filename: str):
         """
         Initialize the batch.
@@ -23,9 +26,7 @@ class CustomBatchRunner(BatchRunner):
         :param env: Mazeenvironment.
         :param data: data that have been generated from a simulation
         """
-        n_alive = sum([r.alive for r in env.runners])
-        explored = [r.explored.tolist() for r in env.runners]
-        return {'time': env.time, 'n_alive': n_alive, 'explored': explored}
+        return data
 
     @staticmethod
     def finish(env: MazeRunnerEnv, data: HiddenState) -> dict:
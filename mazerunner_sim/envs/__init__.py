@@ -1,2 +1,4 @@
 from mazerunner_sim.envs.mazerunner_env import MazeRunnerEnv
 from mazerunner_sim.envs.agents.runner import Runner
+from mazerunner_sim.envs.vector_mazerunner_env import VectorMazeRunnerEnv
+from mazerunner_sim.envs.maze_corpus import MazeCorpus
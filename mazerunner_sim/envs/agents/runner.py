@@ -4,27 +4,41 @@ from typing import Tuple
 
 import numpy as np
 
+from mazerunner_sim.utils import bitboard
+from mazerunner_sim.utils.distance_oracle import DistanceOracle
+from mazerunner_sim.utils.pathfinder import edge_of_knowledge_map, update_edge_of_knowledge_map
+
 
 class Runner:
     """The runner class for in the maze environment."""
 
     location: np.array
     alive: bool
-    explored: np.array
-    known_maze: np.array
-    known_leaves: np.array
+    maze_version: int
+    map_version: int
     assigned_task: Tuple[int, int]
 
-    def __init__(self, action_speed: int = 10, memory_decay_percentage: int = 0):
+    def __init__(self, action_speed: int = 10, memory_decay_percentage: int = 0, packed_maps: bool = False):
         """
         Initialize a Runner.
 
         :param action_speed: Number of simulation steps between each action, this effectively forms the runners speed.
+        :param packed_maps: Keep the known maps as bitboards (see `utils.bitboard`) instead of boolean arrays,
+                            this takes 8 times less memory and lets the environment share maps on whole words.
+                            The map attributes then give an unpacked copy.
         """
         self.action_speed = action_speed  # Base speed
         self.action_wait_time = self.action_speed  # Current speed in a step
         self.memory_decay_percentage = memory_decay_percentage
+        self.packed_maps = packed_maps
         self.safe_zone_spawn = np.array
+        self.maze_version = 0
+        self.map_version = 0
+        self._distance_oracle = None
+        self._snapshot = None
+        self._shared = False
+        # Stream of random numbers of the runner, the environment seeds it, see `MazeRunnerEnv.seed`
+        self.rng = np.random.default_rng()
 
     def update_map(self, maze_input: np.array, leaves_input: np.array) -> None:
         """
@@ -37,9 +51,131 @@ class Runner:
         # Wait if new information is gathered
         # self.action_wait_time += np.logical_not(self.explored[y - 1:y + 2, x - 1:x + 2]).sum()
 
-        self.explored[y - 1:y + 2, x - 1:x + 2] = True
-        self.known_maze[y - 1:y + 2, x - 1:x + 2] = maze_input
-        self.known_leaves[y - 1:y + 2, x - 1:x + 2] = leaves_input
+        if self.packed_maps:
+            height, width = maze_input.shape
+            explored = bitboard.get_block(self._explored, x - 1, y - 1, height, width)
+            known_maze = bitboard.get_block(self._known_maze, x - 1, y - 1, height, width)
+            known_leaves = bitboard.get_block(self._known_leaves, x - 1, y - 1, height, width)
+        else:
+            window = np.s_[y - 1:y + 2, x - 1:x + 2]
+            explored, known_maze, known_leaves = self._explored[window], self._known_maze[window], self._known_leaves[window]
+
+        maze_changed = not np.array_equal(known_maze, maze_input)
+        if explored.all() and not maze_changed and np.array_equal(known_leaves, leaves_input):
+            return
+        self.map_version += 1
+        if maze_changed:
+            self.maze_version += 1
+
+        if self.packed_maps:
+            bitboard.set_block(self._explored, x - 1, y - 1, np.ones(maze_input.shape, dtype=bool))
+            bitboard.set_block(self._known_maze, x - 1, y - 1, maze_input)
+            bitboard.set_block(self._known_leaves, x - 1, y - 1, leaves_input)
+            bitboard.update_edge_of_knowledge(self._edge_of_knowledge, self._known_maze, self._explored, y)
+            return
+
+        if self._shared:
+            # Copy on write, the observations handed out keep the maps as they were
+            self._explored, self._known_maze = self._explored.copy(), self._known_maze.copy()
+            self._known_leaves, self._edge_of_knowledge = self._known_leaves.copy(), self._edge_of_knowledge.copy()
+            self._shared = False
+        self._explored[window] = True
+        self._known_maze[window] = maze_input
+        self._known_leaves[window] = leaves_input
+        update_edge_of_knowledge_map(self._edge_of_knowledge, self._known_maze, self._explored, (x, y))
+
+    def set_maps(self, explored: np.array, known_maze: np.array, known_leaves: np.array) -> None:
+        """
+        Replace the locally known maps, for example after sharing maps with the other runners.
+
+        :param explored: map of booleans, True means explored
+        :param known_maze: map of booleans, True means known to be open
+        :param known_leaves: map of booleans, True means known to have a leaf
+        """
+        if self.packed_maps:
+            self.set_map_words(bitboard.pack(explored), bitboard.pack(known_maze), bitboard.pack(known_leaves))
+            return
+        self._explored = explored
+        self._known_maze = known_maze
+        self._known_leaves = known_leaves
+        self._edge_of_knowledge = edge_of_knowledge_map(known_maze, explored)
+        self._shared = False
+        self.maze_version += 1
+        self.map_version += 1
+
+    def set_map_words(self, explored: np.array, known_maze: np.array, known_leaves: np.array) -> None:
+        """
+        Replace the locally known maps with bitboards, like `set_maps`.
+
+        :param explored: bitboard, set means explored
+        :param known_maze: bitboard, set means known to be open
+        :param known_leaves: bitboard, set means known to have a leaf
+        """
+        if not self.packed_maps:
+            width = self.safe_zone_spawn.shape[1]
+            self.set_maps(bitboard.unpack(explored, width), bitboard.unpack(known_maze, width), bitboard.unpack(known_leaves, width))
+            return
+        self._explored = explored
+        self._known_maze = known_maze
+        self._known_leaves = known_leaves
+        self._edge_of_knowledge = bitboard.edge_of_knowledge(known_maze, explored)
+        self.maze_version += 1
+        self.map_version += 1
+
+    @property
+    def map_words(self) -> Tuple[np.array, np.array, np.array]:
+        """The explored, known maze and known leaves maps as bitboards, packed on the fly when the maps aren't packed."""
+        if self.packed_maps:
+            return self._explored, self._known_maze, self._known_leaves
+        return bitboard.pack(self._explored), bitboard.pack(self._known_maze), bitboard.pack(self._known_leaves)
+
+    def _bool_map(self, stored: np.array) -> np.array:
+        """Get a stored map as booleans."""
+        return bitboard.unpack(stored, self.safe_zone_spawn.shape[1]) if self.packed_maps else stored
+
+    @property
+    def explored(self) -> np.array:
+        """Map of booleans, True means explored."""
+        return self._bool_map(self._explored)
+
+    @property
+    def known_maze(self) -> np.array:
+        """Map of booleans, True means known to be open."""
+        return self._bool_map(self._known_maze)
+
+    @property
+    def known_leaves(self) -> np.array:
+        """Map of booleans, True means known to have a leaf."""
+        return self._bool_map(self._known_leaves)
+
+    @property
+    def edge_of_knowledge(self) -> np.array:
+        """Map of booleans, True means a known open tile next to unexplored area."""
+        return self._bool_map(self._edge_of_knowledge)
+
+    def map_snapshot(self) -> Tuple[np.array, np.array, np.array, np.array]:
+        """
+        Get read-only views of the explored, known maze, known leaves and edge of knowledge maps, without copying them.
+
+        The runner copies its maps before it changes them again, so a snapshot never changes.
+        Snapshots are reused as long as `map_version` stays the same.
+        """
+        if self._snapshot is None or self._snapshot[0] != self.map_version:
+            maps = self.explored, self.known_maze, self.known_leaves, self.edge_of_knowledge
+            if not self.packed_maps:
+                maps = tuple(m.view() for m in maps)
+                self._shared = True
+            for m in maps:
+                m.flags.writeable = False
+            self._snapshot = self.map_version, maps
+        return self._snapshot[1]
+
+    @property
+    def distance_oracle(self) -> DistanceOracle:
+        """Distance oracle on the known maze, it's only rebuilt after the known maze changed."""
+        if self._distance_oracle is None or self._distance_oracle[0] != self.maze_version:
+            self._distance_oracle = self.maze_version, DistanceOracle(self.known_maze.copy(), self.safe_zone_spawn)
+        return self._distance_oracle[1]
 
     def check_status_speed(self) -> bool:
         """Update the status of the agent."""
@@ -56,27 +192,39 @@ class Runner:
 
         return: numpy array of decayed map
         """
-        amount_cells_decayed = int(self.known_maze.size * (self.memory_decay_percentage / 100))
-        ones = np.ones(self.known_maze.size - amount_cells_decayed, dtype=bool)
-        zeros = np.zeros(amount_cells_decayed, dtype=bool)
-
-        # True = keep, False = forget
-        filter_array = np.concatenate((ones, zeros), axis=0, out=None)
-
-        np.random.shuffle(filter_array)
-
-        # Make from filter array, 2d array
-        filter_array = np.reshape(filter_array, (-1, self.known_maze.shape[0]))
-        filter_array = np.logical_or(filter_array, self.safe_zone_spawn)
-
-        return filter_array
+        return memory_decay_mask(self.known_maze.shape, self.memory_decay_percentage, self.safe_zone_spawn, self.rng)
 
     def reset(self, start_location: np.array, safe_zone: np.array, leaves: np.array) -> None:
         """Reset the status of the agent."""
         self.location = start_location
         self.alive = True
-        self.explored = safe_zone.copy()
-        self.known_maze = safe_zone.copy()
-        self.known_leaves = np.logical_and(leaves, self.explored)
         self.safe_zone_spawn = safe_zone.copy()
+        self.set_maps(safe_zone.copy(), safe_zone.copy(), np.logical_and(leaves, safe_zone))
         self.assigned_task = (0, 0)
+
+
+def memory_decay_mask(shape: Tuple[int, int], memory_decay_percentage: int, keep: np.array, rng: np.random.Generator) -> np.array:
+    """
+    Generate a random mask of which tiles a runner keeps remembering.
+
+    :param shape: shape of the maps of the runner
+    :param memory_decay_percentage: percentage of the tiles that get forgotten
+    :param keep: map of the tiles that are never forgotten, like the safe zone
+    :param rng: random generator that picks the tiles to forget
+    :return: numpy array of booleans, True = keep, False = forget
+    """
+    size = shape[0] * shape[1]
+    amount_cells_decayed = int(size * (memory_decay_percentage / 100))
+    ones = np.ones(size - amount_cells_decayed, dtype=bool)
+    zeros = np.zeros(amount_cells_decayed, dtype=bool)
+
+    # True = keep, False = forget
+    filter_array = np.concatenate((ones, zeros), axis=0, out=None)
+
+    rng.shuffle(filter_array)
+
+    # Make from filter array, 2d array
+    filter_array = np.reshape(filter_array, (-1, shape[0]))
+    filter_array = np.logical_or(filter_array, keep)
+
+    return filter_array
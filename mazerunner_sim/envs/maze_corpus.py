@@ -0,0 +1,140 @@
+"""A corpus of mazes on disk, so experiments can run on the exact same mazes without generating them again."""
+
+from typing import Dict, Iterable, List, Tuple, Union
+from functools import lru_cache
+import json
+import os
+
+import numpy as np
+
+from mazerunner_sim.envs.maze_generator import generate_mazes
+
+Maze = Tuple[np.array, np.array, np.array]
+
+
+class MazeCorpus:
+    """
+    Mazes stored in a single memory-mapped file, with an index.
+
+    The corpus at `path` consists of two files:
+        `<path>.mazes`: the maze, safe zone and leaves of every maze, as raw booleans one maze after the other
+        `<path>.json`: the index, with the offset and shape of every maze in the data file and how the corpus was made
+    Loading a maze gives read-only views on the memory-mapped data, processes that open the same corpus share its pages.
+    A corpus is pickled by its path, so sending it (or an environment made from it) to a worker process doesn't copy the mazes.
+    """
+
+    INDEX_VERSION = 1
+
+    def __init__(self, path: str):
+        """
+        Open an existing corpus.
+
+        :param path: path of the corpus, without the file extensions
+        """
+        self.path = path
+        with open(self.index_filename(path)) as file:
+            index = json.load(file)
+        if index['version'] != self.INDEX_VERSION:
+            raise ValueError(f"Unsupported maze corpus version {index['version']} in {path}")
+        self.metadata: dict = index['metadata']
+        self.entries: List[Dict[str, Union[int, List[int]]]] = index['mazes']
+        self._data: Union[np.memmap, None] = None
+
+    @staticmethod
+    def data_filename(path: str) -> str:
+        """Get the filename of the data file of the corpus at the given path."""
+        return f'{path}.mazes'
+
+    @staticmethod
+    def index_filename(path: str) -> str:
+        """Get the filename of the index of the corpus at the given path."""
+        return f'{path}.json'
+
+    @classmethod
+    def write(cls, path: str, mazes: Iterable[Maze], metadata: Union[dict, None] = None) -> 'MazeCorpus':
+        """
+        Write a new corpus, replacing the corpus that might already be at the path.
+
+        :param path: path of the corpus, without the file extensions
+        :param mazes: (maze, safe zone, leaves) for every maze, the maze ids are the order of this iterable
+        :param metadata: information about how the mazes were made, stored in the index
+        :return: the new corpus
+        """
+        entries = []
+        offset = 0
+        with open(cls.data_filename(path), 'wb') as file:
+            for maze, safe_zone, leaves in mazes:
+                data = np.stack([maze, safe_zone, leaves]).astype(bool)
+                file.write(data.tobytes())
+                entries.append({'offset': offset, 'shape': list(maze.shape)})
+                offset += data.size
+
+        # The index is written last, a corpus without an index isn't complete
+        with open(cls.index_filename(path), 'w') as file:
+            json.dump({'version': cls.INDEX_VERSION, 'metadata': metadata or {}, 'mazes': entries}, file)
+        return cls(path)
+
+    @classmethod
+    def generate(cls, path: str, n: int, maze_size: int = 16, center_size: int = 4, seed: int = 0,
+                 chunk_size: int = 256) -> 'MazeCorpus':
+        """
+        Generate a corpus of mazes with `generate_mazes`, the same seed always gives the same corpus.
+
+        :param path: path of the corpus, without the file extensions
+        :param n: number of mazes
+        :param maze_size: size of the mazes
+        :param center_size: size of the glade (center)
+        :param seed: seed of the random generator
+        :param chunk_size: number of mazes to generate at once
+        :return: the new corpus
+        """
+        rng = np.random.default_rng(seed)
+
+        def mazes() -> Iterable[Maze]:
+            for start in range(0, n, chunk_size):
+                yield from zip(*generate_mazes(min(chunk_size, n - start), maze_size, center_size, rng))
+
+        metadata = {'generator': 'generate_mazes', 'maze_size': maze_size, 'center_size': center_size, 'seed': seed,
+                    'chunk_size': chunk_size}
+        return cls.write(path, mazes(), metadata)
+
+    @property
+    def data(self) -> np.memmap:
+        """The memory-mapped data file, it's only opened when it's needed."""
+        if self._data is None:
+            if os.path.getsize(self.data_filename(self.path)) == 0:
+                self._data = np.zeros(0, dtype=bool)
+            else:
+                self._data = np.memmap(self.data_filename(self.path), dtype=bool, mode='r')
+        return self._data
+
+    def __len__(self) -> int:
+        """Get the number of mazes in the corpus."""
+        return len(self.entries)
+
+    def __getitem__(self, maze_id: int) -> Maze:
+        """
+        Load a maze.
+
+        :param maze_id: index of the maze in the corpus
+        :return: maze, safe zone and leaves, read-only arrays of booleans
+        """
+        entry = self.entries[maze_id]
+        height, width = entry['shape']
+        offset = entry['offset']
+        maze, safe_zone, leaves = self.data[offset:offset + 3 * height * width].reshape(3, height, width)
+        return maze, safe_zone, leaves
+
+    def __getstate__(self) -> dict:
+        """Pickle the corpus by its path only."""
+        return {'path': self.path}
+
+    def __setstate__(self, state: dict) -> None:
+        """Open the corpus again after unpickling."""
+        self.__init__(state['path'])
+
+
+@lru_cache(maxsize=None)
+def open_corpus(path: str) -> MazeCorpus:
+    """Open a corpus only once per process, see `MazeCorpus`."""
+    return MazeCorpus(path)
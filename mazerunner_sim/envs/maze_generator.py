@@ -1,19 +1,15 @@
 """Generator for a maze for the envirement."""
 # Maze generation using recursive backtracker algorithm
 # https://en.wikipedia.org/wiki/Maze_generation_algorithm#Recursive_backtracker
-from queue import LifoQueue
-
 from random import choice
 from random import randint
 
-from typing import Tuple
+from typing import List, Tuple, Union
 
 from PIL import Image
 
 import numpy as np
 
-from mazerunner_sim.utils.pathfinder import manhattan_distance
-
 
 def generate_maze(size: int = 16, center_size: int = 4) -> Tuple[np.array, np.array, np.array]:
     """
@@ -39,13 +35,13 @@ def generate_maze(size: int = 16, center_size: int = 4) -> Tuple[np.array, np.ar
     pixels[exit_y, exit_x] = True
     pixels[exit_y + offset_y, exit_x + offset_x] = True
 
-    stack = LifoQueue()
+    stack = []
     cells = np.zeros((size, size), dtype=bool)
     cells[size // 2 - center_size // 2:size // 2 + center_size // 2, size // 2 - center_size // 2:size // 2 + center_size // 2] = True
-    stack.put((size // 2 + center_size // 2, size // 2))
+    stack.append((size // 2 + center_size // 2, size // 2))
 
-    while not stack.empty():
-        x, y = stack.get()
+    while stack:
+        x, y = stack.pop()
 
         adjacents = []
         if x > 0 and not cells[x - 1, y]:
@@ -58,7 +54,7 @@ def generate_maze(size: int = 16, center_size: int = 4) -> Tuple[np.array, np.ar
             adjacents.append((x, y + 1))
 
         if adjacents:
-            stack.put((x, y))
+            stack.append((x, y))
 
             neighbour = choice(adjacents)
             neighbour_on_img = (neighbour[0] * 2 + 1, neighbour[1] * 2 + 1)
@@ -70,7 +66,7 @@ def generate_maze(size: int = 16, center_size: int = 4) -> Tuple[np.array, np.ar
             pixels[wall_to_remove] = True
 
             cells[neighbour] = True
-            stack.put(neighbour)
+            stack.append(neighbour)
 
     # Creating the entries
     for x_b, y_b in [(-1, 0), (0, 1), (1, 0), (0, -1)]:
@@ -83,24 +79,140 @@ def generate_maze(size: int = 16, center_size: int = 4) -> Tuple[np.array, np.ar
     pixels = np.logical_or(pixels, corrupt_mask)
 
     # Leaves
-    leaves = np.zeros((2 * size + 1, 2 * size + 1), dtype=float)
-    for y in range(leaves.shape[0]):
-        for x in range(leaves.shape[1]):
-            if pixels[y, x]:
-                leaves[y, x] = manhattan_distance((x, y), (exit_x, exit_y))
+    leaves = leaf_distances(pixels, exit_x, exit_y)
     leaves = np.random.rand(*leaves.shape) > leaves / (sum(leaves.shape) - 4)
 
     return pixels, safe_zone, leaves
 
 
+def leaf_distances(pixels: np.array, exit_x: int, exit_y: int) -> np.array:
+    """
+    Compute the manhattan distance from every open tile to the exit, the chance of a leaf on a tile depends on it.
+
+    :param pixels: map of booleans of the maze, the last two axes are y and x
+    :param exit_x: x of the exit, an array that broadcasts with the maps for a batch of mazes
+    :param exit_y: y of the exit, like `exit_x`
+    :return: the distances (as floats), 0 for walls
+    """
+    ys, xs = np.ogrid[:pixels.shape[-2], :pixels.shape[-1]]
+    return np.where(pixels, np.abs(xs - exit_x) + np.abs(ys - exit_y), 0).astype(float)
+
+
+def _carve_paths(size: int, center_size: int, draws: np.array) -> Tuple[List[int], List[int]]:
+    """
+    Run the recursive backtracker of `generate_maze` on a flat, padded grid of cells.
+
+    Instead of calling `random.choice`, the n-th carved cell is chosen with the n-th number of `draws`.
+
+    :param draws: random numbers in [0, 1), one for every cell that can be carved
+    :return: rows and columns of the tiles to open in the maze
+    """
+    # Cells are indexed (x + 1) * stride + (y + 1), the padding cells count as visited so no bound checks are needed
+    stride = size + 2
+    visited = bytearray(stride * stride)
+    for i in range(stride):
+        visited[i] = visited[(size + 1) * stride + i] = visited[i * stride] = visited[i * stride + size + 1] = 1
+    low, high = size // 2 - center_size // 2, size // 2 + center_size // 2
+    for x in range(low, high):
+        for y in range(low, high):
+            visited[(x + 1) * stride + y + 1] = 1
+
+    draws = draws.tolist()
+    rows, cols = [], []
+    offsets = (-stride, stride, -1, 1)
+    stack = [(size // 2 + center_size // 2 + 1) * stride + size // 2 + 1]
+    n_draws = 0
+    while stack:
+        cell = stack.pop()
+        adjacents = [cell + offset for offset in offsets if not visited[cell + offset]]
+        if adjacents:
+            stack.append(cell)
+            neighbour = adjacents[int(draws[n_draws] * len(adjacents))]
+            n_draws += 1
+
+            x, y = divmod(cell, stride)
+            neighbour_x, neighbour_y = divmod(neighbour, stride)
+            # The cells are padded, so a cell at (x, y) is at (2x - 1, 2y - 1) in the image
+            rows += [neighbour_x * 2 - 1, x * 2 - 1, neighbour_x + x - 1]
+            cols += [neighbour_y * 2 - 1, y * 2 - 1, neighbour_y + y - 1]
+
+            visited[neighbour] = 1
+            stack.append(neighbour)
+    return rows, cols
+
+
+def generate_maze_fast(size: int = 16, center_size: int = 4,
+                       rng: Union[np.random.Generator, None] = None) -> Tuple[np.array, np.array, np.array]:
+    """
+    Generate a maze like `generate_maze`, but faster and with all the randomness from the given generator.
+
+    The same seed of the generator always gives the same maze, the mazes are different from `generate_maze` though.
+
+    :param size: size of the maze
+    :param center_size: size of center section
+    :param rng: random generator to use, a new unseeded one by default
+    :return: maze, safe zone and leaves, numpy arrays of booleans with shape = [size * 2 + 1, size * 2 + 1]
+    """
+    mazes, safe_zone, leaves = generate_mazes(1, size, center_size, rng)
+    return mazes[0], safe_zone[0], leaves[0]
+
+
+def generate_mazes(n: int, size: int = 16, center_size: int = 4,
+                   rng: Union[np.random.Generator, None] = None) -> Tuple[np.array, np.array, np.array]:
+    """
+    Generate a batch of mazes, see `generate_maze_fast`.
+
+    :param n: number of mazes
+    :param size: size of the mazes
+    :param center_size: size of center section
+    :param rng: random generator to use, a new unseeded one by default
+    :return: mazes, safe zones and leaves, numpy arrays of booleans with shape = [n, size * 2 + 1, size * 2 + 1]
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    width = 2 * size + 1
+    pixels = np.zeros((n, width, width), dtype=bool)
+    pixels[:, size - center_size + 1:size + center_size, size - center_size + 1:size + center_size] = True
+    safe_zone = pixels.copy()
+
+    # Creating exits, one side of the maze with a random height for every maze
+    random_heights = rng.integers(1, size * 2, n)
+    sides = rng.integers(0, 4, n)
+    exit_x = np.choose(sides, [0, size * 2, random_heights, random_heights])
+    exit_y = np.choose(sides, [random_heights, random_heights, size * 2, 0])
+    offset_x = np.choose(sides, [1, -1, 0, 0])
+    offset_y = np.choose(sides, [0, 0, -1, 1])
+    mazes = np.arange(n)
+    pixels[mazes, exit_y, exit_x] = True
+    pixels[mazes, exit_y + offset_y, exit_x + offset_x] = True
+
+    draws = rng.random((n, size * size))
+    for i in range(n):
+        rows, cols = _carve_paths(size, center_size, draws[i])
+        pixels[i, rows, cols] = True
+
+    # Creating the entries
+    for x_b, y_b in [(-1, 0), (0, 1), (1, 0), (0, -1)]:
+        pixels[:, size + center_size * x_b, size + center_size * y_b] = True
+        pixels[:, size + (center_size + 1) * x_b, size + (center_size + 1) * y_b] = True
+    # Creating random openings in the walls
+    pixels[:, 1:-1, 1:-1] |= rng.random((n, width - 2, width - 2)) > 0.95
+
+    # Leaves
+    distances = leaf_distances(pixels, exit_x[:, None, None], exit_y[:, None, None])
+    leaves = rng.random(pixels.shape) > distances / (2 * width - 4)
+
+    return pixels, safe_zone, leaves
+
+
 if __name__ == '__main__':
     import argparse
 
     parser = argparse.ArgumentParser()
     parser.add_argument("size", nargs="?", type=int, default=16)
     parser.add_argument('--output', '-o', nargs='?', type=str, default='generated_maze.png')
+    parser.add_argument('--seed', '-s', type=int, default=None)
     args = parser.parse_args()
 
-    maze = generate_maze(args.size)
-    image = Image.fromarray(maze * 255).convert('RGB')
+    maze, _, _ = generate_maze_fast(args.size, rng=np.random.default_rng(args.seed))
+    image = Image.fromarray(maze.astype(np.uint8) * 255).convert('RGB')
     image.save(args.output)
@@ -1,18 +1,24 @@
 """OpenAI gym environment for the MazeRunner."""
 
-from typing import List, Tuple, Dict, Union, Sequence
+from typing import List, Tuple, Dict, Union, Sequence, Set
 import math
-import random
 from functools import reduce
 
 import gym
 import numpy as np
 from PIL import Image
 
-from mazerunner_sim.envs.maze_generator import generate_maze
+from mazerunner_sim.envs.maze_corpus import Maze, MazeCorpus, open_corpus
+from mazerunner_sim.envs.maze_generator import generate_maze, generate_maze_fast
 from mazerunner_sim.envs.visualisation.maze_render import render_agent_in_step, render_background
 from mazerunner_sim.envs.agents.runner import Runner
+from mazerunner_sim.utils import bitboard
+from mazerunner_sim.utils.auction import auction, worth_matrix
+from mazerunner_sim.utils.distance_oracle import DistanceOracle
 from mazerunner_sim.utils.observation_and_action import Observation, Action
+from mazerunner_sim.utils.profiling import NULL_PROFILER
+from mazerunner_sim.utils.seeding import Seed, seed_sequence
+from mazerunner_sim.utils.task_sampler import TaskSampler
 
 
 class MazeRunnerEnv(gym.Env):
@@ -26,10 +32,15 @@ class MazeRunnerEnv(gym.Env):
     total_rewards_given: float
     runners: List[Runner]
     tasks: List[Tuple[int, int]]
+    changed_tiles: Set[Tuple[int, int]]
+    everything_changed: bool
 
     DEATH_PUNISHMENT = 99999
+    OBSERVATION_MODES = ('copy', 'snapshot')
 
-    def __init__(self, runners: List[Runner], maze_size: int = 16, center_size: int = 4, day_length: int = 20):
+    def __init__(self, runners: List[Runner], maze_size: int = 16, center_size: int = 4, day_length: int = 20,
+                 observation_mode: str = 'copy', event_driven: bool = False, maze: Union[Maze, None] = None,
+                 headless: bool = False, reachable_tasks: bool = False, seed: Seed = None):
         """
         Initialize the MazeRunner environment.
 
@@ -37,14 +48,97 @@ class MazeRunnerEnv(gym.Env):
         :param maze_size: Size of the maze
         :param center_size: Size of the glade (center)
         :param day_length: Length of a day, at the end of the day, all the runners not in a safe spot are going to a better place
+        :param observation_mode: How the maps of the runners are put in the observations,
+                                 'copy' gives a copy of the maps at every observation,
+                                 'snapshot' gives read-only snapshots that are only copied when the runner changes its maps
+        :param event_driven: Respect the `hold` of actions, runners that hold don't get observations (and don't need actions)
+                             and the time-steps where all runners hold are skipped in one go.
+                             Skipped time-steps still count in the time and the rewards, just like the runners staying.
+        :param maze: The maze, safe zone and leaves to use instead of generating a new maze, see `from_corpus`
+        :param headless: The environment is never rendered, for batch runs. Otherwise the background of the renders is
+                         rendered when it's first needed.
+        :param reachable_tasks: Only make tasks of open tiles that can be reached from the safe zone,
+                                instead of any unexplored tile (including walls)
+        :param seed: Root seed of the random streams of the environment and its runners, see `seed`. A generated maze is
+                     then made with `generate_maze_fast` from the seed as well. By default the maze is made with
+                     `generate_maze` and the streams are seeded from the global random state.
         """
         super(MazeRunnerEnv, self).__init__()
-        self.maze, self.safe_zone, self.leaves = generate_maze(maze_size, center_size)
+        if observation_mode not in self.OBSERVATION_MODES:
+            raise ValueError(f"Unknown observation mode: {observation_mode}, choose from {self.OBSERVATION_MODES}")
+        self.observation_mode = observation_mode
+        self.event_driven = event_driven
+        if seed is None:
+            self.maze, self.safe_zone, self.leaves = generate_maze(maze_size, center_size) if maze is None else maze
+            sequence = seed_sequence(None)
+        else:
+            maze_sequence, sequence = seed_sequence(seed).spawn(2)
+            if maze is None:
+                maze = generate_maze_fast(maze_size, center_size, rng=np.random.default_rng(maze_sequence))
+            self.maze, self.safe_zone, self.leaves = maze
+        self.maze_source: Union[Tuple[str, int], None] = None
+        self.distance_oracle = DistanceOracle(self.maze, self.safe_zone)
         self.day_length = day_length
         self.runners = runners
+        self.headless = headless
+        self._rendered_background: Union[Image.Image, None] = None
+        # Whether to keep track of the tiles that change, for incremental rendering, see `take_changes`
+        self.track_changes = False
+        self.reachable_tasks = reachable_tasks
+        self.task_sampler = TaskSampler(self.task_candidates())
+        # Times the phases of the steps when it's a `PhaseTimer`, see `mazerunner_sim.utils.profiling`
+        self.profiler = NULL_PROFILER
+        self.seed(sequence)
         self.reset()
 
-        self.rendered_background = render_background(self.maze, self.leaves, self.safe_zone)
+    @property
+    def rendered_background(self) -> Image:
+        """The rendered maze without the runners, it's rendered once, when it's first needed."""
+        if self.headless:
+            raise RuntimeError("A headless environment can't be rendered")
+        if self._rendered_background is None:
+            self._rendered_background = render_background(self.maze, self.leaves, self.safe_zone)
+        return self._rendered_background
+
+    @classmethod
+    def from_corpus(cls, corpus: Union[MazeCorpus, str], maze_id: int, runners: List[Runner], **kwargs) -> 'MazeRunnerEnv':
+        """
+        Make an environment with a maze from a maze corpus.
+
+        The environment is pickled with a reference to the maze in the corpus, instead of a copy of the maze.
+
+        :param corpus: The corpus, or the path of the corpus
+        :param maze_id: Index of the maze in the corpus
+        :param runners: The runners in the maze with their properties
+        :param kwargs: The other parameters of the environment
+        """
+        if isinstance(corpus, str):
+            corpus = open_corpus(corpus)
+        env = cls(runners, maze=corpus[maze_id], **kwargs)
+        env.maze_source = corpus.path, maze_id
+        return env
+
+    def __getstate__(self) -> dict:
+        """
+        Pickle the environment.
+
+        The rendered background is left out, it's rendered again when needed.
+        A maze from a corpus is left out as well, it's loaded again from the corpus when unpickling.
+        """
+        state = self.__dict__.copy()
+        state['_rendered_background'] = None
+        if self.maze_source is not None:
+            for name in ('maze', 'safe_zone', 'leaves', 'distance_oracle'):
+                del state[name]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Unpickle the environment."""
+        self.__dict__.update(state)
+        if self.maze_source is not None:
+            path, maze_id = self.maze_source
+            self.maze, self.safe_zone, self.leaves = open_corpus(path)[maze_id]
+            self.distance_oracle = DistanceOracle(self.maze, self.safe_zone)
 
     def step(self, actions: Dict[int, Action]) -> Tuple[Dict[int, Observation], float, bool, dict]:
         """
@@ -53,10 +147,18 @@ class MazeRunnerEnv(gym.Env):
         :param actions: list of actions
         :return: observations, reward, done, info.
         """
+        profiler = self.profiler
         if self.time % self.day_length == 0:    # Night
-            reward = self._night_step(actions)
+            with profiler.phase('night_step'):
+                reward = self._night_step(actions)
         else:   # Day
-            reward = self._day_step(actions)
+            with profiler.phase('day_step'):
+                reward = self._day_step(actions)
+
+        if self.event_driven and not self.done:
+            with profiler.phase('skip_holds'):
+                self._start_holds(actions)
+                reward += self._skip_holding_time_steps()
 
         self.total_rewards_given += reward
 
@@ -72,11 +174,28 @@ class MazeRunnerEnv(gym.Env):
 
         return observations, reward, self.done, {}
 
+    def _start_holds(self, actions: Dict[int, Action]) -> None:
+        """Keep track of until when the runners hold, a hold is cut off before the next night."""
+        last_time_step_of_day = (self.time // self.day_length + 1) * self.day_length - 1
+        for runner_id, action in actions.items():
+            if action.hold > 0:
+                self.hold_until[runner_id] = min(self.time + action.hold, last_time_step_of_day)
+
+    def _skip_holding_time_steps(self) -> float:
+        """Skip the day steps in which all the runners that are alive hold, returns the reward of those steps."""
+        holds = [max(self.hold_until.get(runner_id, self.time), self.time) for runner_id, runner in enumerate(self.runners) if runner.alive]
+        skip_to = min(holds, default=self.time)
+        # Every skipped step is a day step where no one moves
+        reward = -(skip_to - self.time)
+        self.time = skip_to
+        return reward
+
     def _day_step(self, actions: Dict[int, Action]) -> float:
         """Let the runners run during a day step"""
         reward = -1
 
         # Let the runners take a step
+        explored_locations = []
         for runner_id, action in actions.items():
             runner = self.runners[runner_id]
             if runner.alive:
@@ -87,6 +206,9 @@ class MazeRunnerEnv(gym.Env):
                                  [0, 0]][action.step_direction])
                 # if the step is actually possible, take the step
                 if self.maze[tuple(runner.location + step)[::-1]]:
+                    if self.track_changes:
+                        self._mark_changed(*runner.location)
+                    map_version = runner.map_version
                     runner.location += step
 
                     # update map
@@ -94,6 +216,10 @@ class MazeRunnerEnv(gym.Env):
                         self.maze[runner.location[1] - 1:runner.location[1] + 2, runner.location[0] - 1:runner.location[0] + 2],
                         self.leaves[runner.location[1] - 1:runner.location[1] + 2, runner.location[0] - 1:runner.location[0] + 2]
                     )
+                    if runner.map_version != map_version:
+                        explored_locations.append(tuple(runner.location))
+                    if self.track_changes:
+                        self._mark_changed(*runner.location, radius=int(runner.map_version != map_version))
 
                     # if found the exit
                     if runner.location[0] == 0 or runner.location[0] == self.maze.shape[1] - 1 or \
@@ -101,6 +227,11 @@ class MazeRunnerEnv(gym.Env):
                         self.done = True
                         self.found_exit = runner
 
+        # The tiles the runners explored are removed from the task index at once
+        if explored_locations:
+            xs, ys = np.array(explored_locations).T
+            self.task_sampler.explore_many(xs, ys)
+
         return reward
 
     def _night_step(self, actions: Dict[int, Action]) -> float:
@@ -119,45 +250,84 @@ class MazeRunnerEnv(gym.Env):
 
         if not self.done:
             # Share maps between those alive
-            combined_explored_map = reduce(np.logical_or, [r.explored for r in self.runners if r.alive])
-            combined_maze_map = reduce(np.logical_or, [r.known_maze for r in self.runners if r.alive])
-            combined_leaves_map = reduce(np.logical_or, [r.known_leaves for r in self.runners if r.alive])
-            for runner in self.runners:
-                if runner.alive:
-                    forget_mask = runner.memory_decay_map_generator()
-
-                    runner.explored = np.logical_and(combined_explored_map.copy(), forget_mask.copy())
-                    runner.known_maze = np.logical_and(combined_maze_map.copy(), forget_mask.copy())
-                    runner.known_leaves = np.logical_and(combined_leaves_map.copy(), forget_mask.copy())
+            alive_runners = [r for r in self.runners if r.alive]
+            if self.track_changes:
+                explored_before = [r.explored for r in alive_runners]
+            if all(r.packed_maps for r in alive_runners):
+                # Merge and mask the bitboards a word at a time
+                combined_maps = [bitboard.merge(maps) for maps in zip(*(r.map_words for r in alive_runners))]
+                forget_masks = [runner.memory_decay_map_generator() for runner in alive_runners]
+                for runner, forget_mask in zip(alive_runners, forget_masks):
+                    packed_mask = bitboard.pack(forget_mask)
+                    runner.set_map_words(*(combined_map & packed_mask for combined_map in combined_maps))
+                combined_explored_map = bitboard.unpack(combined_maps[0], self.maze.shape[1])
+            else:
+                combined_explored_map = reduce(np.logical_or, [r.explored for r in alive_runners])
+                combined_maze_map = reduce(np.logical_or, [r.known_maze for r in alive_runners])
+                combined_leaves_map = reduce(np.logical_or, [r.known_leaves for r in alive_runners])
+                forget_masks = [runner.memory_decay_map_generator() for runner in alive_runners]
+                for runner, forget_mask in zip(alive_runners, forget_masks):
+                    runner.set_maps(np.logical_and(combined_explored_map, forget_mask),
+                                    np.logical_and(combined_maze_map, forget_mask),
+                                    np.logical_and(combined_leaves_map, forget_mask))
+            if self.track_changes:
+                changed = reduce(np.logical_or, [before != r.explored for before, r in zip(explored_before, alive_runners)])
+                self.changed_tiles.update(zip(*np.nonzero(changed.T)))
+            # The tasks are drawn from the tiles none of the runners remember exploring
+            self.task_sampler.update(np.logical_and(combined_explored_map, reduce(np.logical_or, forget_masks)))
 
             # Assign tasks according to an auction
-            worths = {i: [w / sum(action.task_worths) for w in action.task_worths] for i, action in actions.items()}
-            self._auction_tasks(worths, self.tasks)
+            runner_ids = sorted(actions)
+            self._auction_tasks(runner_ids, worth_matrix([actions[i].task_worths for i in runner_ids], len(self.tasks)), self.tasks)
 
         return reward
 
-    def _auction_tasks(self, worths: Dict[int, Sequence[float]], tasks: Sequence[Tuple[int, int]]):
-        assignments: Dict[int, Tuple[Runner, float]] = {}  # key: task_id, value: (runner, bid)
-        small_value = 1 / (len(worths) + 1)
-        while len(assignments) < len(worths):
-            for runner_id, runner in enumerate(self.runners):
-                if runner_id in worths and not any(r == runner for r, _ in assignments.values()):
-                    highest, second_highest = -math.inf, -math.inf
-                    highest_task = None
-                    for task_id in range(len(tasks)):
-                        if task_id in assignments:
-                            relative_value = worths[runner_id][task_id] - assignments[task_id][1]
-                        else:
-                            relative_value = worths[runner_id][task_id]
-                        if relative_value >= highest:
-                            highest, second_highest = relative_value, highest
-                            highest_task = task_id
-                        elif relative_value >= second_highest:
-                            second_highest = relative_value
-                    assignments[highest_task] = (runner, assignments.get(highest_task, (0, 0))[1] + highest - second_highest + small_value)
-
-        for task_id, (runner, bid) in assignments.items():
-            runner.assigned_task = tasks[task_id]
+    def _auction_tasks(self, runner_ids: Sequence[int], worths: np.array, tasks: Sequence[Tuple[int, int]]):
+        for runner_id, task_id in zip(runner_ids, auction(worths)):
+            if self.track_changes:
+                self._mark_changed(*self.runners[runner_id].assigned_task)
+                self._mark_changed(*tasks[task_id])
+            self.runners[runner_id].assigned_task = tasks[task_id]
+
+    def seed(self, seed: Seed = None) -> None:
+        """
+        Seed the random streams of the environment and of each of its runners, see `mazerunner_sim.utils.seeding`.
+
+        The environment draws the tasks from its stream, the runners draw what they forget at night from theirs.
+
+        :param seed: Root seed, None to seed from the global random state
+        """
+        env_sequence, *runner_sequences = seed_sequence(seed).spawn(1 + len(self.runners))
+        self.rng = np.random.default_rng(env_sequence)
+        for runner, runner_sequence in zip(self.runners, runner_sequences):
+            runner.rng = np.random.default_rng(runner_sequence)
+
+    def task_candidates(self) -> np.array:
+        """Get the map of the tiles that can become a task, see `reachable_tasks`."""
+        if self.reachable_tasks:
+            return self.distance_oracle.distance_to_safe_zone >= 0
+        return np.ones(self.maze.shape, dtype=bool)
+
+    def _mark_changed(self, x: int, y: int, radius: int = 0) -> None:
+        """Mark the tile at (x, y) as changed, and the tiles within the radius around it."""
+        height, width = self.maze.shape
+        self.changed_tiles.update((tile_x, tile_y)
+                                  for tile_x in range(max(x - radius, 0), min(x + radius + 1, width))
+                                  for tile_y in range(max(y - radius, 0), min(y + radius + 1, height)))
+
+    def take_changes(self) -> Union[Set[Tuple[int, int]], None]:
+        """
+        Take the tiles that changed since the last time the changes were taken, only tracked when `track_changes` is set.
+
+        A tile changes when a runner steps on or off it, when it's revealed to or forgotten by a runner,
+        or when it's the assigned task of a runner before or after the auction.
+
+        :return: the (x, y) of the changed tiles, None when everything changed (after a reset)
+        """
+        changed_tiles = None if self.everything_changed else self.changed_tiles
+        self.changed_tiles = set()
+        self.everything_changed = False
+        return changed_tiles
 
     def reset(self):
         """
@@ -170,10 +340,15 @@ class MazeRunnerEnv(gym.Env):
         self.found_exit = None
         self.time = 0
         self.total_rewards_given = 0.
+        self.tasks = []
+        self.hold_until: Dict[int, int] = {}
+        self.changed_tiles = set()
+        self.everything_changed = True
 
         center_coord = np.array([self.maze.shape[0] // 2] * 2)
         for runner in self.runners:
             runner.reset(center_coord.copy(), self.safe_zone, self.leaves)
+        self.task_sampler.update(reduce(np.logical_or, [r.explored for r in self.runners]))
 
     def get_observations(self, first_observation: bool = False) -> Dict[int, Observation]:
         """
@@ -181,39 +356,55 @@ class MazeRunnerEnv(gym.Env):
 
         :return A list of runner-observations, take a look at it's documentation for more detail
         """
+        with self.profiler.phase('observations'):
+            return self._get_observations(first_observation)
+
+    def _get_observations(self, first_observation: bool) -> Dict[int, Observation]:
+        """Get the observations, see `get_observations`."""
         tasks: List[Tuple[int, int]] = []
 
         if (self.time + 1) % self.day_length == 0 or first_observation:    # time-step before night
-            # Make tasks from unexplored area
-            combined_explored_map: np.array = reduce(np.logical_or, [r.explored for r in self.runners if r.alive])
-
-            if np.all(combined_explored_map):
-                tasks = self.tasks
-            else:
-                r_alive = sum([1 for r in self.runners if r.alive])
-                while len(tasks) < math.ceil(r_alive * 2):
-                    rand_x = random.randint(0, combined_explored_map.shape[1] - 1)
-                    rand_y = random.randint(0, combined_explored_map.shape[0] - 1)
-                    if not combined_explored_map[rand_y, rand_x]:
-                        tasks.append((rand_x, rand_y))
+            if first_observation:
+                # The maps of the runners may have been set from outside since the reset
+                self.task_sampler.update(reduce(np.logical_or, [r.explored for r in self.runners if r.alive]))
+
+            # Make tasks from unexplored area, the old tasks stay when everything is explored
+            r_alive = sum([1 for r in self.runners if r.alive])
+            tasks = self.task_sampler.sample(math.ceil(r_alive * 2), self.rng)
+            if tasks:
                 self.tasks = tasks
+            else:
+                tasks = self.tasks
 
         return {
-            runner_id: Observation(
-                explored=runner.explored.copy(),
-                known_maze=runner.known_maze.copy(),
-                known_leaves=runner.known_leaves.copy(),
-                safe_zone=self.safe_zone,
-                runner_location=(runner.location[0], runner.location[1]),
-                time_till_end_of_day=self.time_till_end_of_day(),
-                action_speed=runner.action_speed,
-                assigned_task=runner.assigned_task,
-                tasks=tasks
-            )
+            runner_id: self._observe(runner, tasks)
             for runner_id, runner in enumerate(self.runners)
-            if runner.alive
+            if runner.alive and self.hold_until.get(runner_id, self.time) <= self.time
         }
 
+    def _observe(self, runner: Runner, tasks: List[Tuple[int, int]]) -> Observation:
+        """Make the observation of a single runner."""
+        if self.observation_mode == 'snapshot':
+            explored, known_maze, known_leaves, edge_of_knowledge = runner.map_snapshot()
+        else:
+            explored, known_maze = runner.explored.copy(), runner.known_maze.copy()
+            known_leaves, edge_of_knowledge = runner.known_leaves.copy(), runner.edge_of_knowledge.copy()
+
+        return Observation(
+            explored=explored,
+            known_maze=known_maze,
+            known_leaves=known_leaves,
+            safe_zone=self.safe_zone,
+            runner_location=(runner.location[0], runner.location[1]),
+            time_till_end_of_day=self.time_till_end_of_day(),
+            action_speed=runner.action_speed,
+            assigned_task=runner.assigned_task,
+            tasks=tasks,
+            edge_of_knowledge=edge_of_knowledge,
+            distance_oracle=runner.distance_oracle,
+            map_version=runner.map_version
+        )
+
     def time_till_end_of_day(self) -> int:
         """Get number of time-steps left till the end of the day"""
         return self.day_length - (self.time % self.day_length) - 1
@@ -228,4 +419,5 @@ class MazeRunnerEnv(gym.Env):
         if self.done:
             print("Done")
 
-        return render_agent_in_step(self, follow_runner_id)
+        with self.profiler.phase('render'):
+            return render_agent_in_step(self, follow_runner_id)
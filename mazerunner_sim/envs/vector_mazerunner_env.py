@@ -0,0 +1,381 @@
+"""Vectorized version of the MazeRunner environment, stepping a batch of mazes at once."""
+
+from typing import List, Tuple, Dict, Sequence, Union
+import math
+
+import numpy as np
+
+from mazerunner_sim.envs.mazerunner_env import MazeRunnerEnv
+from mazerunner_sim.envs.agents.runner import memory_decay_mask
+from mazerunner_sim.utils.auction import auction, worth_matrix
+from mazerunner_sim.utils.distance_oracle import DistanceOracle
+from mazerunner_sim.utils.observation_and_action import Observation, Action
+from mazerunner_sim.utils.task_sampler import TaskSampler
+from mazerunner_sim.utils.pathfinder import edge_of_knowledge_map
+
+# Offset of a step (dx, dy) for each `Action.step_direction`
+STEP_OFFSETS = np.array([[0, -1], [0, 1], [-1, 0], [1, 0], [0, 0]])
+
+# Offsets (dx, dy) of the 3x3 block a runner sees around itself
+_VIEW_DX, _VIEW_DY = (a.ravel() for a in np.meshgrid([-1, 0, 1], [-1, 0, 1]))
+# Offsets (dx, dy) of the 5x5 block in which tiles can get on or off the edge of knowledge after a reveal
+_EDGE_DX, _EDGE_DY = (a.ravel() for a in np.meshgrid(np.arange(-2, 3), np.arange(-2, 3)))
+
+
+class VectorMazeRunnerEnv:
+    """
+    Batch of MazeRunner environments that are stepped at once.
+
+    The mazes and the state of the runners of all the environments are stacked into numpy arrays,
+    maps are indexed [env, runner, y, x] and locations [env, runner, (x, y)].
+    This way the moves, the map reveals, finding the exit and the killing at night
+    are a handful of array operations instead of a python loop over every runner in every maze.
+
+    Given the same actions, the environments evolve exactly like separate `MazeRunnerEnv` instances.
+    An environment that is done is frozen, it doesn't take steps anymore and doesn't give observations.
+
+    The maps in the observations are cut out of the stacked maps for all the observed runners at once.
+    In the 'snapshot' observation mode they are read-only and only cut out again after the maps of the runner changed,
+    the distance oracles are only made again after the known maze of the runner changed.
+    """
+
+    maze: np.array
+    safe_zone: np.array
+    leaves: np.array
+    location: np.array
+    alive: np.array
+    explored: np.array
+    known_maze: np.array
+    known_leaves: np.array
+    edge_of_knowledge: np.array
+    map_version: np.array
+    maze_version: np.array
+    assigned_task: np.array
+    done: np.array
+    found_exit: np.array
+    time: np.array
+    total_rewards_given: np.array
+    tasks: List[List[Tuple[int, int]]]
+
+    DEATH_PUNISHMENT = MazeRunnerEnv.DEATH_PUNISHMENT
+
+    def __init__(self, envs: Sequence[MazeRunnerEnv], observation_mode: str = 'snapshot'):
+        """
+        Initialize the vectorized environment from a set of normal environments.
+
+        The mazes, day length and runner properties are taken over from the given environments,
+        all environments should have the same day length, maze size and number of runners.
+
+        :param envs: The environments to stack
+        :param observation_mode: How the maps of the runners are put in the observations, see `MazeRunnerEnv`,
+                                 'copy' gives a copy of the maps at every observation,
+                                 'snapshot' gives read-only snapshots that are only copied when the maps of the runner changed
+        """
+        if len({(env.day_length, env.maze.shape, len(env.runners)) for env in envs}) != 1:
+            raise ValueError("All environments should have the same day length, maze size and number of runners")
+        if observation_mode not in MazeRunnerEnv.OBSERVATION_MODES:
+            raise ValueError(f"Unknown observation mode: {observation_mode}, choose from {MazeRunnerEnv.OBSERVATION_MODES}")
+        self.observation_mode = observation_mode
+
+        self.day_length = envs[0].day_length
+        self.maze = np.stack([env.maze for env in envs])
+        self.safe_zone = np.stack([env.safe_zone for env in envs])
+        self.leaves = np.stack([env.leaves for env in envs])
+        self.action_speed = np.array([[r.action_speed for r in env.runners] for env in envs])
+        self.memory_decay_percentage = np.array([[r.memory_decay_percentage for r in env.runners] for env in envs])
+        # Like for a runner, they keep counting over resets
+        self.map_version = np.zeros(self.action_speed.shape, dtype=int)
+        self.maze_version = np.zeros(self.action_speed.shape, dtype=int)
+        # The snapshots of the maps and the distance oracles handed out per [env][runner],
+        # with the map and maze version they were made at
+        self._snapshots: List[List[Tuple[np.array, np.array, np.array, np.array]]] = [[()] * len(env.runners) for env in envs]
+        self._snapshot_version = np.full(self.action_speed.shape, -1)
+        self._oracles: List[List[Union[DistanceOracle, None]]] = [[None] * len(env.runners) for env in envs]
+        self._oracle_version = np.full(self.action_speed.shape, -1)
+        self.task_samplers = [TaskSampler(env.task_candidates()) for env in envs]
+        # The random streams are taken over from the environments, so they draw the same numbers as when stepped on their own
+        self.rngs = [env.rng for env in envs]
+        self.runner_rngs = [[runner.rng for runner in env.runners] for env in envs]
+        self.reset()
+
+    @property
+    def num_envs(self) -> int:
+        """Number of environments in the batch."""
+        return self.maze.shape[0]
+
+    @property
+    def num_runners(self) -> int:
+        """Number of runners in each of the environments."""
+        return self.action_speed.shape[1]
+
+    def step(self, actions: Sequence[Dict[int, Action]]) -> Tuple[List[Dict[int, Observation]], np.array, np.array, List[dict]]:
+        """
+        Take a step in all the environments that are not done yet.
+
+        :param actions: for each environment a dictionary with the actions of the runners, like `MazeRunnerEnv.step`
+        :return: observations, rewards, dones and infos, each with an entry per environment
+        """
+        active = np.logical_not(self.done)
+        night = active & (self.time % self.day_length == 0)
+        day = active & np.logical_not(night)
+
+        step_direction = np.full((self.num_envs, self.num_runners), Action.STAY)
+        has_action = np.zeros((self.num_envs, self.num_runners), dtype=bool)
+        for env_id, env_actions in enumerate(actions):
+            for runner_id, action in env_actions.items():
+                step_direction[env_id, runner_id] = action.step_direction
+                has_action[env_id, runner_id] = True
+
+        rewards = np.zeros(self.num_envs)
+        rewards[day] = self._day_step(day, step_direction, has_action)
+        rewards[night] = self._night_step(night, actions)[night]
+
+        self.total_rewards_given[active] += rewards[active]
+
+        # Observations
+        observations = self._observations(active)
+
+        # Increment time
+        self.time[active] += 1
+
+        # End simulation if agents surpassed a year, the sim wil end
+        self.done[self.time > self.day_length * 365] = True
+
+        return observations, rewards, self.done.copy(), [{} for _ in range(self.num_envs)]
+
+    def _day_step(self, day: np.array, step_direction: np.array, has_action: np.array) -> float:
+        """Let the runners of the environments in `day` run a day step."""
+        env_ids, runner_ids = np.nonzero(day[:, None] & self.alive & has_action)
+
+        # Only take the steps that are actually possible
+        new_location = self.location[env_ids, runner_ids] + STEP_OFFSETS[step_direction[env_ids, runner_ids]]
+        possible = self.maze[env_ids, new_location[:, 1], new_location[:, 0]]
+        env_ids, runner_ids, new_location = env_ids[possible], runner_ids[possible], new_location[possible]
+        self.location[env_ids, runner_ids] = new_location
+
+        changed = self._update_maps(env_ids, runner_ids)[env_ids, runner_ids]
+        # Like the sequential env, the runners whose maps changed remove the tiles around them from the task index at once,
+        # the runners are still in the order of the environments
+        self._explore_tasks(env_ids[changed], new_location[changed])
+
+        # If found the exit, like the sequential env the runner with the highest id is the one that found it
+        height, width = self.maze.shape[1:]
+        x, y = new_location[:, 0], new_location[:, 1]
+        at_exit = (x == 0) | (x == width - 1) | (y == 0) | (y == height - 1)
+        self.done[env_ids[at_exit]] = True
+        np.maximum.at(self.found_exit, env_ids[at_exit], runner_ids[at_exit])
+
+        return -1
+
+    def _explore_tasks(self, env_ids: np.array, location: np.array) -> None:
+        """Remove the 3x3 block around each of the given locations from the task index of its environment, see `TaskSampler.explore`."""
+        height, width = self.maze.shape[1:]
+        xs, ys = location[:, 0, None] + _VIEW_DX, location[:, 1, None] + _VIEW_DY
+        inside = (xs >= 0) & (ys >= 0) & (xs < width) & (ys < height)
+        tiles = np.where(inside, ys * width + xs, -1)
+        # The locations are in the order of the environments, so the blocks of an environment are together
+        explored_envs, starts = np.unique(env_ids, return_index=True)
+        for env_id, env_tiles in zip(explored_envs.tolist(), np.split(tiles, starts[1:])):
+            self.task_samplers[env_id].explore_tiles(env_tiles[env_tiles >= 0])
+
+    def _update_maps(self, env_ids: np.array, runner_ids: np.array) -> np.array:
+        """Reveal the 3x3 block around each of the given runners, see `Runner.update_map`, returns which runners' maps changed."""
+        height, width = self.maze.shape[1:]
+        x, y = self.location[env_ids, runner_ids].T
+        runners = env_ids, runner_ids
+
+        # Same bounds as the slicing in `Runner.update_map`, a block that starts outside the maze isn't revealed
+        xs, ys = x[:, None] + _VIEW_DX, y[:, None] + _VIEW_DY
+        inside = (x[:, None] > 0) & (y[:, None] > 0) & (xs < width) & (ys < height)
+        env_ids = np.broadcast_to(env_ids[:, None], xs.shape)[inside]
+        runner_ids = np.broadcast_to(runner_ids[:, None], xs.shape)[inside]
+        xs, ys = xs[inside], ys[inside]
+
+        maze_changed = self.known_maze[env_ids, runner_ids, ys, xs] != self.maze[env_ids, ys, xs]
+        changed = np.logical_not(self.explored[env_ids, runner_ids, ys, xs]) | maze_changed | \
+            (self.known_leaves[env_ids, runner_ids, ys, xs] != self.leaves[env_ids, ys, xs])
+        changed_runners = np.zeros(self.map_version.shape, dtype=bool)
+        changed_runners[env_ids[changed], runner_ids[changed]] = True
+        self.map_version += changed_runners
+        changed_mazes = np.zeros(self.maze_version.shape, dtype=bool)
+        changed_mazes[env_ids[maze_changed], runner_ids[maze_changed]] = True
+        self.maze_version += changed_mazes
+
+        self.explored[env_ids, runner_ids, ys, xs] = True
+        self.known_maze[env_ids, runner_ids, ys, xs] = self.maze[env_ids, ys, xs]
+        self.known_leaves[env_ids, runner_ids, ys, xs] = self.leaves[env_ids, ys, xs]
+        self._update_edge_of_knowledge(*runners, x, y)
+        return changed_runners
+
+    def _update_edge_of_knowledge(self, env_ids: np.array, runner_ids: np.array, x: np.array, y: np.array) -> None:
+        """Update the edge of knowledge in the 5x5 block around each of the given runners, see `update_edge_of_knowledge_map`."""
+        height, width = self.maze.shape[1:]
+        xs, ys = x[:, None] + _EDGE_DX, y[:, None] + _EDGE_DY
+        inside = (xs >= 0) & (ys >= 0) & (xs < width) & (ys < height)
+        env_ids = np.broadcast_to(env_ids[:, None], xs.shape)[inside]
+        runner_ids = np.broadcast_to(runner_ids[:, None], xs.shape)[inside]
+        xs, ys = xs[inside], ys[inside]
+
+        # A tile is surrounded when its four neighbours are explored, tiles on the border of the maze never are
+        explored = self.explored
+        surrounded = (xs > 0) & (ys > 0) & (xs < width - 1) & (ys < height - 1) & \
+            explored[env_ids, runner_ids, np.maximum(ys - 1, 0), xs] & explored[env_ids, runner_ids, np.minimum(ys + 1, height - 1), xs] & \
+            explored[env_ids, runner_ids, ys, np.maximum(xs - 1, 0)] & explored[env_ids, runner_ids, ys, np.minimum(xs + 1, width - 1)]
+        self.edge_of_knowledge[env_ids, runner_ids, ys, xs] = self.known_maze[env_ids, runner_ids, ys, xs] & np.logical_not(surrounded)
+
+    def _night_step(self, night: np.array, actions: Sequence[Dict[int, Action]]) -> np.array:
+        """Let the environments in `night` run a night step, returns the reward for each environment."""
+        rewards = np.zeros(self.num_envs)
+
+        # Kill the runners that are still in the maze, the safe zone is indexed like the sequential env does
+        env_ids, runner_ids = np.nonzero(np.broadcast_to(night[:, None], self.alive.shape))
+        in_safe_zone = self.safe_zone[env_ids, self.location[env_ids, runner_ids, 0], self.location[env_ids, runner_ids, 1]]
+        self.alive[env_ids[~in_safe_zone], runner_ids[~in_safe_zone]] = False
+
+        # If all runners are dead
+        all_dead = night & np.logical_not(self.alive.any(axis=1))
+        self.done[all_dead] = True
+        rewards[all_dead] -= self.DEATH_PUNISHMENT + self.total_rewards_given[all_dead]
+
+        sharing = night & np.logical_not(self.done)
+        if sharing.any():
+            # Share maps between those alive
+            sharing_runners = sharing[:, None] & self.alive
+            mask = sharing_runners[:, :, None, None]
+            forget_mask = np.ones(self.explored.shape, dtype=bool)
+            for env_id, runner_id in zip(*np.nonzero(sharing_runners)):
+                forget_mask[env_id, runner_id] = memory_decay_mask(self.maze.shape[1:],
+                                                                   self.memory_decay_percentage[env_id, runner_id],
+                                                                   self.safe_zone[env_id],
+                                                                   self.runner_rngs[env_id][runner_id])
+            for known_map in (self.explored, self.known_maze, self.known_leaves):
+                combined_map = np.logical_and(known_map, mask).any(axis=1, keepdims=True)
+                np.copyto(known_map, np.logical_and(combined_map, forget_mask), where=mask)
+            self.edge_of_knowledge[sharing_runners] = edge_of_knowledge_map(self.known_maze[sharing_runners],
+                                                                            self.explored[sharing_runners])
+            self.map_version += sharing_runners
+            self.maze_version += sharing_runners
+            combined_explored_maps = np.logical_and(self.explored, mask).any(axis=1)
+            for env_id in np.flatnonzero(sharing):
+                self.task_samplers[env_id].update(combined_explored_maps[env_id])
+
+            # Assign tasks according to an auction
+            for env_id in np.flatnonzero(sharing):
+                runner_ids = sorted(actions[env_id])
+                worths = worth_matrix([actions[env_id][i].task_worths for i in runner_ids], len(self.tasks[env_id]))
+                for runner_id, task_id in zip(runner_ids, auction(worths)):
+                    self.assigned_task[env_id, runner_id] = self.tasks[env_id][task_id]
+
+        return rewards
+
+    def reset(self):
+        """
+        Reset all the environments.
+
+        The mazes stay the same, the runners go back to the center, the time and the `done` flags are reset.
+        """
+        n_envs, height, width = self.maze.shape
+        self.done = np.zeros(n_envs, dtype=bool)
+        self.found_exit = np.full(n_envs, -1)
+        self.time = np.zeros(n_envs, dtype=int)
+        self.total_rewards_given = np.zeros(n_envs)
+        self.tasks = [[] for _ in range(n_envs)]
+
+        self.location = np.full((n_envs, self.num_runners, 2), height // 2)
+        self.alive = np.ones((n_envs, self.num_runners), dtype=bool)
+        self.explored = np.repeat(self.safe_zone[:, None], self.num_runners, axis=1)
+        self.known_maze = self.explored.copy()
+        self.known_leaves = np.logical_and(self.leaves[:, None], self.explored)
+        self.edge_of_knowledge = edge_of_knowledge_map(self.known_maze, self.explored)
+        self.map_version += 1
+        self.maze_version += 1
+        self.assigned_task = np.zeros((n_envs, self.num_runners, 2), dtype=int)
+        for task_sampler, explored in zip(self.task_samplers, self.explored.any(axis=1)):
+            task_sampler.update(explored)
+
+    def get_observations(self, first_observation: bool = False) -> List[Dict[int, Observation]]:
+        """
+        Get the observations of the runners in each environment that is not done, like `MazeRunnerEnv.get_observations`.
+
+        :return: For each environment a dictionary of runner-observations, empty for environments that are done
+        """
+        return self._observations(np.logical_not(self.done), first_observation)
+
+    def _observations(self, envs: np.array, first_observation: bool = False) -> List[Dict[int, Observation]]:
+        """Get the observations of the environments selected by the `envs` mask."""
+        pre_night = envs & (((self.time + 1) % self.day_length == 0) | first_observation)
+        if first_observation and pre_night.any():
+            combined_explored_maps = np.logical_and(self.explored, self.alive[:, :, None, None]).any(axis=1)
+        tasks_per_env: List[List[Tuple[int, int]]] = [[] for _ in range(self.num_envs)]
+
+        for env_id in np.flatnonzero(pre_night):
+            if first_observation:
+                self.task_samplers[env_id].update(combined_explored_maps[env_id])
+            # Make tasks from unexplored area, the old tasks stay when everything is explored
+            tasks = self.task_samplers[env_id].sample(math.ceil(self.alive[env_id].sum() * 2), self.rngs[env_id])
+            if tasks:
+                self.tasks[env_id] = tasks
+            tasks_per_env[env_id] = self.tasks[env_id]
+
+        env_ids, runner_ids = np.nonzero(envs[:, None] & self.alive)
+        stacked_maps = self.explored, self.known_maze, self.known_leaves, self.edge_of_knowledge
+        if self.observation_mode == 'copy':
+            # Indexing the runners copies their maps, a runner gets views of its rows of the copies
+            copies = list(zip(*(m[env_ids, runner_ids] for m in stacked_maps)))
+        else:
+            self._update_snapshots(env_ids, runner_ids)
+        self._update_distance_oracles(env_ids, runner_ids)
+        time_till_end_of_day = self.time_till_end_of_day().tolist()
+        locations = self.location[env_ids, runner_ids].tolist()
+        assigned_tasks = self.assigned_task[env_ids, runner_ids].tolist()
+        action_speeds = self.action_speed[env_ids, runner_ids].tolist()
+        map_versions = self.map_version[env_ids, runner_ids].tolist()
+
+        observations: List[Dict[int, Observation]] = [{} for _ in range(self.num_envs)]
+        for i, (env_id, runner_id) in enumerate(zip(env_ids.tolist(), runner_ids.tolist())):
+            maps = copies[i] if self.observation_mode == 'copy' else self._snapshots[env_id][runner_id]
+            observations[env_id][runner_id] = Observation(
+                explored=maps[0],
+                known_maze=maps[1],
+                known_leaves=maps[2],
+                safe_zone=self.safe_zone[env_id],
+                runner_location=tuple(locations[i]),
+                time_till_end_of_day=time_till_end_of_day[env_id],
+                action_speed=action_speeds[i],
+                assigned_task=tuple(assigned_tasks[i]),
+                tasks=tasks_per_env[env_id],
+                edge_of_knowledge=maps[3],
+                distance_oracle=self._oracles[env_id][runner_id],
+                map_version=map_versions[i]
+            )
+        return observations
+
+    def _update_snapshots(self, env_ids: np.array, runner_ids: np.array) -> None:
+        """Make new read-only snapshots of the maps of the given runners, for the runners whose maps changed since the last."""
+        stale = self._snapshot_version[env_ids, runner_ids] != self.map_version[env_ids, runner_ids]
+        if not stale.any():
+            return
+        env_ids, runner_ids = env_ids[stale], runner_ids[stale]
+        snapshots = [m[env_ids, runner_ids] for m in (self.explored, self.known_maze, self.known_leaves, self.edge_of_knowledge)]
+        for snapshot in snapshots:
+            snapshot.flags.writeable = False
+        for env_id, runner_id, maps in zip(env_ids.tolist(), runner_ids.tolist(), zip(*snapshots)):
+            self._snapshots[env_id][runner_id] = maps
+        self._snapshot_version[env_ids, runner_ids] = self.map_version[env_ids, runner_ids]
+
+    def _update_distance_oracles(self, env_ids: np.array, runner_ids: np.array) -> None:
+        """Make new distance oracles for the given runners whose known maze changed since the last, see `Runner.distance_oracle`."""
+        stale = self._oracle_version[env_ids, runner_ids] != self.maze_version[env_ids, runner_ids]
+        if not stale.any():
+            return
+        env_ids, runner_ids = env_ids[stale], runner_ids[stale]
+        for env_id, runner_id in zip(env_ids.tolist(), runner_ids.tolist()):
+            # A snapshot never changes, so the oracle can keep it instead of a copy
+            known_maze = self._snapshots[env_id][runner_id][1] if self.observation_mode == 'snapshot' else \
+                self.known_maze[env_id, runner_id].copy()
+            self._oracles[env_id][runner_id] = DistanceOracle(known_maze, self.safe_zone[env_id])
+        self._oracle_version[env_ids, runner_ids] = self.maze_version[env_ids, runner_ids]
+
+    def time_till_end_of_day(self) -> np.array:
+        """Get number of time-steps left till the end of the day, for each environment"""
+        return self.day_length - (self.time % self.day_length) - 1
@@ -1,17 +1,163 @@
-"""This file contains code to render a maze."""
-import copy
+"""
+This file contains code to render a maze.
+
+The textures are loaded once and every kind of tile is composed once into a texture atlas,
+the background is then put together by indexing the atlas with the tile kind of every tile of the maze.
+The fog of war is a single layer of clouds, masked by what's explored.
+"""
+from functools import lru_cache
 
 from pathlib import Path
 
-from typing import Union
+from typing import Dict, Iterable, Sequence, Set, Tuple, Union
 
-from PIL import Image, ImageDraw
+from PIL import Image, ImageDraw, ImageFont
 
 from mazerunner_sim.envs.agents.runner import Runner
+from mazerunner_sim.utils.distance_field import Coord
 
 import numpy as np
 
-textures_path = Path(__file__) / '..' / 'textures'
+textures_path = Path(__file__).parent / 'textures'
+
+# The textures of the walls, the name tells which sides of the wall connect to other walls (noord, oost, zuid, west)
+WALL_TEXTURES = ('walls', 'wall_zw', 'wall_no', 'wall_nw', 'wall_zo', 'wall_w', 'wall_n', 'wall_o', 'wall_z', 'wall_ow', 'wall_nz',
+                 'wall_ozw', 'wall_now', 'wall_noz', 'wall_nzw', 'wall_nozw', 'wall_solid')
+TILE_KINDS = WALL_TEXTURES + ('path', 'leaf')
+
+
+@lru_cache(maxsize=None)
+def load_texture(name: str) -> Image:
+    """Load a texture from the textures folder, only once."""
+    with Image.open(textures_path / f"{name}.png") as image:
+        return image.copy()
+
+
+@lru_cache(maxsize=None)
+def wall_textures() -> Dict[str, Image.Image]:
+    """Get the textures of the walls, by name, see `WALL_TEXTURES`."""
+    corner, end = load_texture("tile_corner"), load_texture("tile_end")
+    straight, tcross = load_texture("tile_straight"), load_texture("tile_tcross")
+    return {
+        'walls': load_texture("stonebrick"),
+        # Corners
+        'wall_zw': corner,                 # ↴
+        'wall_no': corner.rotate(180),     # ↳
+        'wall_nw': corner.rotate(270),     # ↵
+        'wall_zo': corner.rotate(90),      # ↱
+        # Ends
+        'wall_w': end,                     # ←
+        'wall_n': end.rotate(270),         # ↑
+        'wall_o': end.rotate(180),         # →
+        'wall_z': end.rotate(90),          # ↓
+        # Straight
+        'wall_ow': straight,               # ⇄
+        'wall_nz': straight.rotate(90),    # ⇅
+        # T-cross
+        'wall_ozw': tcross,                # ▽
+        'wall_now': tcross.rotate(180),    # △
+        'wall_noz': tcross.rotate(90),     # ▷
+        'wall_nzw': tcross.rotate(270),    # ◁
+        # Cross
+        'wall_nozw': load_texture("tile_cross"),  # +
+        # Full block
+        'wall_solid': load_texture("tile_solid"),
+    }
+
+
+@lru_cache(maxsize=None)
+def texture_atlas() -> np.array:
+    """
+    Compose every kind of tile once, with and without the safe zone on top.
+
+    :return: array of RGB tiles with shape [len(TILE_KINDS) * 2, tile height, tile width, 3],
+             the tile of a kind is at index `2 * TILE_KINDS.index(kind)`, with the safe zone at the index after that
+    """
+    path, leaf = load_texture("dirt"), load_texture("leaf")
+    textures = dict(wall_textures(), path=path, leaf=leaf)
+    safe_zone_texture = Image.new(mode="RGBA", size=path.size, color=(250, 100, 0, 100))
+
+    tiles = []
+    for kind in TILE_KINDS:
+        for in_safe_zone in (False, True):
+            tile = Image.new(mode="RGB", size=path.size)
+            if kind == 'leaf':
+                tile.paste(path, (0, 0), path)
+            tile.paste(textures[kind], (0, 0), textures[kind])
+            if in_safe_zone:
+                tile.paste(safe_zone_texture, (0, 0), safe_zone_texture)
+            tiles.append(np.array(tile))
+    return np.stack(tiles)
+
+
+def tile_kinds(maze: np.array, leaves: np.array) -> np.array:
+    """
+    Determine the kind of every tile, walls get the texture that connects to the walls around them.
+
+    :return: map with the index in `TILE_KINDS` of every tile
+    """
+    height, width = maze.shape
+    rows, columns = np.arange(height)[:, None], np.arange(width)[None, :]
+    # The neighbours, at the border of the maze a tile is its own neighbour
+    left = maze[:, np.maximum(columns[0] - 1, 0)]
+    right = maze[:, np.minimum(columns[0] + 1, width - 1)]
+    top = maze[np.maximum(rows[:, 0] - 1, 0)]
+    bottom = maze[np.minimum(rows[:, 0] + 1, height - 1)]
+    first_row, last_row = rows == 0, rows == height - 1
+    first_column, last_column = columns == 0, columns == width - 1
+    n_left, n_right, n_top, n_bottom = ~left, ~right, ~top, ~bottom
+
+    # The first matching rule decides the texture
+    rules = [
+        # Borders Corners
+        (first_row & first_column & n_right & n_bottom, 'wall_zo'),
+        (first_row & last_column & n_left & n_bottom, 'wall_zw'),
+        (last_row & first_column & n_left & n_top, 'wall_no'),
+        (last_row & last_column & n_left & n_top, 'wall_nw'),
+        # Top side
+        (first_row & n_left & n_right & n_bottom, 'wall_ozw'),
+        (first_row & n_left & n_right, 'wall_ow'),
+        # Left side
+        (first_column & n_right & n_bottom & n_top, 'wall_noz'),
+        (first_column & right & n_bottom & n_top, 'wall_nz'),
+        # Right side
+        (last_column & n_left & n_bottom & n_top, 'wall_nzw'),
+        (last_column & left & n_bottom & n_top, 'wall_nz'),
+        # Bottom row
+        (last_row & n_left & n_right & n_top, 'wall_now'),
+        (last_row & n_left & n_right & top, 'wall_ow'),
+        # Corners
+        (n_left & right & n_bottom & top, 'wall_zw'),
+        (left & n_right & bottom & n_top, 'wall_no'),
+        (n_left & right & bottom & n_top, 'wall_nw'),
+        (left & n_right & n_bottom & top, 'wall_zo'),
+        # Cross
+        (n_left & n_right & n_bottom & n_top, 'wall_nozw'),
+        # Endings
+        (n_left & right & bottom & top, 'wall_w'),
+        (left & right & bottom & n_top, 'wall_n'),
+        (left & n_right & bottom & top, 'wall_o'),
+        (left & right & n_bottom & top, 'wall_z'),
+        # Straights
+        (n_left & n_right & bottom & top, 'wall_ow'),
+        (left & right & n_bottom & n_top, 'wall_nz'),
+        # T crosses
+        (n_left & n_right & n_bottom & top, 'wall_ozw'),
+        (n_left & n_right & bottom & n_top, 'wall_now'),
+        (left & n_right & n_bottom & n_top, 'wall_noz'),
+        (n_left & right & n_bottom & n_top, 'wall_nzw'),
+        # Solid
+        (left & right & bottom & top, 'wall_solid'),
+    ]
+    walls = np.select([np.broadcast_to(rule, maze.shape) for rule, _ in rules],
+                      [TILE_KINDS.index(name) for _, name in rules], TILE_KINDS.index('walls'))
+    return np.where(maze, np.where(leaves, TILE_KINDS.index('leaf'), TILE_KINDS.index('path')), walls)
+
+
+def tiles_to_image(tiles: np.array) -> np.array:
+    """Put a map of tiles with shape [height, width, tile height, tile width, channels] together into one image array."""
+    height, width, tile_height, tile_width, channels = tiles.shape
+    return tiles.transpose(0, 2, 1, 3, 4).reshape(height * tile_height, width * tile_width, channels)
 
 
 def render_background(maze: np.array, leaves: np.array, safe_zone: np.array) -> Image:
@@ -22,159 +168,44 @@ def render_background(maze: np.array, leaves: np.array, safe_zone: np.array) ->
     :param leaves:
     :param safe_zone:
     """
-    # Declare with images used for walls and path
-    walls = Image.open(textures_path / "stonebrick.png")
-    path = Image.open(textures_path / "dirt.png")
-    leaf = Image.open(textures_path / "leaf.png")
-    safe_zone_texture = Image.new(mode="RGBA", size=walls.size, color=(250, 100, 0, 100))
-
-    # Declare walls with directions
-    # Corners
-    wall_zw = Image.open(textures_path / "tile_corner.png")  # ↴
-    wall_no = copy.deepcopy(wall_zw).rotate(180)             # ↳
-    wall_nw = copy.deepcopy(wall_zw).rotate(270)             # ↵
-    wall_zo = copy.deepcopy(wall_zw).rotate(90)              # ↱
-
-    # Ends
-    wall_w = Image.open(textures_path / "tile_end.png")    # ←
-    wall_n = copy.deepcopy(wall_w).rotate(270)             # ↑
-    wall_o = copy.deepcopy(wall_w).rotate(180)             # →
-    wall_z = copy.deepcopy(wall_w).rotate(90)              # ↓
-
-    # Straight
-    wall_ow = Image.open(textures_path / "tile_straight.png")   # ⇄
-    wall_nz = copy.deepcopy(wall_ow).rotate(90)                 # ⇅
-
-    # T-cross
-    wall_ozw = Image.open(textures_path / "tile_tcross.png")   # ▽
-    wall_now = copy.deepcopy(wall_ozw).rotate(180)              # △
-    wall_noz = copy.deepcopy(wall_ozw).rotate(90)              # ▷
-    wall_nzw = copy.deepcopy(wall_ozw).rotate(270)              # ◁
-
-    # Cross
-    wall_nozw = Image.open(textures_path / "tile_cross.png")  # +
-
-    # Full block
-    wall_solid = Image.open(textures_path / "tile_solid.png")  # +
-
-    # Get width and height of the walls
-    tile_size_width, tile_size_height = walls.size
-
-    # Calculate canvas size of the maze
-    width = maze.shape[0] * tile_size_width
-    height = maze.shape[1] * tile_size_height
-
-    # Get maze grind size
-    maze_width, maze_height = maze.shape
-
-    # Create canvas
-    background = Image.new(mode="RGB", size=(width, height))
-
-    # Loop through values from the maze and determine where the walls and path are
-    for height_row, width_values in enumerate(maze):
-        for index, is_open_tile in enumerate(width_values):
-            if is_open_tile:
-                if leaves[height_row, index]:
-                    background.paste(path, (index * tile_size_width, height_row * tile_size_height), path)
-                    texture = leaf
-                else:
-                    texture = path
-            else:
-                # Declaring surrounding tiles
-                left_tile = maze[height_row, max(index - 1, 0)]
-                right_tile = maze[height_row, min(index + 1, maze_width - 1)]
-                top_tile = maze[max(height_row - 1, 0), index]
-                bottom_tile = maze[min(height_row + 1, maze_height - 1), index]
-                # Borders Corners
-                # Top left
-                if height_row == 0 and index == 0 and not right_tile and not bottom_tile:
-                    texture = wall_zo
-                # Top right
-                elif height_row == 0 and index == maze_width - 1 and not left_tile and not bottom_tile:
-                    texture = wall_zw
-                # Bottom left
-                elif height_row == maze_height - 1 and index == 0 and not left_tile and not top_tile:
-                    texture = wall_no
-                # Bottom right
-                elif height_row == maze_height - 1 and index == maze_width - 1 and not left_tile and not top_tile:
-                    texture = wall_nw
-
-                # Top side
-                elif height_row == 0 and not left_tile and not right_tile and not bottom_tile:
-                    texture = wall_ozw
-                elif height_row == 0 and not left_tile and not right_tile:
-                    texture = wall_ow
-
-                # Left side
-                elif index == 0 and not right_tile and not bottom_tile and not top_tile:
-                    texture = wall_noz
-                elif index == 0 and right_tile and not bottom_tile and not top_tile:
-                    texture = wall_nz
-
-                # Right side
-                elif index == maze_width - 1 and not left_tile and not bottom_tile and not top_tile:
-                    texture = wall_nzw
-                elif index == maze_width - 1 and left_tile and not bottom_tile and not top_tile:
-                    texture = wall_nz
-
-                # Bottom row
-                elif height_row == maze_height - 1 and not left_tile and not right_tile and not top_tile:
-                    texture = wall_now
-                elif height_row == maze_height - 1 and not left_tile and not right_tile and top_tile:
-                    texture = wall_ow
-
-                # Corners
-                elif not left_tile and right_tile and not bottom_tile and top_tile:
-                    texture = wall_zw
-                elif left_tile and not right_tile and bottom_tile and not top_tile:
-                    texture = wall_no
-                elif not left_tile and right_tile and bottom_tile and not top_tile:
-                    texture = wall_nw
-                elif left_tile and not right_tile and not bottom_tile and top_tile:
-                    texture = wall_zo
-
-                # Cross
-                elif not left_tile and not right_tile and not bottom_tile and not top_tile:
-                    texture = wall_nozw
-
-                # Endings
-                elif not left_tile and right_tile and bottom_tile and top_tile:
-                    texture = wall_w
-                elif left_tile and right_tile and bottom_tile and not top_tile:
-                    texture = wall_n
-                elif left_tile and not right_tile and bottom_tile and top_tile:
-                    texture = wall_o
-                elif left_tile and right_tile and not bottom_tile and top_tile:
-                    texture = wall_z
-
-                # Straights
-                elif not left_tile and not right_tile and bottom_tile and top_tile:
-                    texture = wall_ow
-                elif left_tile and right_tile and not bottom_tile and not top_tile:
-                    texture = wall_nz
-
-                # T crosses
-                elif not left_tile and not right_tile and not bottom_tile and top_tile:
-                    texture = wall_ozw
-                elif not left_tile and not right_tile and bottom_tile and not top_tile:
-                    texture = wall_now
-                elif left_tile and not right_tile and not bottom_tile and not top_tile:
-                    texture = wall_noz
-                elif not left_tile and right_tile and not bottom_tile and not top_tile:
-                    texture = wall_nzw
-
-                # Solid
-                elif left_tile and right_tile and bottom_tile and top_tile:
-                    texture = wall_solid
-
-                else:
-                    texture = walls
-            background.paste(texture, (index * tile_size_width, height_row * tile_size_height), texture)
-            if safe_zone[height_row, index]:
-                background.paste(safe_zone_texture, (index * tile_size_width, height_row * tile_size_height),
-                                 safe_zone_texture)
-
-    return background
+    tile_ids = tile_kinds(maze, leaves) * 2 + safe_zone
+    return Image.fromarray(tiles_to_image(texture_atlas()[tile_ids]))
+
+
+@lru_cache(maxsize=None)
+def agent_sprite(index: int) -> Image:
+    """Get the sprite of the agent with the given index, recoloured for the index."""
+    # Increase Reds and decrease Greens
+    r, g, b, alpha = load_texture("agent").split()
+    return Image.merge('RGBA', (r.point(lambda i: i * index), g.point(lambda i: i * index), b, alpha))
+
+
+@lru_cache(maxsize=None)
+def cloud_texture() -> Image:
+    """Get the texture of a cloud, as RGBA."""
+    return load_texture("cloud").convert("RGBA")
+
+
+@lru_cache(maxsize=8)
+def cloud_tiles(shape: Tuple[int, int]) -> np.array:
+    """Get an RGBA image array with a cloud on every tile of a map of the given shape."""
+    return np.tile(np.array(cloud_texture()), (*shape, 1))
+
+
+@lru_cache(maxsize=None)
+def status_font() -> ImageFont.ImageFont:
+    """Get the font of the text at the top of the renders, the default font, loaded once."""
+    return ImageFont.load_default()
+
+
+def draw_status_text(frame: Image, text: str) -> None:
+    """Draw the text at the top of a render."""
+    ImageDraw.Draw(frame).text((5, 0), text, font=status_font())
+
+
+def tile_size(env) -> Tuple[int, int]:
+    """Get the width and height of a tile in the renders of the environment."""
+    return env.rendered_background.width // env.maze.shape[0], env.rendered_background.height // env.maze.shape[1]
 
 
 def render_agent_in_step(env, render_agent_id: Union[int, None] = None) -> Image:
@@ -185,51 +216,115 @@ def render_agent_in_step(env, render_agent_id: Union[int, None] = None) -> Image
     :param render_agent_id: Id of the agent to follow the explored map of
     :return: Returns image of current step
     """
+    return render_state(env.rendered_background,
+                        [runner.location for runner in env.runners],
+                        [runner.assigned_task for runner in env.runners],
+                        None if render_agent_id is None else env.runners[render_agent_id].explored,
+                        status_text(env.time, env.time_till_end_of_day()))
+
+
+def status_text(time: int, time_till_end_of_day: int) -> str:
+    """Get the text that's shown at the top of the renders."""
+    return f"Time: {time}, time left till end of day: {time_till_end_of_day}"
+
+
+def render_state(background: Image, locations: Sequence[Coord], tasks: Sequence[Coord], explored: Union[np.array, None],
+                 text: str) -> Image:
+    """
+    Render a state of an environment, this is how every frame is rendered.
+
+    :param background: Rendered background of the maze
+    :param locations: Location (x, y) of every runner
+    :param tasks: Assigned task (x, y) of every runner
+    :param explored: Explored map of the runner to follow, None to not cover anything with clouds
+    :param text: Text to put at the top
+    :return: Returns image of the state, RGBA when it's covered with clouds
+    """
     # Copy from background
-    copy_background = env.rendered_background.copy()
-    # Declare with images used for the agent
-    agent_icon = Image.open(textures_path / "agent.png")
+    frame = background.copy()
+    tile_height, tile_width = texture_atlas().shape[1:3]
 
-    # Calculate canvas size of the maze
-    tile_width = env.rendered_background.width // env.maze.shape[0]
-    tile_height = env.rendered_background.height // env.maze.shape[1]
+    for index, (x, y) in enumerate(locations):
+        sprite = agent_sprite(index)
+        frame.paste(sprite, (x * tile_width, y * tile_height), sprite)
 
-    # Load marker sprite
-    targer_marker = Image.open(textures_path / "objective_marker.png")
+    if explored is not None:
+        frame = add_fog(frame, explored)
 
-    for index, runner in enumerate(env.runners):
-        agent_icon_copy = agent_icon.copy()
+    marker = load_texture("objective_marker")
+    for x, y in tasks:
+        frame.paste(marker, (x * tile_width, y * tile_height), marker)
+    draw_status_text(frame, text)
 
-        # Split into 3 channels
-        r, g, b, alph = agent_icon_copy.split()
+    return frame
 
-        # Increase Reds
-        r = r.point(lambda i: i * index)
 
-        # Decrease Greens
-        g = g.point(lambda i: i * index)
+def repaint_tiles(frame: Image, background: Image, tiles: Iterable[Coord], locations: Sequence[Coord], tasks: Sequence[Coord],
+                  explored: Union[np.array, None]) -> None:
+    """
+    Paint tiles of a rendered state again, the same way `render_state` paints them, the text isn't painted.
 
-        # Recombine back to RGB image
-        agent_icon_copy = Image.merge('RGBA', (r, g, b, alph))
+    :param frame: Rendered state to paint the tiles on
+    :param tiles: The (x, y) of the tiles to paint
+    :return: the other parameters are the same as those of `render_state`
+    """
+    tile_height, tile_width = texture_atlas().shape[1:3]
+    sprites, markers = {}, {}
+    for index, (x, y) in enumerate(locations):
+        sprites.setdefault((x, y), []).append(agent_sprite(index))
+    for x, y in tasks:
+        markers[x, y] = markers.get((x, y), 0) + 1
+    cloud, marker = cloud_texture(), load_texture("objective_marker")
+
+    for x, y in tiles:
+        box = (x * tile_width, y * tile_height, (x + 1) * tile_width, (y + 1) * tile_height)
+        tile = background.crop(box)
+        for sprite in sprites.get((x, y), ()):
+            tile.paste(sprite, (0, 0), sprite)
+        if explored is not None:
+            tile = tile.convert("RGBA")
+            if not explored[y, x]:
+                tile = Image.alpha_composite(tile, cloud)
+        for _ in range(markers.get((x, y), 0)):
+            tile.paste(marker, (0, 0), marker)
+        frame.paste(tile, box[:2])
+
+
+def text_tiles(background: Image, text: str) -> Set[Coord]:
+    """
+    Get the (x, y) of the tiles that the text at the top of a render is on, or might be on.
 
-        copy_background.paste(
-            agent_icon_copy,
-            (runner.location[0] * tile_width, runner.location[1] * tile_height),
-            agent_icon_copy
-        )
+    Measuring the text takes longer than repainting a few tiles, so every digit is measured as the widest digit,
+    and the tiles are only computed again when the text gets longer or shorter.
+    """
+    widest_digit = max('0123456789', key=status_font().getlength)
+    return _text_tiles(background.size, ''.join(widest_digit if c.isdigit() else c for c in text))
 
-    if render_agent_id is not None:
-        copy_background = render_explored_maze(copy_background, env.runners[render_agent_id])
 
-    for index, runner in enumerate(env.runners):
-        copy_background.paste(
-            targer_marker,
-            (runner.assigned_task[0] * tile_width, runner.assigned_task[1] * tile_height),
-            targer_marker
-        )
-    ImageDraw.Draw(copy_background).text((5, 0), f"Time: {env.time}, time left till end of day: {env.time_till_end_of_day()}")
+@lru_cache(maxsize=16)
+def _text_tiles(size: Tuple[int, int], text: str) -> Set[Coord]:
+    """Get the (x, y) of the tiles that the text is on, in a render of the given size, see `text_tiles`."""
+    tile_height, tile_width = texture_atlas().shape[1:3]
+    left, top, right, bottom = status_font().getbbox(text)
+    left, right = left + 5, right + 5
+    return {(x, y)
+            for x in range(max(left // tile_width, 0), min((right - 1) // tile_width + 1, size[0] // tile_width))
+            for y in range(max(top // tile_height, 0), min((bottom - 1) // tile_height + 1, size[1] // tile_height))}
 
-    return copy_background
+
+def add_fog(image: Image, explored: np.array) -> Image:
+    """
+    Cover the tiles that aren't explored with clouds.
+
+    :param image: Rendered maze
+    :param explored: map of booleans, True means explored
+    :return: RGBA image with the clouds
+    """
+    clouds = cloud_tiles(explored.shape)
+    tile_height, tile_width = clouds.shape[0] // explored.shape[0], clouds.shape[1] // explored.shape[1]
+    fog = np.repeat(np.repeat(np.logical_not(explored), tile_height, axis=0), tile_width, axis=1)
+    cloud_layer = Image.fromarray(clouds * fog[:, :, None])
+    return Image.alpha_composite(image.convert("RGBA"), cloud_layer)
 
 
 def render_explored_maze(background_image: Image, runner: Runner) -> Image:
@@ -240,25 +335,53 @@ def render_explored_maze(background_image: Image, runner: Runner) -> Image:
     :param runner: Runner used for rendering
     :return: Returns image of current step
     """
-    # Copy from background
-    copy_background = background_image.copy().convert("RGBA")
-    # Declare with images used for the agent
-    cloud_img = Image.open(textures_path / "cloud.png")
+    return add_fog(background_image, runner.explored)
 
-    # Calculate canvas size of the maze
-    tile_width = background_image.width // runner.explored.shape[0]
-    tile_height = background_image.height // runner.explored.shape[1]
 
-    # Create cloud canvas layer
-    cloud_layer = Image.new(mode="RGBA", size=(background_image.width, background_image.height))
-
-    # Loop through values from the maze and determine where the walls and path are
-    for height_row, width_values in enumerate(runner.explored):
-        for index, is_known_tile in enumerate(width_values):
-            if not is_known_tile:
-                cloud_layer.paste(cloud_img, (index * tile_width, height_row * tile_height))
+class IncrementalRenderer:
+    """
+    Render the steps of an environment, repainting only the tiles that changed since the previous frame.
 
-    # Blend cloud layer with background
-    blended_background = Image.alpha_composite(copy_background, cloud_layer)
+    The renderer makes the environment keep track of the tiles that change (see `MazeRunnerEnv.take_changes`),
+    those tiles and the tiles under the text are repainted on the previous frame.
+    The frames are the same as the frames of `render_agent_in_step`.
+    """
 
-    return blended_background
+    def __init__(self, env):
+        """
+        Initialize the renderer.
+
+        :param env: The environment to render
+        """
+        self.env = env
+        self.env.track_changes = True
+        self.frame: Union[Image.Image, None] = None
+        self.follow_runner_id: Union[int, None] = None
+        self.text_tiles: Set[Coord] = set()
+
+    def render(self, follow_runner_id: Union[int, None] = None) -> Image:
+        """
+        Render the current step of the environment.
+
+        The same image is updated for every frame, copy it to keep a frame.
+
+        :param follow_runner_id: Id of the agent to follow the explored map of
+        :return: Returns image of current step
+        """
+        env = self.env
+        with env.profiler.phase('render'):
+            changed_tiles = env.take_changes()
+            text = status_text(env.time, env.time_till_end_of_day())
+            tiles_under_text = text_tiles(env.rendered_background, text)
+
+            if self.frame is None or changed_tiles is None or follow_runner_id != self.follow_runner_id:
+                self.frame = render_agent_in_step(env, follow_runner_id)
+                self.follow_runner_id = follow_runner_id
+            else:
+                repaint_tiles(self.frame, env.rendered_background, changed_tiles | self.text_tiles | tiles_under_text,
+                              [runner.location for runner in env.runners],
+                              [runner.assigned_task for runner in env.runners],
+                              None if follow_runner_id is None else env.runners[follow_runner_id].explored)
+                draw_status_text(self.frame, text)
+            self.text_tiles = tiles_under_text
+            return self.frame
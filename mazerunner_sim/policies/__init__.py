@@ -1,4 +1,5 @@
-from mazerunner_sim.policies.base_policy import BasePolicy
+from mazerunner_sim.policies.base_policy import BasePolicy, decide_grouped_actions, decide_runner_actions
 from mazerunner_sim.policies.pure_random_policy import PureRandomPolicy
 from mazerunner_sim.policies.path_finding_policy import PathFindingPolicy
 from mazerunner_sim.policies.leaf_tracker_policy import LeafTrackerPolicy
+from mazerunner_sim.policies.heuristic_policy import HeuristicPolicy
@@ -1,7 +1,12 @@
 """Class file for making policies."""
 import abc
+from typing import Dict, List, Sequence
 
-from mazerunner_sim.utils.observation_and_action import Observation, Action
+import numpy as np
+
+from mazerunner_sim.utils.observation_and_action import Observation, Action, ObservationBatch, ActionBatch
+from mazerunner_sim.utils.profiling import NULL_PROFILER
+from mazerunner_sim.utils.seeding import Seed, seed_sequence
 
 
 class BasePolicy(metaclass=abc.ABCMeta):
@@ -9,13 +14,94 @@ class BasePolicy(metaclass=abc.ABCMeta):
     Most generic agent class.
 
     Each agent should have the function observation_action.
+    Policies that can decide for many observations at once can implement `decide_actions` as well.
+    Policies that make random choices draw them from `rng`, so a seeded episode is reproducible, see `seed`.
     """
 
+    _rng: np.random.Generator = None
+
     @abc.abstractmethod
     def decide_action(self, observation: Observation) -> Action:
         """Take an action based on the given observation."""
         raise NotImplementedError
 
+    def decide_actions(self, observations: ObservationBatch) -> ActionBatch:
+        """
+        Take an action for every observation in the batch, by default by deciding them one at a time.
+
+        The observations can be of different runners, a policy that keeps state per runner
+        should only get batches of observations of the runner it belongs to.
+        """
+        return ActionBatch.from_actions([self.decide_action(observation) for observation in observations.observations])
+
     def reset(self):
         """Reset the policy."""
         pass
+
+    @property
+    def rng(self) -> np.random.Generator:
+        """The random generator of the policy, seeded from the global random state when it wasn't seeded before it's used."""
+        if self._rng is None:
+            self.seed(None)
+        return self._rng
+
+    def seed(self, seed: Seed = None) -> None:
+        """
+        Seed the random generator of the policy, see `mazerunner_sim.utils.seeding`.
+
+        :param seed: Seed, None to seed from the global random state
+        """
+        self._rng = np.random.default_rng(seed_sequence(seed))
+
+
+def policy_phase(policy: BasePolicy) -> str:
+    """Name of the profiling phase of the decisions of a policy."""
+    return f'policy_{type(policy).__name__}'
+
+
+def decide_grouped_actions(policies: Sequence[BasePolicy], observations: Sequence[Observation], profiler=NULL_PROFILER) -> List[Action]:
+    """
+    Decide the action for every observation, the observations of the same policy (instance) are decided as one batch.
+
+    Policies with a single observation, or without their own `decide_actions`, decide one at a time in the order of the
+    observations, just like calling `decide_action` for every observation. The batches are decided after those.
+
+    :param policies: the policy of every observation, a policy can be shared by many runners and environments
+    :param observations: the observations
+    :param profiler: times the decisions per policy class, see `mazerunner_sim.utils.profiling`
+    :return: the action for every observation
+    """
+    groups: Dict[int, List[int]] = {}
+    for i, policy in enumerate(policies):
+        groups.setdefault(id(policy), []).append(i)
+
+    actions: List[Action] = [None] * len(observations)
+    for i, policy in enumerate(policies):
+        if len(groups[id(policy)]) == 1 or type(policy).decide_actions is BasePolicy.decide_actions:
+            with profiler.phase(policy_phase(policy)):
+                actions[i] = policy.decide_action(observations[i])
+
+    for ids in groups.values():
+        policy = policies[ids[0]]
+        if len(ids) > 1 and type(policy).decide_actions is not BasePolicy.decide_actions:
+            with profiler.phase(policy_phase(policy)):
+                batch = ObservationBatch.stack([observations[i] for i in ids])
+                decided = policy.decide_actions(batch).to_actions()
+            for i, action in zip(ids, decided):
+                actions[i] = action
+    return actions
+
+
+def decide_runner_actions(policies: Sequence[BasePolicy], observations: Dict[int, Observation],
+                          profiler=NULL_PROFILER) -> Dict[int, Action]:
+    """
+    Decide the actions of the runners of an environment, see `decide_grouped_actions`.
+
+    :param policies: the policy of every runner, indexed by runner id
+    :param observations: the observations by runner id, as the environment gives them
+    :param profiler: times the decisions per policy class
+    :return: the actions by runner id
+    """
+    runner_ids = list(observations)
+    actions = decide_grouped_actions([policies[i] for i in runner_ids], [observations[i] for i in runner_ids], profiler)
+    return dict(zip(runner_ids, actions))
@@ -0,0 +1,90 @@
+"""Policy with a simple heuristic that decides for a whole batch of observations at once."""
+
+import numpy as np
+
+from mazerunner_sim.policies import BasePolicy
+from mazerunner_sim.utils.distance_oracle import DistanceOracle
+from mazerunner_sim.utils.observation_and_action import Observation, Action, ObservationBatch, ActionBatch
+
+# Offset (dx, dy) of every step direction, in the order of the directions in `Action`
+STEP_OFFSETS = np.array([[0, -1], [0, 1], [-1, 0], [1, 0], [0, 0]])
+
+
+class HeuristicPolicy(BasePolicy):
+    """
+    Policy that looks one step ahead, it doesn't plan paths and doesn't keep any state, so one instance can serve all runners.
+
+    Every step goes to the open neighbour that reveals the most unexplored tiles, or gets closest to the assigned task
+    when there is nothing to reveal, ties are broken randomly.
+    When the time left is needed to get back to the safe zone, the runner steps back along the shortest path instead.
+    All of this is a few array operations over the whole batch.
+    """
+
+    def __init__(self, explore_weight: float = 1., task_weight: float = 0.1, retreat_margin: int = 2):
+        """
+        Initialize the policy.
+
+        :param explore_weight: How much the number of tiles a step reveals weighs
+        :param task_weight: How much the distance to the assigned task after a step weighs
+        :param retreat_margin: Number of extra actions to keep for getting back to the safe zone
+        """
+        self.explore_weight = explore_weight
+        self.task_weight = task_weight
+        self.retreat_margin = retreat_margin
+
+    def decide_action(self, observation: Observation) -> Action:
+        """Take an action, as a batch of one observation."""
+        return self.decide_actions(ObservationBatch.stack([observation])).to_actions()[0]
+
+    def decide_actions(self, observations: ObservationBatch) -> ActionBatch:
+        """Take an action for every observation at once."""
+        n = observations.size
+        known_maze, explored = observations.maps('known_maze'), observations.maps('explored')
+        _, height, width = known_maze.shape
+        batch = np.arange(n)[:, None]
+
+        # The tiles each step would end on, steps out of the maze or into a wall aren't possible
+        ends = observations.runner_location[:, None, :] + STEP_OFFSETS[None, :4, :]
+        end_x, end_y = np.clip(ends[..., 0], 0, width - 1), np.clip(ends[..., 1], 0, height - 1)
+        possible = (ends[..., 0] == end_x) & (ends[..., 1] == end_y) & known_maze[batch, end_y, end_x]
+
+        # Number of unexplored tiles in the 3x3 block around every tile
+        unexplored = np.pad(np.logical_not(explored), ((0, 0), (1, 1), (1, 1))).astype(int)
+        revealed = sum(unexplored[:, dy:dy + height, dx:dx + width] for dy in range(3) for dx in range(3))
+        distance_to_task = np.abs(end_x - observations.assigned_task[:, None, 0]) + np.abs(end_y - observations.assigned_task[:, None, 1])
+        scores = revealed[batch, end_y, end_x] * self.explore_weight - distance_to_task * self.task_weight
+        scores = np.where(possible, scores + self.rng.random(scores.shape) * 1e-3, -np.inf)
+
+        # Going back to the safe zone goes first when there's just enough time left
+        distance_to_safe_zone = np.stack([self._distance_to_safe_zone(o) for o in observations.observations])
+        x, y = observations.runner_location[:, 0], observations.runner_location[:, 1]
+        actions_left = observations.time_till_end_of_day // (observations.action_speed + 1)
+        here = distance_to_safe_zone[np.arange(n), y, x]
+        retreat = (here > 0) & (here + self.retreat_margin >= actions_left)
+        closer = possible & (distance_to_safe_zone[batch, end_y, end_x] == here[:, None] - 1)
+        scores = np.where(retreat[:, None], np.where(closer, scores, -np.inf), scores)
+
+        step_direction = np.where(np.isfinite(scores).any(axis=1), scores.argmax(axis=1), Action.STAY)
+        step_direction = np.where((here == 0) & (actions_left <= self.retreat_margin), Action.STAY, step_direction)
+
+        return ActionBatch(
+            step_direction=step_direction,
+            task_worths=[self._task_worths(o) for o in observations.observations],
+            hold=np.zeros(n, dtype=int)
+        )
+
+    @staticmethod
+    def _distance_to_safe_zone(observation: Observation) -> np.array:
+        """Get the steps to the safe zone from every tile of the known maze of the observation, -1 when it can't be reached."""
+        oracle = observation.distance_oracle
+        if oracle is None:
+            oracle = DistanceOracle(observation.known_maze, observation.safe_zone)
+        return oracle.distance_to_safe_zone
+
+    @staticmethod
+    def _task_worths(observation: Observation) -> list:
+        """Tasks closer to the runner are worth more."""
+        if len(observation.tasks) == 0:
+            return []
+        distances = np.abs(np.array(observation.tasks) - observation.runner_location).sum(axis=1)
+        return (1 / (distances + 1)).tolist()
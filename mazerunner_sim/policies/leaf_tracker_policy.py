@@ -1,10 +1,11 @@
 """Policy that uses Bayes Theorem on the leaves."""
 
-from typing import List, Tuple
+from typing import List, Union
 
 import numpy as np
 
 from mazerunner_sim.policies import PathFindingPolicy
+from mazerunner_sim.utils.exit_posterior import ExitPosterior
 from mazerunner_sim.utils.observation_and_action import Observation, Action
 from mazerunner_sim.utils.pathfinder import Coord, manhattan_distance
 
@@ -20,26 +21,14 @@ class LeafTrackerPolicy(PathFindingPolicy):
         :param leaf_weight: How much the expected exist according to the leaves should weigh in the evaluation of a path
         """
         super().__init__(outside_weight=outside_weight, path_length_weight=path_length_weight, task_weight=task_weight)
+        self.exit_posterior: Union[ExitPosterior, None] = None
 
     def decide_action(self, observation: Observation) -> Action:
         """Take an action, using the observed leaves."""
-        known_leaves, known_not_leaves = [], []
-        for y, x in zip(*np.where(observation.known_maze)):
-            if observation.known_leaves[y, x]:
-                known_leaves.append((x, y))
-            else:
-                known_not_leaves.append((x, y))
-
-        # This part could be more efficient
-        # Calculate the probability for each possible exit
-        height, width = observation.known_maze.shape
-        self.probs_exits = {
-            proposed_exit: self.calc_probability_exit(proposed_exit, known_leaves, known_not_leaves, observation.known_maze.shape)
-            for proposed_exit in [
-                (0, 0), (0, height - 1), (width - 1, 0), (width - 1, height - 1),
-                (0, height // 2), (width // 2, 0), (width - 1, height // 2), (height // 2, height - 1)
-            ]
-        }
+        # Update the probability of each border tile being the exit with the leaves that weren't seen before
+        if self.exit_posterior is None or self.exit_posterior.shape != observation.known_maze.shape:
+            self.exit_posterior = ExitPosterior(observation.known_maze.shape)
+        self.exit_posterior.update(observation.known_maze, observation.known_leaves)
 
         return super().decide_action(observation)
 
@@ -67,7 +56,7 @@ class LeafTrackerPolicy(PathFindingPolicy):
         q_value -= min(target_x, map_width - target_x, target_y, map_height - target_y)
 
         # Expected exit according to the leaves
-        # for anchor, prob in self.probs_exits.items():
+        # for anchor, prob in zip(self.exit_posterior.candidates.tolist(), self.exit_posterior.probabilities):
         #     q_value += prob / (manhattan_distance((target_x, target_y), anchor) + 0.01) * self.leaf_weight
 
         # Follow task
@@ -75,33 +64,24 @@ class LeafTrackerPolicy(PathFindingPolicy):
 
         return q_value
 
-    @staticmethod
-    def calc_probability_exit(proposed_exit: Coord, known_leaves: List[Coord],
-                              known_not_leaves: List[Coord], maze_shape: Tuple[int, int]) -> float:
-        """
-        Calculate the probability of the proposed_exit being the actual exit given the known leaves.
-
-        :param proposed_exit: the proposed exit location
-        :param known_leaves: the coordinates known to have leaves
-        :param known_not_leaves: the coordinates known to not have leaves
-        :return: The probability of the proposed exit being the actual exit,
-                 the probability isn't on the 0.0 - 1.0 scale, but relative to other exits.
-                 Because this is less calculation and all that's needed to compare probable exits.
-        :param maze_shape: Shape of the maze
-        """
-        largest_dist = sum(maze_shape) - 4
-        return float(np.prod([1 - manhattan_distance(coord, proposed_exit) / largest_dist for coord in known_leaves] +
-                             [manhattan_distance(coord, proposed_exit) / largest_dist for coord in known_not_leaves]
-                             )) * 2**(len(known_not_leaves) + len(known_leaves))
-
-    def q_task(self, observation: Observation) -> List[float]:
-        """
-        Calculate the estimated quality of each of the given tasks.
-
-        :param observation:
-        :return:
-        """
-        return [
-            sum([prob / (manhattan_distance(task, anchor) + 0.01) for anchor, prob in self.probs_exits.items()])
-            for task in observation.tasks
-        ]
+    def q_values_targets(self, targets: np.array, lengths: np.array, observation: Observation) -> np.array:
+        """Calculate the q-values of many paths at once, the same as `q_value_path` of every path."""
+        target_x, target_y = targets[:, 0], targets[:, 1]
+        map_width, map_height = observation.known_maze.shape
+        distance_to_outside = np.minimum.reduce([target_x, map_width - target_x, target_y, map_height - target_y])
+        distance_to_task = np.abs(observation.assigned_task[0] - target_x) + np.abs(observation.assigned_task[1] - target_y)
+        return -(lengths * self.path_length_weight) - distance_to_outside - distance_to_task
+
+    def task_fingerprint(self, observation: Observation) -> tuple:
+        """Get what the task scores depend on, including the posterior of the exit."""
+        return super().task_fingerprint(observation), self.exit_posterior.version
+
+    def compute_q_task(self, observation: Observation) -> List[float]:
+        """Calculate the estimated quality of each of the given tasks, without caching, see `q_task`."""
+        distances = np.abs(np.array(observation.tasks)[:, None, :] - self.exit_posterior.candidates[None]).sum(axis=-1)
+        return (self.exit_posterior.probabilities / (distances + 0.01)).sum(axis=1).tolist()
+
+    def reset(self):
+        """Reset the planned path and what's known about the exit."""
+        super().reset()
+        self.exit_posterior = None
@@ -1,13 +1,15 @@
 """Policy that uses pathfinding."""
 
-from typing import List
-from math import ceil
+from typing import List, NamedTuple, Tuple, Union
+from math import ceil, inf
 
 import numpy as np
 
 from mazerunner_sim.policies import BasePolicy
 from mazerunner_sim.utils.observation_and_action import Observation, Action
-from mazerunner_sim.utils.pathfinder import Coord, paths_origin_targets, compute_explore_paths, manhattan_distance
+from mazerunner_sim.utils.distance_oracle import DistanceOracle
+from mazerunner_sim.utils.distance_field import DistanceField
+from mazerunner_sim.utils.pathfinder import Coord, manhattan_distance, edge_of_knowledge_map
 
 
 def next_coord_to_step(next_coord: Coord, old_coord: Coord) -> int:
@@ -28,31 +30,25 @@ def next_coord_to_step(next_coord: Coord, old_coord: Coord) -> int:
     }[step]
 
 
-def find_edge_of_knowledge_tiles(known_maze: np.array, explored: np.array) -> List[Coord]:
+class ExploreCandidates(NamedTuple):
     """
-    Find which tiles are on the edge of the known maze.
+    The paths a runner can explore from a location, with what's needed to choose between them.
 
-    :param known_maze: the known maze of the runner
-    :param explored: a mask of what's explored by the runner
-    :return: list of coordinates of all the tiles at the edge of the known maze (and not a wall)
+    The paths are the same as those of `compute_explore_paths`, but they're only traced back when they're needed.
     """
-    explored = np.pad(explored, (1, 1), 'constant', constant_values=False)
-    return [(x, y)
-            for y, x in zip(*np.where(known_maze)) if not
-            (explored[y + 2, x + 1] and explored[y, x + 1] and explored[y + 1, x + 2] and explored[y + 1, x])
-            ]
 
-
-def clip_retreat_path(safe_zone: np.array, path: List[Coord]) -> List[Coord]:
-    """
-    Clip the retreat path so it stops as soon as it's in a safe spot.
-
-    :param safe_zone: map of which tiles are safe
-    :param path: original path to safe zone
-    :return: new path to safe zone that stops at the first safe spot
-    """
-    clipped = [(x, y) for x, y in path if not safe_zone[y, x]]
-    return clipped + [path[len(clipped)]]
+    # Distance field from the location in the known maze, `field.path_to(target)` is the path to a target
+    field: DistanceField
+    # The (x, y) of the end of every path, the tiles on the edge of knowledge in the order of the search
+    targets: np.array
+    # Length of every path
+    lengths: np.array
+    # Length of every path plus the length of the retreat to the nearest safe tile after it
+    costs: np.array
+    # Q-value of every path, NaN until it's needed
+    q_values: np.array
+    # Path back to the safe zone from the location
+    center_path: List[Coord]
 
 
 class PathFindingPolicy(BasePolicy):
@@ -66,54 +62,122 @@ class PathFindingPolicy(BasePolicy):
         :param path_length_weight: How much the length of the disputed path should weigh in the evaluation of the path
         """
         self.planned_path = []
+        self.last_time_till_end_of_day = None
         self.outside_weight = outside_weight
         self.path_length_weight = path_length_weight
         self.task_weight = task_weight
+        self._candidates_fingerprint = None
+        self._candidates: Union[ExploreCandidates, None] = None
+        self._task_scores_fingerprint = None
+        self._task_scores: List[float] = []
 
     def decide_action(self, observation: Observation) -> Action:
         """Take an action, using path finding."""
+        # Drop the steps that were skipped while holding, the environment doesn't ask for an action while holding
+        if self.last_time_till_end_of_day is not None and observation.time_till_end_of_day < self.last_time_till_end_of_day:
+            del self.planned_path[:self.last_time_till_end_of_day - observation.time_till_end_of_day - 1]
+        self.last_time_till_end_of_day = observation.time_till_end_of_day
+
         # When there is no path planned, plan a new plan
         if len(self.planned_path) == 0:
-
-            explore_paths = compute_explore_paths(observation.runner_location, observation.known_maze, observation.explored)
-            explorable_tiles = [path[-1] for path in explore_paths]
-
-            center = observation.known_maze.shape[1] // 2, observation.known_maze.shape[0] // 2
-            *retreat_paths, center_path = paths_origin_targets(center,
-                                                               explorable_tiles + [observation.runner_location],
-                                                               observation.known_maze)
-            center_path = center_path[::-1]
-
-            *retreat_paths, center_path = [clip_retreat_path(observation.safe_zone, p) for p in retreat_paths + [center_path]]
+            candidates = self.explore_candidates(observation)
 
             # Only keep the paths that can be done and retreated within the time left
-            target_validation_mask = [len(tp) + len(tcp) < observation.time_till_end_of_day / (observation.action_speed + 1)
-                                      for tp, tcp in zip(explore_paths, retreat_paths)]
-            if sum(target_validation_mask) > 0:
-                # filter those paths
-                explore_paths = [x for x, valid in zip(explore_paths, target_validation_mask) if valid]
-
-                q_values_paths = [self.q_value_path(target_path, observation) for target_path in explore_paths]
-                best_paths = [path for path, score in zip(explore_paths, q_values_paths) if score == max(q_values_paths)]
-
-                self.planned_path.extend(best_paths[np.random.randint(len(best_paths))])
+            target_validation_mask = candidates.costs < observation.time_till_end_of_day / (observation.action_speed + 1)
+            valid_ids = np.flatnonzero(target_validation_mask)
+            if len(valid_ids) > 0:
+                # The q-values are kept with the candidates, only those that weren't needed before are computed
+                missing_ids = valid_ids[np.isnan(candidates.q_values[valid_ids])]
+                if len(missing_ids) > 0:
+                    candidates.q_values[missing_ids] = self.q_values_targets(candidates.targets[missing_ids],
+                                                                             candidates.lengths[missing_ids], observation)
+                q_values_paths = candidates.q_values[valid_ids]
+                best_ids = valid_ids[q_values_paths == q_values_paths.max()]
+
+                target_x, target_y = candidates.targets[best_ids[self.rng.integers(len(best_ids))]].tolist()
+                self.planned_path.extend(candidates.field.path_to((target_x, target_y)))
             else:
+                center_path = candidates.center_path
                 self.planned_path.extend(center_path)
                 wait_place = center_path[-1] if len(center_path) > 0 else observation.runner_location
                 self.planned_path.extend([wait_place] * ceil(observation.time_till_end_of_day /
                                                              (observation.action_speed + 1) - len(center_path)))
 
         # Follow the planned path
+        hold = 0
         if len(observation.tasks) == 0:
-            step_direction = next_coord_to_step(self.planned_path.pop(0), observation.runner_location)
+            next_coord = self.planned_path.pop(0)
+            step_direction = next_coord_to_step(next_coord, observation.runner_location)
+
+            # Hold while waiting at the same place, the hold has to end before the observation before the night
+            while hold < len(self.planned_path) and self.planned_path[hold] == next_coord:
+                hold += 1
+            hold = max(min(hold, observation.time_till_end_of_day - 1), 0)
         else:
             step_direction = Action.STAY
         action = Action(
             step_direction=step_direction,
-            task_worths=self.q_task(observation)
+            task_worths=self.q_task(observation),
+            hold=hold
         )
         return action
 
+    def plan_fingerprint(self, observation: Observation) -> Union[Tuple, None]:
+        """
+        Get what the explore candidates (see `explore_candidates`) depend on, they're computed again when it changes.
+
+        Subclasses with q-values that depend on more of the observation should add it to the fingerprint.
+
+        :return: the fingerprint, None when the version of the maps isn't known so nothing can be cached
+        """
+        if observation.map_version == 0:
+            return None
+        return observation.map_version, tuple(observation.runner_location), tuple(observation.assigned_task)
+
+    def explore_candidates(self, observation: Observation) -> ExploreCandidates:
+        """
+        Find the paths to explore from the location of the runner, the last candidates are kept until the fingerprint changes.
+
+        The retreat after a path is counted in tiles, like the paths: the distance to the nearest tile of the safe zone
+        plus 1. This is never longer than the path towards the center that stops at its first safe tile, which was
+        counted before, so some targets are now in reach later in the day.
+
+        :param observation: observation to find the paths in
+        :return: the candidates, their q-values are filled in by `decide_action` when they're needed
+        """
+        fingerprint = self.plan_fingerprint(observation)
+        if fingerprint is not None and fingerprint == self._candidates_fingerprint:
+            return self._candidates
+
+        # The tiles on the edge of knowledge that can be reached, in the order of the search, like `compute_explore_paths`
+        field = DistanceField(observation.known_maze, [observation.runner_location])
+        edge_map = observation.edge_of_knowledge
+        if edge_map is None:
+            edge_map = edge_of_knowledge_map(observation.known_maze, observation.explored)
+        reached = field.order[field.num_origins:]
+        reached = reached[edge_map.ravel()[reached]]
+        width = observation.known_maze.shape[1]
+        targets = np.stack([reached % width, reached // width], axis=1)
+        lengths = field.distances.ravel()[reached]
+
+        # The distance back to the safe zone is a lookup in the (cached) distance oracle
+        oracle = observation.distance_oracle
+        if oracle is None:
+            oracle = DistanceOracle(observation.known_maze, observation.safe_zone)
+        distance_to_safe_zone = oracle.distance_to_safe_zone.ravel()[reached]
+        retreat_lengths = np.where(distance_to_safe_zone >= 0, distance_to_safe_zone + 1, inf)
+
+        self._candidates = ExploreCandidates(
+            field=field,
+            targets=targets,
+            lengths=lengths,
+            costs=lengths + retreat_lengths,
+            q_values=np.full(len(reached), np.nan),
+            center_path=oracle.retreat_path(observation.runner_location)
+        )
+        self._candidates_fingerprint = fingerprint
+        return self._candidates
+
     def q_value_path(self, target_path: List[Coord], observation: Observation) -> float:
         """
         Calculate the estimated quality of that action/taking that path.
@@ -136,12 +200,52 @@ class PathFindingPolicy(BasePolicy):
                  len(target_path) * self.path_length_weight +
                  distance_to_task * self.task_weight)
 
+    def q_values_targets(self, targets: np.array, lengths: np.array, observation: Observation) -> np.array:
+        """
+        Calculate the q-values of many paths at once, the same as `q_value_path` of every path.
+
+        Subclasses that override `q_value_path` should override this as well.
+
+        :param targets: the (x, y) of the end of every path, an array with shape [n, 2]
+        :param lengths: the length of every path
+        :param observation: observation to use as extra info to estimate the q-values
+        :return: the q-value of every path
+        """
+        target_x, target_y = targets[:, 0], targets[:, 1]
+        map_width, map_height = observation.known_maze.shape
+
+        distance_to_outside = np.minimum.reduce([target_x, map_width - target_x, target_y, map_height - target_y])
+        distance_to_task = np.abs(observation.assigned_task[0] - target_x) + np.abs(observation.assigned_task[1] - target_y)
+        return -(distance_to_outside * self.outside_weight +
+                 lengths * self.path_length_weight +
+                 distance_to_task * self.task_weight)
+
     def q_task(self, observation: Observation) -> List[float]:
         """
         Calculate the estimated quality of each of the given tasks.
 
+        The scores are kept until their fingerprint (see `task_fingerprint`) changes, tasks are only given before the night.
+
         :return:
         """
+        if len(observation.tasks) == 0:
+            return []
+        fingerprint = self.task_fingerprint(observation)
+        if fingerprint != self._task_scores_fingerprint:
+            self._task_scores = self.compute_q_task(observation)
+            self._task_scores_fingerprint = fingerprint
+        return list(self._task_scores)
+
+    def task_fingerprint(self, observation: Observation) -> tuple:
+        """
+        Get what the task scores (see `compute_q_task`) depend on, they're computed again when it changes.
+
+        Subclasses with task scores that depend on more should add it to the fingerprint.
+        """
+        return tuple(observation.tasks), tuple(observation.runner_location), observation.time_till_end_of_day, observation.action_speed
+
+    def compute_q_task(self, observation: Observation) -> List[float]:
+        """Calculate the estimated quality of each of the given tasks, without caching, see `q_task`."""
         return [
             -(manhattan_distance(observation.runner_location, task) -
               observation.time_till_end_of_day / (observation.action_speed + 1)) ** 2
@@ -151,3 +255,8 @@ class PathFindingPolicy(BasePolicy):
     def reset(self):
         """Reset the planned path of the policy."""
         self.planned_path = []
+        self.last_time_till_end_of_day = None
+        self._candidates_fingerprint = None
+        self._candidates = None
+        self._task_scores_fingerprint = None
+        self._task_scores = []
@@ -1,6 +1,6 @@
 """Example agent that takes random actions."""
 from mazerunner_sim.policies import BasePolicy
-from mazerunner_sim.utils.observation_and_action import Observation, Action
+from mazerunner_sim.utils.observation_and_action import Observation, Action, ObservationBatch, ActionBatch
 
 import numpy as np
 
@@ -11,6 +11,17 @@ class PureRandomPolicy(BasePolicy):
     def decide_action(self, observation: Observation) -> Action:
         """Take a random action, regardless of the observation."""
         return Action(
-            step_direction=np.random.choice([Action.UP, Action.DOWN, Action.LEFT, Action.RIGHT]),
-            task_worths=[np.random.random() for _ in observation.tasks]
+            step_direction=self.rng.choice([Action.UP, Action.DOWN, Action.LEFT, Action.RIGHT]),
+            task_worths=self.rng.random(len(observation.tasks)).tolist()
+        )
+
+    def decide_actions(self, observations: ObservationBatch) -> ActionBatch:
+        """Take a random action for every observation at once."""
+        step_directions = self.rng.choice([Action.UP, Action.DOWN, Action.LEFT, Action.RIGHT], size=observations.size)
+        n_tasks = [len(tasks) for tasks in observations.tasks]
+        task_worths = np.split(self.rng.random(sum(n_tasks)), np.cumsum(n_tasks)[:-1])
+        return ActionBatch(
+            step_direction=step_directions,
+            task_worths=[worths.tolist() for worths in task_worths],
+            hold=np.zeros(observations.size, dtype=int)
         )
@@ -0,0 +1,67 @@
+"""
+Auction that assigns the tasks to the runners at night, on a matrix of worths with a row per runner and a column per task.
+
+Runners without a task bid in turn, in the order of the rows, on the task with the highest worth minus its price,
+and raise the price by the difference with their second-best task plus a small value, outbidding the runner that had it.
+The outbid runner bids again when its turn comes, until every runner has a task.
+Every bid is a few array operations over the tasks, the bookkeeping of who has which task is kept in arrays as well.
+"""
+
+import math
+from typing import Sequence
+
+import numpy as np
+
+
+def auction(worths: np.array) -> np.array:
+    """
+    Assign a task to every runner according to an auction.
+
+    :param worths: worth of every task for every runner, with shape [n_runners, n_tasks], n_tasks >= n_runners
+    :return: the index of the task every runner won, with shape [n_runners]
+    """
+    worths = np.asarray(worths, dtype=float)
+    n_runners, n_tasks = worths.shape
+    task_of_runner = np.full(n_runners, -1)
+    if n_runners == 0:
+        return task_of_runner
+    runner_of_task = np.full(n_tasks, -1)
+    prices = np.zeros(n_tasks)
+    small_value = 1 / (n_runners + 1)
+
+    n_assigned = 0
+    while n_assigned < n_runners:
+        for runner_id in range(n_runners):
+            if task_of_runner[runner_id] >= 0:
+                continue
+            relative_values = worths[runner_id] - prices
+            # Ties go to the last task, the second highest is the runner-up among all other tasks
+            highest_task = n_tasks - 1 - int(np.argmax(relative_values[::-1]))
+            highest = float(relative_values[highest_task])
+            second_highest = float(np.partition(relative_values, -2)[-2]) if n_tasks > 1 else -math.inf
+
+            outbid_runner = runner_of_task[highest_task]
+            if outbid_runner >= 0:
+                task_of_runner[outbid_runner] = -1
+            else:
+                n_assigned += 1
+            runner_of_task[highest_task] = runner_id
+            task_of_runner[runner_id] = highest_task
+            prices[highest_task] = float(prices[highest_task]) + highest - second_highest + small_value
+
+    return task_of_runner
+
+
+def worth_matrix(task_worths: Sequence[Sequence[float]], n_tasks: int) -> np.array:
+    """
+    Make the matrix of worths for the auction from the task worths the runners gave in their actions.
+
+    :param task_worths: the worths of the tasks given by every bidding runner, each is scaled to sum to 1
+    :param n_tasks: number of tasks up for auction
+    :return: the scaled worths, with shape [n_runners, n_tasks]
+    """
+    totals = [sum(runner_worths) for runner_worths in task_worths]
+    if 0 in totals:
+        raise ZeroDivisionError("The task worths of a runner sum to 0")
+    worths = np.array(task_worths, dtype=float).reshape(len(task_worths), n_tasks)
+    return worths / np.array(totals, dtype=float)[:, None]
@@ -1,23 +1,95 @@
 """Batch runner class."""
 
-from typing import TypeVar, Union, Sequence, Tuple
+from typing import Callable, Iterable, TypeVar, Union, Sequence, Tuple
 import abc
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from multiprocessing import Pool
-import random
 from copy import deepcopy
-import pyarrow.feather as feather
-import pyarrow as pa
-import tqdm
+from time import perf_counter
+import os
+import random
+import sys
+import threading
 import numpy as np
+import tqdm
 
 from mazerunner_sim.envs.mazerunner_env import MazeRunnerEnv
-from mazerunner_sim.policies.base_policy import BasePolicy
+from mazerunner_sim.policies.base_policy import BasePolicy, decide_runner_actions, policy_phase
+from mazerunner_sim.utils.profiling import PhaseTimer
+from mazerunner_sim.utils.result_writer import StreamingResultWriter
+from mazerunner_sim.utils.seeding import seed_episode
+from mazerunner_sim.utils.trajectory_recorder import TrajectoryRecorder
 
 HiddenState = TypeVar('HiddenState')
+EnvsAndPolicies = Tuple[Sequence[MazeRunnerEnv], Sequence[BasePolicy]]
+
+# Phases of a run that are timed when profiling, the phases of the policies are added per policy class
+PROFILE_PHASES = ('episode', 'decide', 'step', 'day_step', 'night_step', 'skip_holds', 'observations', 'update', 'record')
+
+# The environments and policies of a worker process in a pool made by `BatchRunner.run_batch_with_factory`
+_worker_envs_and_policies: Union[EnvsAndPolicies, None] = None
+
+
+# The environments and policies of each thread of a pool made by `BatchRunner.run_batch_in_threads`
+_thread_state = threading.local()
+
+# The threads of a pool share the global random state, they call their factories one at a time
+_factory_lock = threading.Lock()
+
+
+def _build_with_factory(factory: Callable[[], EnvsAndPolicies], factory_seed: int) -> EnvsAndPolicies:
+    """
+    Call a factory with the global random state seeded, so every worker builds the same environments and policies.
+
+    The global random state is restored afterwards.
+    """
+    with _factory_lock:
+        random_state, np_random_state = random.getstate(), np.random.get_state()
+        random.seed(factory_seed)
+        np.random.seed(factory_seed)
+        try:
+            return factory()
+        finally:
+            random.setstate(random_state)
+            np.random.set_state(np_random_state)
+
+
+def _init_worker(factory: Callable[[], EnvsAndPolicies], factory_seed: int) -> None:
+    """Build the environments and policies of a worker process, once."""
+    global _worker_envs_and_policies
+    _worker_envs_and_policies = _build_with_factory(factory, factory_seed)
+
+
+def _init_thread(envs_and_policies: Union[EnvsAndPolicies, None], factory: Union[Callable[[], EnvsAndPolicies], None],
+                 factory_seed: int) -> None:
+    """Copy the environments and policies for a worker thread, or build them with the factory, once."""
+    if factory is None:
+        _thread_state.envs_and_policies = deepcopy(envs_and_policies)
+    else:
+        _thread_state.envs_and_policies = _build_with_factory(factory, factory_seed)
+
+
+def gil_enabled() -> bool:
+    """Whether the interpreter has a GIL, free-threaded builds of python 3.13+ can run without it."""
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return True if is_gil_enabled is None else is_gil_enabled()
 
 
 class BatchRunner(metaclass=abc.ABCMeta):
-    """Batch runner class."""
+    """
+    Batch runner class.
+
+    Set `trajectory_columns` to record the state of every time-step with a `TrajectoryRecorder`,
+    the recording is added to the results as `trajectory_*` columns.
+
+    Set `profile` to time the phases of every run with a `PhaseTimer`, the wall time and number of calls of every phase
+    are added to the results as `profile_<phase>_seconds` and `profile_<phase>_calls` columns, and the totals of the
+    batch are printed at the end. The phases nest: `episode` is the whole run, `decide` holds the `policy_<class>` phases
+    and `step` holds the phases of the environment.
+    """
+
+    trajectory_columns: Sequence[str] = ()
+    profile: bool = False
 
     def __init__(self, filename: str):
         """
@@ -54,41 +126,168 @@ class BatchRunner(metaclass=abc.ABCMeta):
         """
         env, policies, seed = env_policies_seed
 
-        # Set seed
-        random.seed(seed)
-        np.random.seed(seed)
+        # Seed the random streams of the environment, the runners and the policies
+        seed_episode(env, policies, seed)
 
         hidden_state = None
         done = False
-        observations = env.get_observations(first_observation=True)
+        recorder = TrajectoryRecorder(cls.trajectory_columns) if cls.trajectory_columns else None
+        # Every run has the same phases, so every row of the results has the same columns
+        profiler = PhaseTimer(PROFILE_PHASES + tuple(sorted({policy_phase(p) for p in policies}))) if cls.profile else env.profiler
+        env_profiler, env.profiler = env.profiler, profiler
         try:
-            while not done:
-                # For every agent, decide an action according to the observation
-                actions = {runner_id: policies[runner_id].decide_action(observation) for runner_id, observation in observations.items()}
+            with profiler.phase('episode'):
+                observations = env.get_observations(first_observation=True)
+                if recorder is not None:
+                    recorder.record(env)
+                while not done:
+                    # For every agent, decide an action according to the observation
+                    with profiler.phase('decide'):
+                        actions = decide_runner_actions(policies, observations, profiler)
 
-                # Let the actions take place in the environment
-                observations, reward, done, info = env.step(actions)
+                    # Let the actions take place in the environment
+                    with profiler.phase('step'):
+                        observations, reward, done, info = env.step(actions)
 
-                # Update data
-                hidden_state = cls.update(env, hidden_state)
+                    # Update data
+                    with profiler.phase('update'):
+                        hidden_state = cls.update(env, hidden_state)
+                    if recorder is not None:
+                        with profiler.phase('record'):
+                            recorder.record(env)
             summary = cls.finish(env, hidden_state)
+            summary['seed'] = seed
+            if recorder is not None:
+                summary.update(recorder.to_record())
+            if cls.profile:
+                summary.update(profiler.to_record())
             return summary
         except Exception as e:
             print(f"A Error occurred: {e}. Skipping this run in the batch")
             return None
+        finally:
+            env.profiler = env_profiler
 
-    def run_batch(self, envs: Sequence[MazeRunnerEnv], policies: Sequence[BasePolicy], batch_size: int) -> None:
+    def run_batch(self, envs: Sequence[MazeRunnerEnv], policies: Sequence[BasePolicy], batch_size: int, resume: bool = False) -> float:
         """
         Run a batch of simulations and write the results to a feather file.
         The results are not in order because of multiprocessing, faster simulations are more likely to be at the earlier rows.
+        Each result is streamed to a journal next to the feather file as soon as it's done, see `StreamingResultWriter`,
+        the `seed` column tells which run a row belongs to.
 
+        :param resume: Continue an earlier batch with the same filename that didn't finish, skipping the seeds already done
+        :return: the throughput, in runs per second
         """
-        simulator_params = [(deepcopy(envs[i % len(envs)]), policies, i) for i in range(batch_size)]
-        with Pool() as pool:
-            results = []
-            for result in tqdm.tqdm(pool.imap_unordered(self._run_single, simulator_params), total=batch_size):
-                if result is not None:
-                    results.append(result)
-        # save results
-        table = pa.table({column: [row[column] for row in results] for column in results[0].keys()})
-        feather.write_feather(table, self.filename)
+        start = perf_counter()
+        with StreamingResultWriter(self.filename, resume=resume) as writer:
+            seeds = [i for i in range(batch_size) if i not in writer.completed_seeds]
+            simulator_params = [(deepcopy(envs[i % len(envs)]), policies, i) for i in seeds]
+            with Pool() as pool:
+                self._write_results(writer, pool.imap_unordered(self._run_single, simulator_params), len(seeds))
+        return self._report_throughput('processes', len(seeds), start)
+
+    def run_batch_with_factory(self, factory: Callable[[], EnvsAndPolicies], batch_size: int, chunksize: int = 1,
+                               maxtasksperchild: Union[int, None] = None, resume: bool = False, factory_seed: int = 0) -> float:
+        """
+        Run a batch of simulations like `run_batch`, but let every worker process build its own environments and policies.
+
+        Each worker calls the factory once when it starts, the tasks sent to the workers are just the seeds.
+        Before a run, the environment and policies are reset, so every run starts like a fresh copy would.
+        This saves pickling an environment for every run, which can take longer than a short simulation itself.
+
+        The workers call the factory with `random` and `np.random` seeded with `factory_seed`, so they all build the same
+        mazes. The results are those of `run_batch` with the environments and policies the factory returns after seeding
+        them like that, whatever the number of workers.
+
+        :param factory: Function without arguments that returns the environments and the policies, like the arguments of
+                        `run_batch`. It's sent to the workers, so it has to be picklable, like a function defined at module level.
+                        It should only draw random numbers from the global random state, or from its own seeds,
+                        like `MazeRunnerEnv(seed=...)` or `MazeRunnerEnv.from_corpus`.
+        :param batch_size: Number of simulations, seed `i` runs in environment `i % len(envs)`
+        :param chunksize: Number of seeds sent to a worker at once
+        :param maxtasksperchild: Number of seeds a worker runs before it's replaced by a new one, None to keep the workers
+        :param resume: Continue an earlier batch with the same filename that didn't finish, skipping the seeds already done
+        :param factory_seed: Seed of the global random state when the factory is called
+        :return: the throughput, in runs per second
+        """
+        start = perf_counter()
+        with StreamingResultWriter(self.filename, resume=resume) as writer:
+            seeds = [i for i in range(batch_size) if i not in writer.completed_seeds]
+            with Pool(initializer=_init_worker, initargs=(factory, factory_seed), maxtasksperchild=maxtasksperchild) as pool:
+                results = pool.imap_unordered(self._run_in_worker, seeds, chunksize=chunksize)
+                self._write_results(writer, results, len(seeds))
+        return self._report_throughput('processes', len(seeds), start)
+
+    def run_batch_in_threads(self, envs: Union[Sequence[MazeRunnerEnv], None], policies: Union[Sequence[BasePolicy], None],
+                             batch_size: int, factory: Union[Callable[[], EnvsAndPolicies], None] = None,
+                             factory_seed: int = 0, max_workers: Union[int, None] = None, resume: bool = False) -> float:
+        """
+        Run a batch of simulations like `run_batch`, but on a pool of threads in this process.
+
+        Each thread makes a copy of the environments and policies once, or builds its own with the factory like
+        `run_batch_with_factory`, and resets them before every run. Nothing is pickled and no processes are started.
+        Every run draws from its own random streams (see `mazerunner_sim.utils.seeding`), so the results are the same as
+        those of `run_batch` with the same environments and policies. With the GIL, the threads only run side by side
+        while numpy works, on a free-threaded python (see `gil_enabled`) they run fully in parallel.
+        For cheap policies, this can beat the process pools, compare the throughput the batch methods return.
+
+        :param envs: The environments, like `run_batch`, None when using a factory
+        :param policies: The policies of the runners, like `run_batch`, None when using a factory
+        :param batch_size: Number of simulations, seed `i` runs in environment `i % len(envs)`
+        :param factory: Function without arguments that returns the environments and the policies, used instead of copying
+                        them, it doesn't have to be picklable
+        :param factory_seed: Seed of the global random state when the factory is called, see `run_batch_with_factory`
+        :param max_workers: Number of threads, by default the number of CPUs
+        :param resume: Continue an earlier batch with the same filename that didn't finish, skipping the seeds already done
+        :return: the throughput, in runs per second
+        """
+        if factory is None and (envs is None or policies is None):
+            raise ValueError("Give the environments and policies, or a factory that builds them")
+        start = perf_counter()
+        with StreamingResultWriter(self.filename, resume=resume) as writer:
+            seeds = [i for i in range(batch_size) if i not in writer.completed_seeds]
+            with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=_init_thread,
+                                    initargs=((envs, policies), factory, factory_seed)) as pool:
+                futures = [pool.submit(self._run_in_thread, seed) for seed in seeds]
+                self._write_results(writer, (future.result() for future in as_completed(futures)), len(seeds))
+        return self._report_throughput('threads' if gil_enabled() else 'free threads', len(seeds), start)
+
+    @classmethod
+    def _run_in_worker(cls, seed: int) -> Union[None, dict]:
+        """Run a simulation with the environments and policies of this worker process, see `run_batch_with_factory`."""
+        return cls._run_seed(_worker_envs_and_policies, seed)
+
+    @classmethod
+    def _run_in_thread(cls, seed: int) -> Union[None, dict]:
+        """Run a simulation with the environments and policies of this worker thread, see `run_batch_in_threads`."""
+        return cls._run_seed(_thread_state.envs_and_policies, seed)
+
+    @classmethod
+    def _run_seed(cls, envs_and_policies: EnvsAndPolicies, seed: int) -> Union[None, dict]:
+        """Reset the environment of the seed and the policies, and run a simulation with them."""
+        envs, policies = envs_and_policies
+        env = envs[seed % len(envs)]
+        env.reset()
+        for policy in policies:
+            policy.reset()
+        return cls._run_single((env, policies, seed))
+
+    @staticmethod
+    def _report_throughput(backend: str, runs: int, start: float) -> float:
+        """Print and return the number of runs per second of a batch since the start, including starting the workers."""
+        seconds = perf_counter() - start
+        throughput = runs / seconds if seconds > 0 else 0.
+        print(f"{runs} runs in {seconds:.2f} s with {backend}, {throughput:.2f} runs/s")
+        return throughput
+
+    @classmethod
+    def _write_results(cls, writer: StreamingResultWriter, results: Iterable[Union[None, dict]], total: int) -> None:
+        """Write the results to the writer as they come in, showing the progress, and the profile totals when profiling."""
+        batch_profile = PhaseTimer()
+        for result in tqdm.tqdm(results, total=total):
+            if result is not None:
+                writer.write(result)
+                if cls.profile:
+                    batch_profile.merge(PhaseTimer.from_record(result))
+        if cls.profile:
+            print(batch_profile.report())
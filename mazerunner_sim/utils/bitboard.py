@@ -0,0 +1,124 @@
+"""
+Bitboards: boolean maps packed into 64-bit words, one row of the map after the other.
+
+Bit `b` of word `w` in a row is the tile at x = 64 * w + b, the bits past the width of the map are always 0.
+Merging maps and masking them then works on 64 tiles at once and takes 8 times less memory than numpy booleans.
+"""
+
+from typing import Sequence
+
+import numpy as np
+
+WORD_BITS = 64
+
+
+def pack(bool_map: np.array) -> np.array:
+    """
+    Pack a boolean map into a bitboard.
+
+    :param bool_map: array of booleans, the last two axes are y and x
+    :return: array of uint64 with shape [..., height, ceil(width / 64)]
+    """
+    packed = np.packbits(bool_map, axis=-1, bitorder='little')
+    n_words = -(-bool_map.shape[-1] // WORD_BITS)
+    padded = np.zeros((*packed.shape[:-1], n_words * 8), dtype=np.uint8)
+    padded[..., :packed.shape[-1]] = packed
+    return padded.view('<u8')
+
+
+def unpack(words: np.array, width: int) -> np.array:
+    """
+    Unpack a bitboard back into a boolean map.
+
+    :param words: bitboard from `pack`
+    :param width: width of the original map
+    :return: array of booleans with shape [..., height, width]
+    """
+    return np.unpackbits(words.astype('<u8', copy=False).view(np.uint8), axis=-1, count=width, bitorder='little').view(bool)
+
+
+def merge(bitboards: Sequence[np.array]) -> np.array:
+    """Combine bitboards, a tile is set when it's set in any of them."""
+    return np.bitwise_or.reduce(np.stack(bitboards), axis=0)
+
+
+def get_block(words: np.array, x: int, y: int, height: int, width: int) -> np.array:
+    """
+    Get a block of the map as booleans.
+
+    :param words: 2D bitboard
+    :param x: left of the block
+    :param y: top of the block
+    :return: array of booleans with shape [height, width]
+    """
+    rows = words[y:y + height]
+    block = np.zeros((rows.shape[0], width), dtype=bool)
+    for dx in range(width):
+        word, bit = divmod(x + dx, WORD_BITS)
+        block[:, dx] = (rows[:, word] >> np.uint64(bit)) & np.uint64(1)
+    return block
+
+
+def set_block(words: np.array, x: int, y: int, values: np.array) -> None:
+    """
+    Set a block of the map in place.
+
+    :param words: 2D bitboard
+    :param x: left of the block
+    :param y: top of the block
+    :param values: 2D array of booleans to put in the block
+    """
+    height = values.shape[0]
+    for dx in range(values.shape[1]):
+        word, bit = divmod(x + dx, WORD_BITS)
+        mask = np.uint64(1) << np.uint64(bit)
+        column = words[y:y + height, word]
+        words[y:y + height, word] = np.where(values[:, dx], column | mask, column & ~mask)
+
+
+def shift_columns(words: np.array, shift: int) -> np.array:
+    """
+    Move every tile one column, bits that move in from outside the map are 0.
+
+    :param words: bitboard
+    :param shift: 1 to move every tile to x + 1, -1 to move every tile to x - 1
+    :return: the shifted bitboard
+    """
+    one, carry = np.uint64(1), np.uint64(WORD_BITS - 1)
+    carried = np.zeros_like(words)
+    if shift > 0:
+        carried[..., 1:] = words[..., :-1] >> carry
+        return (words << one) | carried
+    carried[..., :-1] = words[..., 1:] << carry
+    return (words >> one) | carried
+
+
+def edge_of_knowledge(known_maze: np.array, explored: np.array) -> np.array:
+    """
+    Bitboard version of `pathfinder.edge_of_knowledge_map`.
+
+    :param known_maze: bitboard of the known maze
+    :param explored: bitboard of the explored tiles
+    :return: bitboard of the open tiles that don't have all of their four neighbours explored
+    """
+    surrounded = shift_columns(explored, 1) & shift_columns(explored, -1)
+    surrounded[..., 1:-1, :] &= explored[..., :-2, :] & explored[..., 2:, :]
+    surrounded[..., [0, -1], :] = 0
+    return known_maze & ~surrounded
+
+
+def update_edge_of_knowledge(edge: np.array, known_maze: np.array, explored: np.array, y: int, radius: int = 2) -> None:
+    """
+    Bitboard version of `pathfinder.update_edge_of_knowledge_map`, on the whole rows within the radius of row y.
+
+    :param edge: 2D bitboard of the edge of knowledge, updated in place
+    :param known_maze: 2D bitboard of the known maze
+    :param explored: 2D bitboard of the explored tiles
+    :param y: row of the tiles that changed
+    :param radius: how far from row y the edge can have changed
+    """
+    top, bottom = max(y - radius, 0), min(y + radius + 1, edge.shape[0])
+    # The rows next to the updated ones tell whether their tiles are surrounded
+    start, stop = max(top - 1, 0), min(bottom + 1, edge.shape[0])
+    rows = edge_of_knowledge(known_maze[start:stop], explored[start:stop])
+    edge[top:bottom] = rows[top - start:bottom - start]
@@ -0,0 +1,113 @@
+"""
+Breadth-first search distance fields on a maze.
+
+Every step in the maze costs the same, so a breadth-first search finds the shortest paths
+from the origin(s) to every reachable tile in a single pass.
+The result is a distance field and a predecessor array, the paths are only traced back when asked for.
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+Coord = Tuple[int, int]
+
+
+class DistanceField:
+    """Shortest distances and paths from one or more origins to every reachable tile of a maze."""
+
+    distances: np.array
+    predecessors: np.array
+    order: np.array
+
+    def __init__(self, maze: np.array, origins: Sequence[Coord]):
+        """
+        Run the breadth-first search.
+
+        Tiles at the same distance are expanded in (x, y) order and their neighbours in the order up, left, right, down.
+        This gives the same shortest path tree as a Dijkstra with a priority queue on (distance, (x, y)).
+
+        :param maze: a 2D boolean array where True means walkable tile and False means a wall
+        :param origins: the coordinates the search starts from, each has distance 0
+        """
+        height, width = maze.shape
+        self.shape = maze.shape
+
+        # The search runs on the flattened transpose of the maze, padded with walls.
+        # Sorting those indices sorts on (x, y) and the padding makes bound checks unnecessary.
+        padded_height = height + 2
+        walkable = np.pad(maze, 1).T.ravel().tolist()
+        distances = [-1] * len(walkable)
+        predecessors = [-1] * len(walkable)
+
+        level = sorted({(int(x) + 1) * padded_height + int(y) + 1 for x, y in origins})
+        for tile in level:
+            distances[tile] = 0
+        order = list(level)
+        self.num_origins = len(order)
+
+        offsets = (-1, -padded_height, padded_height, 1)  # up, left, right, down
+        distance = 0
+        while level:
+            distance += 1
+            next_level = []
+            for tile in level:
+                for offset in offsets:
+                    next_tile = tile + offset
+                    if walkable[next_tile] and distances[next_tile] < 0:
+                        distances[next_tile] = distance
+                        predecessors[next_tile] = tile
+                        next_level.append(next_tile)
+            order.extend(next_level)
+            level = sorted(next_level)
+
+        # Convert back to the normal layout, where predecessors are indices in the flattened maze (y * width + x)
+        self.distances = np.array(distances).reshape(width + 2, padded_height).T[1:-1, 1:-1].copy()
+        padded_predecessors = np.array(predecessors)
+        predecessors = np.where(padded_predecessors < 0, -1,
+                                (padded_predecessors % padded_height - 1) * width + padded_predecessors // padded_height - 1)
+        self.predecessors = predecessors.reshape(width + 2, padded_height).T[1:-1, 1:-1].copy()
+        order = np.array(order, dtype=int)
+        self.order = (order % padded_height - 1) * width + order // padded_height - 1
+
+        self._flat_distances = self.distances.ravel().tolist()
+        self._flat_predecessors = self.predecessors.ravel().tolist()
+
+    def reachable(self, coord: Coord) -> bool:
+        """Check if the given coordinate can be reached from the origin(s)."""
+        return self.distances[coord[1], coord[0]] >= 0
+
+    def distance(self, coord: Coord) -> int:
+        """Get the length of the shortest path to the coordinate, -1 if it can't be reached."""
+        return int(self.distances[coord[1], coord[0]])
+
+    def path_to(self, target: Coord) -> List[Coord]:
+        """
+        Trace back the shortest path to the target.
+
+        :param target: the end of the path
+        :return: a list of coordinates from the origin to the target, the origin itself isn't included in the path.
+                 When the target is an origin, the path is just the target.
+        """
+        width = self.shape[1]
+        index = target[1] * width + target[0]
+        if self._flat_distances[index] < 0:
+            raise ValueError(f"{target} can't be reached from the origin")
+
+        path = [(target[0], target[1])]
+        while self._flat_distances[index] > 1:
+            index = self._flat_predecessors[index]
+            path.append((index % width, index // width))
+        path.reverse()
+        return path
+
+    def reached_tiles(self, include_origins: bool = False) -> List[Coord]:
+        """
+        Get the reachable tiles in the order the search found them.
+
+        :param include_origins: whether the origins are included at the start
+        :return: list of coordinates
+        """
+        width = self.shape[1]
+        order = self.order if include_origins else self.order[self.num_origins:]
+        return [(index % width, index // width) for index in order.tolist()]
@@ -0,0 +1,96 @@
+"""Cached distances on a maze that doesn't change, so they only have to be computed once."""
+
+from typing import Dict, List, Union
+
+import numpy as np
+
+from mazerunner_sim.utils.distance_field import Coord, DistanceField
+
+
+class DistanceOracle:
+    """
+    Answers distance questions about a fixed maze, computing everything lazily and only once.
+
+    Mostly used for the distance back to the safe zone, which every runner needs to know to get back in time.
+    For small mazes it can also hold a table with the distances between all pairs of open tiles.
+    """
+
+    UNREACHABLE = np.iinfo(np.uint16).max
+
+    def __init__(self, maze: np.array, safe_zone: np.array, all_pairs: bool = False, all_pairs_max_tiles: int = 1024):
+        """
+        Initialize the oracle, nothing is computed yet.
+
+        :param maze: a 2D boolean array where True means walkable tile and False means a wall
+        :param safe_zone: a 2D boolean array where True means safe to be at the end of the day
+        :param all_pairs: whether to keep a table with the distance between every pair of open tiles
+        :param all_pairs_max_tiles: only keep the all pairs table when the maze has at most this many open tiles
+        """
+        self.maze = maze
+        self.safe_zone = safe_zone
+        self.all_pairs = all_pairs and np.count_nonzero(maze) <= all_pairs_max_tiles
+        self._safe_zone_field: Union[DistanceField, None] = None
+        self._fields: Dict[Coord, DistanceField] = {}
+        self._tile_index: Union[np.array, None] = None
+        self._table: Union[np.array, None] = None
+
+    @property
+    def safe_zone_field(self) -> DistanceField:
+        """The distance field from all the open tiles in the safe zone."""
+        if self._safe_zone_field is None:
+            ys, xs = np.nonzero(np.logical_and(self.maze, self.safe_zone))
+            self._safe_zone_field = DistanceField(self.maze, list(zip(xs.tolist(), ys.tolist())))
+        return self._safe_zone_field
+
+    @property
+    def distance_to_safe_zone(self) -> np.array:
+        """Map with for each tile the number of steps to the nearest safe tile, -1 if the safe zone can't be reached."""
+        return self.safe_zone_field.distances
+
+    def retreat_path(self, coord: Coord) -> List[Coord]:
+        """
+        Get the shortest path from the coordinate to the safe zone.
+
+        :param coord: the coordinate to retreat from
+        :return: path starting at the coordinate itself and ending at the first safe tile
+        """
+        if self.safe_zone[coord[1], coord[0]]:
+            return [coord]
+        path = self.safe_zone_field.path_to(coord)
+        first = path[0]
+        index = self.safe_zone_field.predecessors[first[1], first[0]]
+        width = self.maze.shape[1]
+        return path[::-1] + [(index % width, index // width)]
+
+    def field_from(self, origin: Coord) -> DistanceField:
+        """Get the (cached) distance field from the given origin."""
+        origin = (int(origin[0]), int(origin[1]))
+        if origin not in self._fields:
+            self._fields[origin] = DistanceField(self.maze, [origin])
+        return self._fields[origin]
+
+    def distance(self, a: Coord, b: Coord) -> int:
+        """
+        Get the length of the shortest path between two coordinates.
+
+        :return: the distance, -1 if b can't be reached from a
+        """
+        if not self.all_pairs:
+            return self.field_from(a).distance(b)
+
+        if self._table is None:
+            self._build_table()
+        index_a, index_b = self._tile_index[a[1], a[0]], self._tile_index[b[1], b[0]]
+        if index_a < 0 or index_b < 0 or self._table[index_a, index_b] == self.UNREACHABLE:
+            return -1
+        return int(self._table[index_a, index_b])
+
+    def _build_table(self) -> None:
+        """Compute the compressed all pairs table, only the open tiles get a row and column."""
+        ys, xs = np.nonzero(self.maze)
+        self._tile_index = np.full(self.maze.shape, -1)
+        self._tile_index[ys, xs] = np.arange(len(xs))
+        self._table = np.full((len(xs), len(xs)), self.UNREACHABLE, dtype=np.uint16)
+        for index, origin in enumerate(zip(xs.tolist(), ys.tolist())):
+            distances = DistanceField(self.maze, [origin]).distances[ys, xs]
+            self._table[index] = np.where(distances < 0, self.UNREACHABLE, distances)
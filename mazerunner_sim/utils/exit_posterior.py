@@ -0,0 +1,94 @@
+"""
+Posterior of where the exit of a maze is, given the leaves that have been seen.
+
+A maze has a leaf on an open tile with a chance of `1 - distance / (height + width - 4)`,
+where distance is the manhattan distance from the tile to the exit (see the maze generator).
+Every tile on the border of the maze is a candidate exit. The distances from every candidate to every tile are computed
+once per maze shape, the log-likelihoods only for the tiles that are new at an update,
+and the posterior is kept in log-space so it doesn't underflow.
+"""
+
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+
+
+@lru_cache(maxsize=8)
+def border_tiles(shape: Tuple[int, int]) -> np.array:
+    """Get the (x, y) of every tile on the border of a maze of the given shape, as an array with shape [n, 2]."""
+    border = np.ones(shape, dtype=bool)
+    border[1:-1, 1:-1] = False
+    ys, xs = np.nonzero(border)
+    tiles = np.stack([xs, ys], axis=1)
+    tiles.flags.writeable = False
+    return tiles
+
+
+@lru_cache(maxsize=8)
+def exit_distances(shape: Tuple[int, int]) -> np.array:
+    """
+    Compute the manhattan distance from every candidate exit to every tile.
+
+    :param shape: shape of the maze
+    :return: array of int16 with shape [number of border tiles, height, width],
+             the candidate exits are in the order of `border_tiles`
+    """
+    exits = border_tiles(shape).astype(np.int16)
+    ys, xs = np.ogrid[:shape[0], :shape[1]]
+    distances = np.abs(xs.astype(np.int16) - exits[:, 0, None, None]) + np.abs(ys.astype(np.int16) - exits[:, 1, None, None])
+    distances.flags.writeable = False
+    return distances
+
+
+def leaf_chances(distances: np.array, shape: Tuple[int, int]) -> np.array:
+    """Get the chance of a leaf on tiles at the given distances from the exit, in a maze of the given shape."""
+    return np.clip(1 - distances / (sum(shape) - 4), 0, 1)
+
+
+class ExitPosterior:
+    """
+    The probability of every border tile being the exit, updated with the tiles that are seen.
+
+    Only the tiles that weren't seen before are added at an update, a tile that's forgotten keeps counting.
+    """
+
+    def __init__(self, shape: Tuple[int, int]):
+        """
+        Initialize the posterior with a uniform prior.
+
+        :param shape: shape of the maze
+        """
+        self.shape = shape
+        self.candidates = border_tiles(shape)
+        self.distances = exit_distances(shape)
+        self.log_posterior = np.zeros(len(self.candidates))
+        self.observed = np.zeros(shape, dtype=bool)
+        # Increases whenever the posterior changes
+        self.version = 0
+
+    def update(self, known_maze: np.array, known_leaves: np.array) -> None:
+        """
+        Add the open tiles that weren't seen before.
+
+        :param known_maze: the known maze, True for the open tiles that are known
+        :param known_leaves: the known leaves, True for a leaf
+        """
+        new = np.logical_and(known_maze, np.logical_not(self.observed))
+        if not new.any():
+            return
+        self.observed |= new
+        self.version += 1
+        with np.errstate(divide='ignore'):
+            self.log_posterior += np.log(leaf_chances(self.distances[:, new & known_leaves], self.shape)).sum(axis=1)
+            self.log_posterior += np.log1p(-leaf_chances(self.distances[:, new & np.logical_not(known_leaves)], self.shape)).sum(axis=1)
+
+    @property
+    def probabilities(self) -> np.array:
+        """The probability of every candidate exit (see `candidates`), they sum to 1."""
+        most_likely = self.log_posterior.max()
+        if most_likely == -np.inf:
+            # The observations contradict every candidate, so know nothing
+            return np.full(len(self.candidates), 1 / len(self.candidates))
+        likelihoods = np.exp(self.log_posterior - most_likely)
+        return likelihoods / likelihoods.sum()
@@ -5,10 +5,13 @@ An agent takes an action, the environment uses that action to update and returns
 Observations and actions are just data containers.
 """
 
-from typing import NamedTuple, Tuple, Sequence
+from typing import List, NamedTuple, Tuple, Sequence, Union, TYPE_CHECKING
 
 import numpy as np
 
+if TYPE_CHECKING:
+    from mazerunner_sim.utils.distance_oracle import DistanceOracle
+
 
 class Observation(NamedTuple):
     """
@@ -23,6 +26,12 @@ class Observation(NamedTuple):
         action_speed: Number of simulation steps between each action, this effectively forms the runners speed
         assigned_task: The location the runner has been assigned to explore
         tasks: The tasks available to be assigned, the policy should return a value for each tasks what it thinks it's worth
+        edge_of_knowledge: map of booleans the size of the entire maze, True means an open tile next to unexplored area,
+                           None when the environment doesn't keep track of it
+        distance_oracle: cached distances on the known maze of the runner, see `DistanceOracle`,
+                         None when the environment doesn't provide it
+        map_version: counter that changes whenever the maps of the runner change,
+                     so a policy can tell that the maps are the same as in an earlier observation without comparing them
 
     This can be expanded to have more observation parameters in the future as the simulation development continuous.
     """
@@ -36,6 +45,9 @@ class Observation(NamedTuple):
     action_speed: int
     assigned_task: Tuple[int, int]
     tasks: Sequence[Tuple[int, int]]
+    edge_of_knowledge: Union[np.array, None] = None
+    distance_oracle: Union['DistanceOracle', None] = None
+    map_version: int = 0
 
 
 class Action(NamedTuple):
@@ -45,12 +57,98 @@ class Action(NamedTuple):
     An action consist of the following thing:
         step_direction: The direction to step to, it's an integer between 0 and 4
         task_worths: A value that the policy thinks a task is worth, for each task in the observation
+        hold: Number of time-steps after this one the runner will STAY, without needing an observation.
+              An environment that steps event-driven skips the time-steps where all the runners are holding,
+              other environments ignore it. A hold always ends before the night.
     """
 
     step_direction: int
     task_worths: Sequence[float]
+    hold: int = 0
     UP = 0
     DOWN = 1
     LEFT = 2
     RIGHT = 3
     STAY = 4
+
+
+class ObservationBatch(NamedTuple):
+    """
+    Observations of many runners, possibly in different environments, stacked for policies that decide them at once.
+
+    A batch consist of the following things, the observation is the first axis of every array:
+        observations: The observations themselves
+        runner_location: Locations of the runners, shape [n, 2]
+        time_till_end_of_day: Time till the end of the day of every observation, shape [n]
+        action_speed: Action speed of every runner, shape [n]
+        assigned_task: Assigned task (x, y) of every runner, shape [n, 2]
+        map_version: Map version of every observation, shape [n]
+    The maps are only stacked when a policy asks for them with `maps`, the tasks can differ in length per observation.
+    """
+
+    observations: Sequence[Observation]
+    runner_location: np.array
+    time_till_end_of_day: np.array
+    action_speed: np.array
+    assigned_task: np.array
+    map_version: np.array
+
+    @classmethod
+    def stack(cls, observations: Sequence[Observation]) -> 'ObservationBatch':
+        """Stack the given observations into a batch."""
+        return cls(
+            observations=tuple(observations),
+            runner_location=np.array([o.runner_location for o in observations], dtype=int).reshape(-1, 2),
+            time_till_end_of_day=np.array([o.time_till_end_of_day for o in observations], dtype=int),
+            action_speed=np.array([o.action_speed for o in observations], dtype=int),
+            assigned_task=np.array([o.assigned_task for o in observations], dtype=int).reshape(-1, 2),
+            map_version=np.array([o.map_version for o in observations], dtype=int)
+        )
+
+    @property
+    def size(self) -> int:
+        """The number of observations in the batch."""
+        return len(self.observations)
+
+    @property
+    def tasks(self) -> List[Sequence[Tuple[int, int]]]:
+        """The tasks of every observation."""
+        return [o.tasks for o in self.observations]
+
+    def maps(self, name: str) -> np.array:
+        """
+        Stack a map of every observation, all the maps should have the same shape.
+
+        :param name: name of the map in `Observation`, like 'explored' or 'known_maze'
+        :return: array with shape [n, height, width]
+        """
+        return np.stack([getattr(o, name) for o in self.observations])
+
+
+class ActionBatch(NamedTuple):
+    """
+    Actions for a batch of observations, see `ObservationBatch`.
+
+    A batch consist of the following things, the action is the first axis of every array:
+        step_direction: The direction to step to of every action, shape [n]
+        task_worths: The task worths of every action, the number of tasks can differ per action
+        hold: The hold of every action, shape [n]
+    """
+
+    step_direction: np.array
+    task_worths: Sequence[Sequence[float]]
+    hold: np.array
+
+    @classmethod
+    def from_actions(cls, actions: Sequence[Action]) -> 'ActionBatch':
+        """Stack the given actions into a batch."""
+        return cls(
+            step_direction=np.array([a.step_direction for a in actions], dtype=int),
+            task_worths=[a.task_worths for a in actions],
+            hold=np.array([a.hold for a in actions], dtype=int)
+        )
+
+    def to_actions(self) -> List[Action]:
+        """Split the batch into an action per observation."""
+        return [Action(step_direction=step_direction, task_worths=task_worths, hold=hold)
+                for step_direction, task_worths, hold in zip(self.step_direction.tolist(), self.task_worths, self.hold.tolist())]
@@ -1,14 +1,26 @@
 """Module containing some useful functions for pathfinding."""
 
-from typing import Callable, Dict, List, Tuple
-from queue import PriorityQueue
+from functools import wraps
+from typing import Callable, Dict, List, Union
+import warnings
 
 import numpy as np
 
-Coord = Tuple[int, int]
+from mazerunner_sim.utils.distance_field import Coord, DistanceField
 DistanceFunc = Callable[[Coord], float]
 
 
+def _deprecated(replacement: str) -> Callable[[Callable], Callable]:
+    """Mark a function that's only kept for existing callers, calling it warns to use the replacement instead."""
+    def decorator(function: Callable) -> Callable:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            warnings.warn(f"{function.__name__} is deprecated, use {replacement} instead", DeprecationWarning, stacklevel=2)
+            return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
 def manhattan_distance(p1: Coord, p2: Coord) -> int:
     """
     Calculate the Manhattan distance between two coordinates.
@@ -20,6 +32,7 @@ def manhattan_distance(p1: Coord, p2: Coord) -> int:
     return abs(p1[0] - p2[0]) + abs(p1[1] - p2[1])
 
 
+@_deprecated('manhattan_distance')
 def target_to_distance_func(target: Coord) -> DistanceFunc:
     """
     Create a manhattan distance function to the given coordinate.
@@ -30,6 +43,7 @@ def target_to_distance_func(target: Coord) -> DistanceFunc:
     return lambda p: manhattan_distance(p, target)
 
 
+@_deprecated('DistanceField.path_to')
 def traceback_visited(visited_tree: Dict[Coord, Coord], end: Coord, origin: Coord) -> List[Coord]:
     """
     Use the visited_log to trace the path back to the beginning.
@@ -47,6 +61,7 @@ def traceback_visited(visited_tree: Dict[Coord, Coord], end: Coord, origin: Coor
     return path
 
 
+@_deprecated('a bounds check on the shape of the maze')
 def coord_within_boundary(maze: np.array, coord: Coord) -> bool:
     """
     Check if the given coordinate lays within maze boundaries.
@@ -60,6 +75,7 @@ def coord_within_boundary(maze: np.array, coord: Coord) -> bool:
     return 0 <= x < width and 0 <= y < height
 
 
+@_deprecated('the neighbours in DistanceField')
 def surrounding_tiles(coord: Coord) -> List[Coord]:
     """
     Get surrounding tiles from giving tile.
@@ -72,54 +88,72 @@ def surrounding_tiles(coord: Coord) -> List[Coord]:
     return surrounding
 
 
-def compute_explore_paths(start_coord: Coord, runner_known_map: np.array, runner_explored_map: np.array):
+def edge_of_knowledge_map(known_maze: np.array, explored: np.array) -> np.array:
     """
-    Compute paths for exploring
+    Compute which tiles are on the edge of the known maze.
 
-    :param start_coord: Start coords
-    :param runner_known_map: Known map of the runner
-    :param runner_explored_map: Explored map of the runner
-    :return:
+    A tile is on the edge when it's known to be open, but not all of its four neighbours are explored,
+    tiles outside of the maze count as not explored.
+    Works on a single map, or a stack of maps where the last two axes are y and x.
+
+    :param known_maze: the known maze of the runner
+    :param explored: a mask of what's explored by the runner
+    :return: map of booleans where True means the tile is on the edge of the known maze
+    """
+    surrounded = np.zeros_like(explored)
+    surrounded[..., 1:-1, 1:-1] = (explored[..., :-2, 1:-1] & explored[..., 1:-1, :-2] &
+                                   explored[..., 1:-1, 2:] & explored[..., 2:, 1:-1])
+    return np.logical_and(known_maze, np.logical_not(surrounded))
+
+
+def update_edge_of_knowledge_map(edge_map: np.array, known_maze: np.array, explored: np.array, coord: Coord, radius: int = 2) -> None:
     """
-    edge_tiles = []
-    visited_tiles = {start_coord: None}  # key: next_tile, value: previous_tile
+    Update the edge of knowledge map in place around the given coordinate.
 
-    q = PriorityQueue()
-    q.put((0, start_coord))
-    while not q.empty():
-        # gets the tile with the lowest priority value
-        priority, tile = q.get()
+    After revealing the 3x3 block around a runner, only the tiles within 2 steps of the runner can change.
 
-        for next_tile in surrounding_tiles(tile):
-            if coord_within_boundary(runner_known_map, next_tile):
+    :param edge_map: the map from `edge_of_knowledge_map` to update
+    :param known_maze: the known maze of the runner
+    :param explored: a mask of what's explored by the runner
+    :param coord: center of the area that changed
+    :param radius: how far from the center tiles can have changed
+    """
+    x, y = coord
+    height, width = edge_map.shape
+    y0, y1, x0, x1 = max(y - radius, 0), min(y + radius + 1, height), max(x - radius, 0), min(x + radius + 1, width)
 
-                # Check coords with maze if you can walk there
-                if runner_known_map[next_tile[1], next_tile[0]] and next_tile not in visited_tiles:
+    # Take one tile extra around the area, so the neighbours of the area are known
+    outer_y0, outer_x0 = max(y0 - 1, 0), max(x0 - 1, 0)
+    outer = (slice(outer_y0, min(y1 + 1, height)), slice(outer_x0, min(x1 + 1, width)))
+    area = edge_of_knowledge_map(known_maze[outer], explored[outer])
+    edge_map[y0:y1, x0:x1] = area[y0 - outer_y0:y1 - outer_y0, x0 - outer_x0:x1 - outer_x0]
 
-                    x, y = next_tile[0] + 1, next_tile[1] + 1
-                    explored = np.pad(runner_explored_map, (1, 1), 'constant', constant_values=False)
-                    #     UP                          LEFT                   RIGHT                       DOWN
-                    if not(explored[y - 1, x] and explored[y, x - 1] and explored[y, x + 1] and explored[y + 1, x]):
-                        edge_tiles.append(next_tile)
-                    q.put((priority + 1, next_tile))
 
-                    visited_tiles[next_tile] = tile
+def compute_explore_paths(start_coord: Coord, runner_known_map: np.array, runner_explored_map: np.array,
+                          edge_map: Union[np.array, None] = None):
+    """
+    Compute paths for exploring
 
-    paths = [traceback_visited(visited_tiles, edge_tile, start_coord) for edge_tile in edge_tiles]
-    return paths
+    :param start_coord: Start coords
+    :param runner_known_map: Known map of the runner
+    :param runner_explored_map: Explored map of the runner
+    :param edge_map: The edge of knowledge map (see `edge_of_knowledge_map`) when already known, otherwise it's computed
+    :return:
+    """
+    if edge_map is None:
+        edge_map = edge_of_knowledge_map(runner_known_map, runner_explored_map)
+
+    field = DistanceField(runner_known_map, [start_coord])
+    return [field.path_to(tile) for tile in field.reached_tiles() if edge_map[tile[1], tile[0]]]
 
 
 def paths_origin_targets(origin: Coord, targets: List[Coord], maze: np.array) -> List[List[Coord]]:
     """
     Find the paths from the origin to the targets.
 
-    Finding the path to multiple targets from the same origin is faster than doing them all separately,
-    by avoiding redoing a bunch of computations.
-    The path to one target can still be done (and just as fast) by giving a list with one item.
-
-    Warning:
-    This implementation assumes there these paths are possible,
-    otherwise the function will hang.
+    All the paths come from a single breadth-first search from the origin, see `DistanceField`,
+    so finding the paths to multiple targets at once is faster than doing them all separately.
+    A `ValueError` is raised when a target can't be reached.
 
     :param origin: the origin coordinate from which each path will start
     :param targets: the ends where each path should end
@@ -129,46 +163,5 @@ def paths_origin_targets(origin: Coord, targets: List[Coord], maze: np.array) ->
     for x, y in targets + [origin]:
         assert maze[y, x]
 
-    targets_togo = list(targets)
-    if origin in targets_togo:
-        targets_togo.remove(origin)
-    visited_tree = {origin: None}  # key: next tile, value: previous tile
-    q = PriorityQueue()
-    q.put((0, origin))
-
-    # Dijkstra to all the targets, until one target is left
-    while len(targets_togo) > 1:
-        priority, tile = q.get()
-
-        for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
-            next_tile = tile[0] + dx, tile[1] + dy
-            if coord_within_boundary(maze, next_tile):
-                if maze[next_tile[1], next_tile[0]] and (next_tile not in visited_tree):
-                    q.put((priority + 1, next_tile))
-                    visited_tree[next_tile] = tile
-                    if next_tile in targets_togo:
-                        targets_togo.remove(next_tile)
-
-    if len(targets_togo) == 1:
-        done = False
-        distance_func = target_to_distance_func(targets_togo[0])
-    else:
-        done = True
-        distance_func = None
-
-    # A* for the last target for better efficiency
-    while not done:
-        _, tile = q.get()
-
-        for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
-            next_tile = tile[0] + dx, tile[1] + dy
-            if coord_within_boundary(maze, next_tile):
-                if maze[next_tile[1], next_tile[0]] and (next_tile not in visited_tree):
-                    q.put((distance_func(next_tile), next_tile))
-                    visited_tree[next_tile] = tile
-                    if next_tile in targets_togo:
-                        done = True
-                        break
-
-    # Trace back the path for each of the targets
-    return [traceback_visited(visited_tree, target, origin) for target in targets]
+    field = DistanceField(maze, [origin])
+    return [field.path_to(target) for target in targets]
@@ -0,0 +1,109 @@
+"""
+Timing counters for the phases of a simulation, like the steps of the environment and the decisions of the policies.
+
+Code that can be profiled times its phases with `with profiler.phase('name'):`,
+the profiler is `NULL_PROFILER` when profiling is off, its phases do nothing, so the hooks cost next to nothing.
+"""
+
+from contextlib import nullcontext
+from time import perf_counter
+from typing import Dict, Iterable
+
+
+class PhaseTimer:
+    """Cumulative wall time and number of calls of every phase."""
+
+    enabled = True
+
+    def __init__(self, phases: Iterable[str] = ()):
+        """
+        Initialize the counters.
+
+        :param phases: Phases to count from the start, so they're in the results even when they never happen
+        """
+        self.seconds: Dict[str, float] = {phase: 0. for phase in phases}
+        self.calls: Dict[str, int] = {phase: 0 for phase in phases}
+
+    def phase(self, name: str) -> '_Phase':
+        """Time a phase, use it as a context manager."""
+        return _Phase(self, name)
+
+    def add(self, name: str, seconds: float, calls: int = 1) -> None:
+        """Add time spent in a phase."""
+        self.seconds[name] = self.seconds.get(name, 0.) + seconds
+        self.calls[name] = self.calls.get(name, 0) + calls
+
+    def merge(self, other: 'PhaseTimer') -> None:
+        """Add the counters of another timer to this one."""
+        for name, seconds in other.seconds.items():
+            self.add(name, seconds, other.calls[name])
+
+    def to_record(self, prefix: str = 'profile_') -> Dict[str, float]:
+        """
+        Turn the counters into columns for a row of the batch results.
+
+        :param prefix: Prefix of the column names
+        :return: dictionary with `<prefix><phase>_seconds` and `<prefix><phase>_calls` for every phase
+        """
+        record = {}
+        for name in sorted(self.seconds):
+            record[f'{prefix}{name}_seconds'] = self.seconds[name]
+            record[f'{prefix}{name}_calls'] = self.calls[name]
+        return record
+
+    @classmethod
+    def from_record(cls, record: Dict[str, float], prefix: str = 'profile_') -> 'PhaseTimer':
+        """
+        Get the counters back from a row of the batch results, see `to_record`.
+
+        :param record: row of the results, columns without the prefix are ignored
+        :param prefix: Prefix of the column names
+        """
+        timer = cls()
+        for column, value in record.items():
+            if column.startswith(prefix) and column.endswith('_seconds'):
+                name = column[len(prefix):-len('_seconds')]
+                timer.add(name, value, record.get(f'{prefix}{name}_calls', 0))
+        return timer
+
+    def report(self) -> str:
+        """Table of the phases with their total time, number of calls and time per call, the slowest phase first."""
+        lines = [f"{'phase':<30} {'seconds':>10} {'calls':>10} {'ms/call':>10}"]
+        for name in sorted(self.seconds, key=self.seconds.get, reverse=True):
+            seconds, calls = self.seconds[name], self.calls[name]
+            lines.append(f"{name:<30} {seconds:10.3f} {calls:10d} {seconds * 1000 / calls if calls else 0:10.3f}")
+        return '\n'.join(lines)
+
+
+class _Phase:
+    """Context manager that adds the time spent inside it to a phase of a `PhaseTimer`."""
+
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer: PhaseTimer, name: str):
+        """Prepare timing the phase."""
+        self.timer = timer
+        self.name = name
+        self.start = 0.
+
+    def __enter__(self) -> None:
+        """Start timing."""
+        self.start = perf_counter()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        """Stop timing and add the time to the phase."""
+        self.timer.add(self.name, perf_counter() - self.start)
+
+
+class NullProfiler:
+    """Profiler that doesn't time anything, used when profiling is off."""
+
+    enabled = False
+    _null_phase = nullcontext()
+
+    def phase(self, name: str) -> nullcontext:
+        """Do nothing."""
+        return self._null_phase
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,165 @@
+"""Writer that streams the results of a batch to disk while the batch is still running."""
+
+from typing import List, Set, Tuple, Union
+import glob
+import os
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+
+class StreamingResultWriter:
+    """
+    Stream results to disk as they arrive, so a crashed batch doesn't lose the runs that were already done.
+
+    While the batch is running, the results are appended as record batches to an Arrow IPC stream next to the
+    output file, a journal part named `<filename>.part<n>.arrows`. When the batch finishes, all the journal parts
+    are combined into the feather file at `filename` and removed.
+
+    A batch that didn't finish can be resumed: the complete record batches in the existing journal parts are kept,
+    `completed_seeds` tells which runs don't have to be done again and the new results go into a new part.
+
+    The columns are fixed by the first result, a later result with a column that isn't known is refused.
+    The types of the columns are inferred from the first `infer_rows` results, so a column that's only sometimes None
+    gets the type of its values. Later results are converted to those types. Only when they can't be (like a float in an
+    int column) the types are promoted to common types (like int to float, or null to int) and a new part is started,
+    so the types only get wider and a long batch doesn't end up in many parts.
+    """
+
+    def __init__(self, filename: str, resume: bool = False, flush_every: int = 1, infer_rows: int = 10):
+        """
+        Open the journal.
+
+        :param filename: Name of the feather file to write when the batch is done
+        :param resume: Keep the results that are already in the journal of an earlier, unfinished, batch
+        :param flush_every: Number of results to gather before writing them to the journal
+        :param infer_rows: Number of results to infer the types of the columns from, the first results are only written
+                           to the journal once there are this many (or when the writer is closed)
+        """
+        self.filename = filename
+        self.flush_every = flush_every
+        self.infer_rows = infer_rows
+        self.completed_seeds: Set[int] = set()
+
+        self._rows: List[dict] = []
+        self._columns: Union[Tuple[str, ...], None] = None
+        self._schema: Union[pa.Schema, None] = None
+        self._sink = None
+        self._writer = None
+
+        parts = self.journal_parts()
+        if resume:
+            for part in parts:
+                for batch in self._read_part(part):
+                    # The new results get the types of the last results
+                    self._columns, self._schema = tuple(batch.schema.names), batch.schema
+                    self.completed_seeds.update(batch.column('seed').to_pylist())
+        else:
+            for part in parts:
+                os.remove(part)
+            parts = []
+        self._next_part = len(parts)
+        self.journal_filename: Union[str, None] = None
+
+    def journal_parts(self) -> List[str]:
+        """Get the filenames of the journal parts, in the order they were written."""
+        parts = glob.glob(f'{glob.escape(self.filename)}.part*.arrows')
+        return sorted(parts, key=lambda part: int(part[len(self.filename) + len('.part'):-len('.arrows')]))
+
+    @staticmethod
+    def _read_part(filename: str) -> List[pa.RecordBatch]:
+        """Read all the complete record batches from a journal part, a crash can leave half a batch at the end."""
+        batches = []
+        try:
+            with pa.OSFile(filename, 'rb') as source:
+                for batch in pa.ipc.open_stream(source):
+                    batches.append(batch)
+        except (pa.ArrowInvalid, OSError):
+            pass
+        return batches
+
+    def write(self, row: dict) -> None:
+        """
+        Add the result of one run, it has to contain the `seed` of the run.
+
+        :param row: dictionary with a value for each column, a missing column is null
+        """
+        if self._columns is None:
+            self._columns = tuple(row)
+        unknown = [column for column in row if column not in self._columns]
+        if unknown:
+            raise ValueError(f"Unknown columns {unknown}, the columns are fixed by the first result: {list(self._columns)}")
+        self._rows.append(row)
+        if len(self._rows) >= self.flush_every:
+            self.flush()
+
+    def flush(self, infer: bool = False) -> None:
+        """
+        Write the gathered results to the journal.
+
+        :param infer: Infer the types of the columns from the gathered results when they aren't known yet,
+                      even if there are fewer than `infer_rows`
+        """
+        if not self._rows or (self._schema is None and not infer and len(self._rows) < self.infer_rows):
+            return
+        table = pa.Table.from_pydict({column: [row.get(column) for row in self._rows] for column in self._columns})
+        if self._schema is None:
+            self._schema = table.schema
+        try:
+            # Only casts that don't lose anything, a float in an int column needs wider types
+            table = table.cast(self._schema)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            # A part has a single schema, wider types go into a new part
+            self._close_part()
+            self._schema = pa.unify_schemas([self._schema, table.schema], promote_options='permissive')
+            table = table.cast(self._schema)
+        if self._writer is None:
+            self.journal_filename = f'{self.filename}.part{self._next_part}.arrows'
+            self._next_part += 1
+            self._sink = pa.OSFile(self.journal_filename, 'wb')
+            self._writer = pa.ipc.new_stream(self._sink, self._schema)
+        self._writer.write_table(table)
+        self._sink.flush()
+        self.completed_seeds.update(row['seed'] for row in self._rows)
+        self._rows = []
+
+    def close(self, finish: bool = True) -> None:
+        """
+        Close the writer.
+
+        :param finish: Combine the journal into the feather file and remove it, otherwise the journal is kept to resume later
+        """
+        self.flush(infer=True)
+        self._close_part()
+
+        if finish:
+            parts = self.journal_parts()
+            tables = [pa.Table.from_batches([batch]) for part in parts for batch in self._read_part(part)]
+            if tables:
+                schema = pa.unify_schemas([table.schema for table in tables], promote_options='permissive')
+                tables = [self._conform(table, schema) for table in tables]
+                feather.write_feather(pa.concat_tables(tables), self.filename)
+            for part in parts:
+                os.remove(part)
+
+    @staticmethod
+    def _conform(table: pa.Table, schema: pa.Schema) -> pa.Table:
+        """Give a table the columns of the schema, in its order and with its types, columns it doesn't have are null."""
+        columns = [table.column(field.name).cast(field.type) if field.name in table.schema.names else pa.nulls(len(table), field.type)
+                   for field in schema]
+        return pa.Table.from_arrays(columns, schema=schema)
+
+    def _close_part(self) -> None:
+        """Close the journal part that's being written, if any."""
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer, self._sink = None, None
+
+    def __enter__(self) -> 'StreamingResultWriter':
+        """Use the writer as a context manager, it's only finished when no exception occurred."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        """Close the writer, keeping the journal when an exception occurred."""
+        self.close(finish=exc_type is None)
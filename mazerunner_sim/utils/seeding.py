@@ -0,0 +1,53 @@
+"""
+Random number streams of an episode, split from one root seed.
+
+Every part that draws random numbers has its own `np.random.Generator`: the environment, each runner and each policy.
+The streams are split from the root seed with `np.random.SeedSequence`, so what one part draws doesn't depend on how many
+numbers the other parts drew, or on the order in which they ran. Runs in threads, processes or a vectorized environment
+give the same results as running them one after another.
+
+Streams without a seed are derived from the global numpy random state without drawing from it, so a script that seeds
+`np.random` stays reproducible, and what the rest of it draws (like the mazes of the next environments) doesn't change.
+"""
+
+from itertools import count
+from typing import Sequence, Union
+
+import numpy as np
+
+Seed = Union[int, np.random.SeedSequence, None]
+
+# Numbers the seed sequences derived from the global random state, so two derived from the same state differ
+_derived_sequences = count()
+
+
+def seed_sequence(seed: Seed) -> np.random.SeedSequence:
+    """
+    Get the seed sequence of a seed.
+
+    :param seed: an integer, a seed sequence (like one spawned from another), or None to derive it from the global numpy
+                 random state, without drawing from it
+    """
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    if seed is None:
+        _, keys, position = np.random.get_state()[:3]
+        return np.random.SeedSequence([*keys.tolist(), position], spawn_key=(next(_derived_sequences),))
+    return np.random.SeedSequence(int(seed))
+
+
+def seed_episode(env, policies: Sequence, seed: Seed) -> None:
+    """
+    Seed the environment, its runners and the policies of an episode from one root seed.
+
+    :param env: the environment, see `MazeRunnerEnv.seed`
+    :param policies: the policies, a policy shared by many runners is seeded once, from its first position
+    :param seed: root seed of the episode
+    """
+    env_sequence, policies_sequence = seed_sequence(seed).spawn(2)
+    env.seed(env_sequence)
+    seeded = set()
+    for policy, policy_sequence in zip(policies, policies_sequence.spawn(len(policies))):
+        if id(policy) not in seeded:
+            seeded.add(id(policy))
+            policy.seed(policy_sequence)
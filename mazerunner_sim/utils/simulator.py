@@ -3,8 +3,10 @@ from typing import List, Union
 
 import cv2
 
-from mazerunner_sim.policies import BasePolicy
+from mazerunner_sim.policies import BasePolicy, decide_runner_actions
 from mazerunner_sim.envs import MazeRunnerEnv
+from mazerunner_sim.envs.visualisation.maze_render import IncrementalRenderer, render_agent_in_step
+from mazerunner_sim.utils.video_exporter import VideoExporter
 
 import numpy as np
 
@@ -13,7 +15,8 @@ def run_simulation(env: MazeRunnerEnv,
                    policies: List[BasePolicy],
                    window_name: Union[str, None] = 'MazeRunner Simulation',
                    wait_key: int = 10,
-                   follow_runner_id: int = None) -> None:
+                   follow_runner_id: int = None,
+                   video_filename: Union[str, None] = None) -> None:
     """
     Run the simulation with given parameters.
 
@@ -22,6 +25,7 @@ def run_simulation(env: MazeRunnerEnv,
     :param window_name: Name used for the simulation, don't visualize when window_name is None
     :param wait_key: Time in milliseconds used as interval for displaying steps
     :param follow_runner_id: Id used to follow runner
+    :param video_filename: Export the simulation to this video file (.mp4 or .gif), it's rendered after the simulation
     :return: The collected stats/info from each step
     """
     done = False
@@ -29,23 +33,31 @@ def run_simulation(env: MazeRunnerEnv,
     visualize = window_name is not None
 
     observations = env.get_observations(first_observation=True)
+    exporter = VideoExporter(follow_runner_id=follow_runner_id) if video_filename is not None else None
+    if exporter is not None:
+        exporter.record(env)
 
     if visualize:
         cv2.namedWindow(window_name, cv2.WINDOW_GUI_EXPANDED)
         cv2.resizeWindow(window_name, 800, 800)
+        # When following a runner, only the tiles that change are rendered again every step,
+        # without the clouds of the followed runner a full render is just as fast
+        renderer = IncrementalRenderer(env) if follow_runner_id is not None else None
 
     while not done:
         # For every agent, decide an action according to the observation
-        actions = {runner_id: policies[runner_id].decide_action(observation) for runner_id, observation in observations.items()}
+        actions = decide_runner_actions(policies, observations)
 
         # Let the actions take place in the environment
         observations, reward, done, info = env.step(actions)
 
         total_reward += reward
+        if exporter is not None:
+            exporter.record(env)
 
         if visualize:
             # Render current time in simulation for visual output
-            render = env.render(follow_runner_id=follow_runner_id)
+            render = render_agent_in_step(env) if renderer is None else renderer.render(follow_runner_id)
 
             # Display render of current time in the environment
             cv2.imshow(window_name, cv2.cvtColor(np.array(render), cv2.COLOR_BGR2RGB))
@@ -57,6 +69,10 @@ def run_simulation(env: MazeRunnerEnv,
             if cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE) < 1:
                 break
 
+    if exporter is not None:
+        exporter.export(video_filename)
+        exporter.close()
+
     if visualize:
         cv2.waitKey(0)
         cv2.destroyAllWindows()
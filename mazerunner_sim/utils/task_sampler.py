@@ -0,0 +1,95 @@
+"""
+Sampling the tasks of the night from the tiles that are not explored yet.
+
+The unexplored tiles are kept as an index: an array with the tiles, of which the first `size` are unexplored,
+and for every tile its slot in that array (-1 when it's not in it). Removing tiles moves the last tiles into their slots,
+so the runners exploring during the day cost O(1) per tile, and drawing k tasks is k random slots.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+
+class TaskSampler:
+    """Index of the tiles that can become a task and aren't explored by any of the runners."""
+
+    def __init__(self, candidates: np.array):
+        """
+        Make an empty index, fill it with `update`.
+
+        :param candidates: map of booleans, the tiles that can become a task, like all tiles or the reachable open tiles
+        """
+        self.shape = candidates.shape
+        self.candidates = candidates.ravel().astype(bool)
+        self.size = 0
+        self._tiles = np.zeros(candidates.size, dtype=int)
+        self._slots = np.full(candidates.size, -1)
+
+    def __len__(self) -> int:
+        """Get the number of unexplored candidate tiles."""
+        return self.size
+
+    def update(self, explored: np.array) -> None:
+        """
+        Rebuild the index from a map of what's explored, when tiles can be forgotten or the runners changed.
+
+        :param explored: map of booleans, the tiles explored by any of the runners
+        """
+        tiles = np.flatnonzero(np.logical_and(self.candidates, np.logical_not(explored.ravel())))
+        self.size = len(tiles)
+        self._tiles[:self.size] = tiles
+        self._slots.fill(-1)
+        self._slots[tiles] = np.arange(self.size)
+
+    def explore(self, x: int, y: int, radius: int = 1) -> None:
+        """Remove the tiles within the radius around (x, y) from the index, they are explored."""
+        self.explore_many(np.array([x]), np.array([y]), radius)
+
+    def explore_many(self, xs: np.array, ys: np.array, radius: int = 1) -> None:
+        """
+        Remove the tiles within the radius around each of the given locations from the index, like `explore` for many at once.
+
+        :param xs: x of every location
+        :param ys: y of every location, in the same order
+        :param radius: radius of the square block that's explored around each location
+        """
+        height, width = self.shape
+        offsets = np.arange(-radius, radius + 1)
+        block_xs, block_ys = np.broadcast_arrays(np.asarray(xs)[:, None, None] + offsets, np.asarray(ys)[:, None, None] + offsets[:, None])
+        inside = (block_xs >= 0) & (block_ys >= 0) & (block_xs < width) & (block_ys < height)
+        self.explore_tiles(block_ys[inside] * width + block_xs[inside])
+
+    def explore_tiles(self, tiles: np.array) -> None:
+        """
+        Remove the given tiles from the index, they are explored.
+
+        :param tiles: flat indices (y * width + x) of the tiles, tiles that aren't in the index and repeated tiles are fine
+        """
+        tiles = np.unique(tiles[self._slots[tiles] >= 0])
+        if len(tiles) == 0:
+            return
+        # The tiles that stay in the slots past the new size move into the freed slots before it
+        slots = self._slots[tiles]
+        size = self.size - len(tiles)
+        kept = np.ones(self.size - size, dtype=bool)
+        kept[slots[slots >= size] - size] = False
+        movers = self._tiles[size:self.size][kept]
+        holes = np.sort(slots[slots < size])
+        self._tiles[holes] = movers
+        self._slots[movers] = holes
+        self._slots[tiles] = -1
+        self.size = size
+
+    def sample(self, k: int, rng: np.random.Generator) -> List[Tuple[int, int]]:
+        """
+        Draw tasks uniformly from the unexplored tiles, with replacement.
+
+        :param k: number of tasks
+        :param rng: random generator to draw with
+        :return: the (x, y) of the tasks, empty when there are no unexplored tiles
+        """
+        if self.size == 0:
+            return []
+        width = self.shape[1]
+        return [(tile % width, tile // width) for tile in self._tiles[rng.integers(self.size, size=k)].tolist()]
@@ -0,0 +1,132 @@
+"""Recorder that keeps the state of an episode at every time-step in compact numpy buffers."""
+
+from typing import Dict, Sequence, Union
+
+import numpy as np
+
+from mazerunner_sim.envs.mazerunner_env import MazeRunnerEnv
+
+
+class TrajectoryRecorder:
+    """
+    Record the state of the environment at every time-step of an episode.
+
+    The state is appended to preallocated numpy buffers that grow when needed, boolean data is bit-packed.
+    Which state is recorded can be chosen per column:
+        location: location (x, y) of each runner
+        alive: whether each runner is alive
+        explored: explored map of each runner
+        tasks: assigned task (x, y) of each runner
+        maze: the maze, safe zone and leaves, only recorded once because they don't change during an episode
+    The time of each recorded step is always recorded.
+
+    `to_record` turns the recording into a few compact columns for a row in the batch results,
+    `from_record` turns such a row back into numpy arrays.
+    """
+
+    COLUMNS = ('location', 'alive', 'explored', 'tasks', 'maze')
+
+    def __init__(self, columns: Sequence[str] = ('location', 'alive', 'tasks'), capacity: int = 1024):
+        """
+        Initialize the recorder, the buffers are allocated at the first record.
+
+        :param columns: Which state to record, see the class documentation
+        :param capacity: Number of time-steps to allocate room for at first, the buffers double in size when full
+        """
+        unknown = set(columns) - set(self.COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown trajectory columns: {sorted(unknown)}, choose from {self.COLUMNS}")
+
+        self.columns = tuple(columns)
+        self.capacity = capacity
+        self.length = 0
+        self.buffers: Dict[str, np.array] = {}
+        self.maze_shape = (0, 0)
+        self.n_runners = 0
+
+    def _allocate(self, env: MazeRunnerEnv) -> None:
+        """Allocate the buffers for the size of the given environment."""
+        self.maze_shape = height, width = env.maze.shape
+        self.n_runners = n_runners = len(env.runners)
+        self.buffers['time'] = np.zeros(self.capacity, dtype=np.int32)
+        if 'location' in self.columns:
+            self.buffers['location'] = np.zeros((self.capacity, n_runners, 2), dtype=np.int16)
+        if 'alive' in self.columns:
+            self.buffers['alive'] = np.zeros((self.capacity, (n_runners + 7) // 8), dtype=np.uint8)
+        if 'explored' in self.columns:
+            self.buffers['explored'] = np.zeros((self.capacity, n_runners, height, (width + 7) // 8), dtype=np.uint8)
+        if 'tasks' in self.columns:
+            self.buffers['tasks'] = np.zeros((self.capacity, n_runners, 2), dtype=np.int16)
+        if 'maze' in self.columns:
+            self.buffers['maze'] = np.packbits(np.stack([env.maze, env.safe_zone, env.leaves]), axis=-1)
+
+    def record(self, env: MazeRunnerEnv) -> None:
+        """
+        Append the current state of the environment.
+
+        :param env: The environment to record, it should have the same maze size and runners at every call
+        """
+        if not self.buffers:
+            self._allocate(env)
+        elif self.length == self.capacity:
+            self.capacity *= 2
+            for column, buffer in self.buffers.items():
+                if column != 'maze':
+                    grown = np.zeros((self.capacity, *buffer.shape[1:]), dtype=buffer.dtype)
+                    grown[:self.length] = buffer
+                    self.buffers[column] = grown
+
+        step = self.length
+        self.buffers['time'][step] = env.time
+        if 'location' in self.columns:
+            self.buffers['location'][step] = [r.location for r in env.runners]
+        if 'alive' in self.columns:
+            self.buffers['alive'][step] = np.packbits([r.alive for r in env.runners])
+        if 'explored' in self.columns:
+            self.buffers['explored'][step] = np.packbits([r.explored for r in env.runners], axis=-1)
+        if 'tasks' in self.columns:
+            self.buffers['tasks'][step] = [r.assigned_task for r in env.runners]
+        self.length += 1
+
+    def to_record(self, prefix: str = 'trajectory_') -> Dict[str, Union[bytes, int, list]]:
+        """
+        Turn the recording into columns for a row of the batch results.
+
+        :param prefix: Prefix of the column names
+        :return: dictionary with the raw bytes of each recorded buffer and the shape info needed to read them back
+        """
+        record = {
+            f'{prefix}length': self.length,
+            f'{prefix}shape': [self.n_runners, *self.maze_shape],
+        }
+        for column, buffer in self.buffers.items():
+            record[prefix + column] = (buffer if column == 'maze' else buffer[:self.length]).tobytes()
+        return record
+
+    @classmethod
+    def from_record(cls, record: dict, prefix: str = 'trajectory_') -> Dict[str, np.array]:
+        """
+        Read a recording back from a row of the batch results.
+
+        :param record: the row, a dictionary (or pandas Series) with the columns made by `to_record`
+        :param prefix: Prefix of the column names
+        :return: dictionary with for each recorded column a numpy array, with time as the first axis
+                 (except for maze, which is an array of [maze, safe_zone, leaves])
+        """
+        length = record[f'{prefix}length']
+        n_runners, height, width = record[f'{prefix}shape']
+        arrays = {'time': np.frombuffer(record[f'{prefix}time'], dtype=np.int32)}
+        if f'{prefix}location' in record:
+            arrays['location'] = np.frombuffer(record[f'{prefix}location'], dtype=np.int16).reshape(length, n_runners, 2)
+        if f'{prefix}alive' in record:
+            packed = np.frombuffer(record[f'{prefix}alive'], dtype=np.uint8).reshape(length, -1)
+            arrays['alive'] = np.unpackbits(packed, axis=-1, count=n_runners).astype(bool)
+        if f'{prefix}explored' in record:
+            packed = np.frombuffer(record[f'{prefix}explored'], dtype=np.uint8).reshape(length, n_runners, height, -1)
+            arrays['explored'] = np.unpackbits(packed, axis=-1, count=width).astype(bool)
+        if f'{prefix}tasks' in record:
+            arrays['tasks'] = np.frombuffer(record[f'{prefix}tasks'], dtype=np.int16).reshape(length, n_runners, 2)
+        if f'{prefix}maze' in record:
+            packed = np.frombuffer(record[f'{prefix}maze'], dtype=np.uint8).reshape(3, height, -1)
+            arrays['maze'] = np.unpackbits(packed, axis=-1, count=width).astype(bool)
+        return arrays
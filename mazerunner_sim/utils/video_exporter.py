@@ -0,0 +1,167 @@
+"""Export episodes to video, the frames are rendered and encoded in the background while the simulation goes on."""
+
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from mazerunner_sim.envs.mazerunner_env import MazeRunnerEnv
+from mazerunner_sim.envs.visualisation.maze_render import (draw_status_text, render_background, render_state, repaint_tiles, status_text,
+                                                           text_tiles)
+from mazerunner_sim.utils.trajectory_recorder import TrajectoryRecorder
+
+
+def render_trajectory(arrays: Dict[str, np.array], day_length: int, follow_runner_id: Union[int, None] = None) -> Iterator[np.array]:
+    """
+    Render the frames of a recorded episode, the same frames as rendering the environment at every recorded step.
+
+    Only the tiles that changed since the previous step are repainted.
+
+    :param arrays: The recording, see `TrajectoryRecorder.from_record`, with the maze, location and tasks columns
+                   (and the explored column to follow a runner)
+    :param day_length: Length of a day in the recorded environment
+    :param follow_runner_id: Id of the runner to follow the explored map of
+    :return: RGB image arrays, one for every recorded step
+    """
+    required = {'maze', 'location', 'tasks'} | ({'explored'} if follow_runner_id is not None else set())
+    missing = required - set(arrays)
+    if missing:
+        raise ValueError(f"The recording misses the columns {sorted(missing)} to render it")
+
+    maze, safe_zone, leaves = arrays['maze']
+    background = render_background(maze, leaves, safe_zone)
+    frame, previous = None, None
+    for step, time in enumerate(arrays['time']):
+        locations, tasks = arrays['location'][step], arrays['tasks'][step]
+        explored = None if follow_runner_id is None else arrays['explored'][step, follow_runner_id]
+        text = status_text(int(time), day_length - int(time) % day_length - 1)
+        tiles_under_text = text_tiles(background, text)
+
+        if frame is None:
+            frame = render_state(background, locations.tolist(), tasks.tolist(), explored, text)
+        else:
+            previous_locations, previous_tasks, previous_explored, previous_text_tiles = previous
+            changed = [previous_locations, locations, previous_tasks, tasks]
+            moved = np.any(previous_locations != locations, axis=-1) | np.any(previous_tasks != tasks, axis=-1)
+            tiles = {(x, y) for coords in changed for x, y in coords[moved].tolist()}
+            if explored is not None:
+                tiles.update(zip(*np.nonzero((explored != previous_explored).T)))
+            repaint_tiles(frame, background, tiles | previous_text_tiles | tiles_under_text, locations.tolist(), tasks.tolist(), explored)
+            draw_status_text(frame, text)
+        previous = locations, tasks, explored, tiles_under_text
+        yield np.array(frame.convert('RGB'))
+
+
+def write_video(frames: Iterable[np.array], filename: str, fps: float = 10.) -> int:
+    """
+    Encode frames to a video file, a GIF when the filename ends with .gif and an MP4 otherwise.
+
+    :param frames: RGB image arrays, all of the same size
+    :param filename: Filename of the video
+    :param fps: Frames per second
+    :return: the number of frames
+    """
+    if filename.lower().endswith('.gif'):
+        images = [Image.fromarray(frame) for frame in frames]
+        if images:
+            images[0].save(filename, save_all=True, append_images=images[1:], duration=round(1000 / fps), loop=0)
+        return len(images)
+
+    writer = None
+    n_frames = 0
+    try:
+        for frame in frames:
+            if writer is None:
+                writer = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*'mp4v'), fps, (frame.shape[1], frame.shape[0]))
+            writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+            n_frames += 1
+    finally:
+        if writer is not None:
+            writer.release()
+    return n_frames
+
+
+def export_record(record: dict, filename: str, day_length: int, fps: float = 10., follow_runner_id: Union[int, None] = None,
+                  prefix: str = 'trajectory_') -> int:
+    """
+    Render an episode recorded by a `TrajectoryRecorder` to a video file, without simulating it again.
+
+    Works on the rows of the batch results when the `trajectory_columns` of the batch include maze, location and tasks.
+
+    :param record: the row with the recording, see `TrajectoryRecorder.to_record`
+    :param filename: Filename of the video, see `write_video`
+    :param day_length: Length of a day in the recorded environment
+    :param fps: Frames per second
+    :param follow_runner_id: Id of the runner to follow the explored map of, needs the explored column
+    :param prefix: Prefix of the column names
+    :return: the number of frames
+    """
+    arrays = TrajectoryRecorder.from_record(record, prefix)
+    return write_video(render_trajectory(arrays, day_length, follow_runner_id), filename, fps)
+
+
+class VideoExporter:
+    """
+    Record episodes while simulating and export them to video in the background.
+
+    Recording a step only copies the locations, tasks (and explored map) of the runners into a `TrajectoryRecorder`,
+    the rendering and encoding of an episode happen in an executor, so the simulation doesn't wait for them.
+    A process pool can be given as executor as well, the recording is sent to it as compact bytes.
+    """
+
+    COLUMNS = ('location', 'tasks', 'maze')
+
+    def __init__(self, fps: float = 10., follow_runner_id: Union[int, None] = None, executor: Union[Executor, None] = None):
+        """
+        Initialize the exporter.
+
+        :param fps: Frames per second of the videos
+        :param follow_runner_id: Id of the runner to follow the explored map of, None to show the whole maze
+        :param executor: Executor to render and encode in, a single background thread by default
+        """
+        self.fps = fps
+        self.follow_runner_id = follow_runner_id
+        self.owns_executor = executor is None
+        self.executor = ThreadPoolExecutor(max_workers=1) if executor is None else executor
+        self.columns = self.COLUMNS + (('explored',) if follow_runner_id is not None else ())
+        self.recorder = TrajectoryRecorder(self.columns)
+        self.day_length = None
+        self.futures: List[Future] = []
+
+    def record(self, env: MazeRunnerEnv) -> None:
+        """Record the current step of the environment, call it after every step (and once before the first)."""
+        self.day_length = env.day_length
+        self.recorder.record(env)
+
+    def export(self, filename: str) -> Future:
+        """
+        Render and encode the recorded episode in the background, the next recording starts a new episode.
+
+        :param filename: Filename of the video, see `write_video`
+        :return: future of the number of frames
+        """
+        record = self.recorder.to_record()
+        future = self.executor.submit(export_record, record, filename, self.day_length, self.fps, self.follow_runner_id)
+        self.futures.append(future)
+        self.recorder = TrajectoryRecorder(self.columns)
+        return future
+
+    def close(self) -> None:
+        """Wait for all the exports to finish, errors of the exports are raised here."""
+        try:
+            for future in self.futures:
+                future.result()
+        finally:
+            self.futures = []
+            if self.owns_executor:
+                self.executor.shutdown()
+
+    def __enter__(self) -> 'VideoExporter':
+        """Use the exporter as a context manager, it's closed at the end."""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Close the exporter."""
+        self.close()
@@ -8,7 +8,7 @@ install_requires = [
     'matplotlib',
     'seaborn',
     'pandas',
-    'pyarrow',
+    'pyarrow>=14',
     'tqdm',
 ]
 
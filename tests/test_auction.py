@@ -0,0 +1,59 @@
+"""Tests of the night-time task auction."""
+
+import math
+
+import numpy as np
+import pytest
+
+from mazerunner_sim.utils.auction import auction, worth_matrix
+
+
+def loop_auction(worths, n_tasks):
+    """Run the auction as it was written before it worked on a matrix, on a dictionary with the worths of every runner."""
+    assignments = {}
+    small_value = 1 / (len(worths) + 1)
+    while len(assignments) < len(worths):
+        for runner_id in sorted(worths):
+            if not any(r == runner_id for r, _ in assignments.values()):
+                highest, second_highest = -math.inf, -math.inf
+                highest_task = None
+                for task_id in range(n_tasks):
+                    if task_id in assignments:
+                        relative_value = worths[runner_id][task_id] - assignments[task_id][1]
+                    else:
+                        relative_value = worths[runner_id][task_id]
+                    if relative_value >= highest:
+                        highest, second_highest = relative_value, highest
+                        highest_task = task_id
+                    elif relative_value >= second_highest:
+                        second_highest = relative_value
+                price = assignments.get(highest_task, (0, 0))[1] + highest - second_highest + small_value
+                assignments[highest_task] = (runner_id, price)
+    return {task_id: runner_id for task_id, (runner_id, _) in assignments.items()}
+
+
+@pytest.mark.parametrize('kind', ['random', 'ties', 'equal'])
+def test_auction_matches_loop(kind):
+    """The auction on a matrix assigns the same tasks as the loop, also when the worths tie."""
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        n_runners = int(rng.integers(1, 10))
+        n_tasks = int(rng.integers(n_runners, 2 * n_runners + 3))
+        runner_ids = sorted(rng.choice(30, n_runners, replace=False).tolist())
+        if kind == 'random':
+            raw = rng.random((n_runners, n_tasks))
+        elif kind == 'ties':
+            raw = rng.integers(0, 4, (n_runners, n_tasks)) + 0.5
+        else:
+            raw = np.ones((n_runners, n_tasks))
+        worths = worth_matrix(raw.tolist(), n_tasks)
+
+        expected = loop_auction({runner_id: list(row) for runner_id, row in zip(runner_ids, worths)}, n_tasks)
+        won = auction(worths)
+        assert {int(task): runner_ids[runner] for runner, task in enumerate(won)} == expected
+
+
+def test_worth_matrix_rejects_zero_worths():
+    """Worths that sum to 0 can't be scaled."""
+    with pytest.raises(ZeroDivisionError):
+        worth_matrix([[0., 0.]], 2)
@@ -0,0 +1,70 @@
+"""Tests of the batch runner."""
+
+import random
+
+import numpy as np
+import pyarrow.feather as feather
+
+from mazerunner_sim import BatchRunner
+from mazerunner_sim.envs import MazeRunnerEnv, Runner
+from mazerunner_sim.policies import LeafTrackerPolicy, PathFindingPolicy, PureRandomPolicy
+
+
+class EpisodeBatch(BatchRunner):
+    """Batch that keeps the outcome of every episode and the locations of the runners at every time-step."""
+
+    trajectory_columns = ('location',)
+
+    @staticmethod
+    def update(env, data):
+        """Count the steps."""
+        return (data or 0) + 1
+
+    @staticmethod
+    def finish(env, data):
+        """Keep the outcome of the episode."""
+        return {'time': env.time, 'steps': data, 'reward': env.total_rewards_given,
+                'explored': int(sum(runner.explored.sum() for runner in env.runners))}
+
+
+def factory():
+    """Build environments from the global random state, and the policies of their runners."""
+    envs = [MazeRunnerEnv([Runner(action_speed=0, memory_decay_percentage=10) for _ in range(3)], maze_size=6, day_length=30)
+            for _ in range(2)]
+    return envs, [PathFindingPolicy(), LeafTrackerPolicy(), PureRandomPolicy()]
+
+
+def read_rows(filename):
+    """Read the results of a batch, in the order of the seeds."""
+    return sorted(feather.read_table(filename).to_pylist(), key=lambda row: row['seed'])
+
+
+def test_factory_gives_the_same_rows(tmp_path):
+    """Workers that build the environments with a factory give the same rows as sending them copies."""
+    random.seed(0)
+    np.random.seed(0)
+    envs, policies = factory()
+    batch_size = 6
+
+    EpisodeBatch(str(tmp_path / 'processes.feather')).run_batch(envs, policies, batch_size)
+    EpisodeBatch(str(tmp_path / 'factory.feather')).run_batch_with_factory(factory, batch_size, chunksize=2)
+
+    expected = read_rows(tmp_path / 'processes.feather')
+    assert [row['seed'] for row in expected] == list(range(batch_size))
+    assert read_rows(tmp_path / 'factory.feather') == expected
+
+
+def test_threads_give_the_same_rows(tmp_path):
+    """Threads with copies of the environments, or with a factory, give the same rows as the process pool."""
+    random.seed(0)
+    np.random.seed(0)
+    envs, policies = factory()
+    batch_size = 6
+
+    EpisodeBatch(str(tmp_path / 'processes.feather')).run_batch(envs, policies, batch_size)
+    EpisodeBatch(str(tmp_path / 'threads.feather')).run_batch_in_threads(envs, policies, batch_size, max_workers=2)
+    EpisodeBatch(str(tmp_path / 'thread_factory.feather')).run_batch_in_threads(None, None, batch_size, factory=factory, max_workers=2)
+
+    expected = read_rows(tmp_path / 'processes.feather')
+    assert read_rows(tmp_path / 'threads.feather') == expected
+    assert read_rows(tmp_path / 'thread_factory.feather') == expected
@@ -0,0 +1,31 @@
+"""Tests of the event-driven stepping of the environment."""
+
+from mazerunner_sim.envs import MazeRunnerEnv, Runner
+from mazerunner_sim.policies import PathFindingPolicy
+
+
+def run_episode(event_driven: bool, max_time: int = 400):
+    """Run a seeded episode with path finding runners, keep the state of the runners after every step by its time."""
+    runners = [Runner(action_speed=0, memory_decay_percentage=5) for _ in range(3)]
+    env = MazeRunnerEnv(runners, maze_size=8, day_length=30, event_driven=event_driven, seed=1)
+    policies = [PathFindingPolicy() for _ in runners]
+    for seed, policy in enumerate(policies):
+        policy.seed(seed)
+    observations = env.get_observations(first_observation=True)
+    states = {}
+    done = False
+    while not done and env.time < max_time:
+        observations, _, done, _ = env.step({i: policies[i].decide_action(o) for i, o in observations.items()})
+        states[env.time] = (env.total_rewards_given, [(tuple(r.location), r.alive, r.explored.sum()) for r in env.runners])
+    return env, states
+
+
+def test_event_driven_matches_step_by_step():
+    """Skipping the time-steps where every runner holds gives the same episode as stepping through them."""
+    step_env, step_states = run_episode(event_driven=False)
+    event_env, event_states = run_episode(event_driven=True)
+    # Some time-steps are skipped, the ones that aren't are the same
+    assert len(event_states) < len(step_states)
+    for time, state in event_states.items():
+        assert state == step_states[time], time
+    assert event_env.time == step_env.time and event_env.done == step_env.done
@@ -0,0 +1,39 @@
+"""Tests of the posterior of the exit."""
+
+from typing import List, Tuple
+
+import numpy as np
+
+from mazerunner_sim.envs.maze_generator import generate_maze_fast
+from mazerunner_sim.utils.exit_posterior import ExitPosterior
+from mazerunner_sim.utils.pathfinder import Coord, manhattan_distance
+
+
+def calc_probability_exit(proposed_exit: Coord, known_leaves: List[Coord], known_not_leaves: List[Coord],
+                          maze_shape: Tuple[int, int]) -> float:
+    """Calculate the relative probability of an exit the way `LeafTrackerPolicy` did before the posterior was kept in log-space."""
+    largest_dist = sum(maze_shape) - 4
+    return float(np.prod([1 - manhattan_distance(coord, proposed_exit) / largest_dist for coord in known_leaves] +
+                         [manhattan_distance(coord, proposed_exit) / largest_dist for coord in known_not_leaves]
+                         )) * 2**(len(known_not_leaves) + len(known_leaves))
+
+
+def test_posterior_matches_product_of_chances():
+    """The posterior updated with the new tiles is the normalized product of the leaf chances of all the seen tiles."""
+    for seed in range(10):
+        rng = np.random.default_rng(seed)
+        maze, _, leaves = generate_maze_fast(5, 2, rng=rng)
+        # Tiles inside the border, which are never further from a candidate exit than the largest distance
+        inside = np.zeros_like(maze)
+        inside[1:-1, 1:-1] = True
+        posterior = ExitPosterior(maze.shape)
+        known = np.zeros_like(maze)
+        for _ in range(4):
+            known |= inside & (rng.random(maze.shape) < 0.1)
+            posterior.update(known & maze, known & leaves)
+
+            known_leaves = [(int(x), int(y)) for y, x in np.argwhere(known & maze & leaves)]
+            known_not_leaves = [(int(x), int(y)) for y, x in np.argwhere(known & maze & ~leaves)]
+            expected = np.array([calc_probability_exit(tuple(candidate), known_leaves, known_not_leaves, maze.shape)
+                                 for candidate in posterior.candidates.tolist()])
+            assert np.allclose(posterior.probabilities, expected / expected.sum())
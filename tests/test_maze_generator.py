@@ -0,0 +1,54 @@
+"""Tests of the maze generators."""
+
+import numpy as np
+
+from mazerunner_sim.envs import MazeRunnerEnv, Runner
+from mazerunner_sim.envs.maze_generator import generate_maze_fast, generate_mazes
+from mazerunner_sim.policies import PureRandomPolicy
+from mazerunner_sim.utils.distance_field import DistanceField
+
+
+def test_same_seed_gives_the_same_maze():
+    """The seeded generator gives the same mazes for the same seed, and other mazes for other seeds."""
+    first = generate_maze_fast(10, 3, rng=np.random.default_rng(7))
+    second = generate_maze_fast(10, 3, rng=np.random.default_rng(7))
+    other = generate_maze_fast(10, 3, rng=np.random.default_rng(8))
+    assert all(np.array_equal(a, b) for a, b in zip(first, second))
+    assert not np.array_equal(first[0], other[0])
+
+    batch = generate_mazes(3, 10, 3, rng=np.random.default_rng(7))
+    assert all(np.array_equal(a, b) for a, b in zip(batch, generate_mazes(3, 10, 3, rng=np.random.default_rng(7))))
+
+
+def test_open_tiles_are_reachable():
+    """Every cell of the grid of a generated maze can be reached from the safe zone, and the safe zone is open."""
+    mazes, safe_zones, _ = generate_mazes(5, 10, 3, rng=np.random.default_rng(0))
+    for maze, safe_zone in zip(mazes, safe_zones):
+        assert maze[safe_zone].all()
+        center = maze.shape[0] // 2
+        field = DistanceField(maze, [(center, center)])
+        # The random openings can also open a lone corner between the cells, so only the cells are checked
+        cells = range(1, maze.shape[0], 2)
+        assert all(field.reachable((x, y)) for x in cells for y in cells)
+
+
+def test_same_seed_gives_the_same_episode():
+    """Environments made with the same seed have the same maze and, with seeded policies, the same episode."""
+    def run_episode(seed):
+        env = MazeRunnerEnv([Runner(action_speed=0) for _ in range(3)], maze_size=6, day_length=20, seed=seed)
+        policies = [PureRandomPolicy() for _ in env.runners]
+        for policy_seed, policy in enumerate(policies):
+            policy.seed(policy_seed)
+        observations = env.get_observations(first_observation=True)
+        locations = []
+        done = False
+        while not done and env.time < 100:
+            observations, _, done, _ = env.step({i: policies[i].decide_action(o) for i, o in observations.items()})
+            locations.append([tuple(r.location) for r in env.runners])
+        return env, locations
+
+    env, locations = run_episode(3)
+    same_env, same_locations = run_episode(3)
+    assert np.array_equal(env.maze, same_env.maze) and np.array_equal(env.leaves, same_env.leaves)
+    assert locations == same_locations
+    assert env.total_rewards_given == same_env.total_rewards_given
@@ -0,0 +1,48 @@
+"""Tests of the renders of the maze."""
+
+import numpy as np
+from PIL import Image
+
+from mazerunner_sim.envs import MazeRunnerEnv, Runner
+from mazerunner_sim.envs.visualisation.maze_render import (IncrementalRenderer, TILE_KINDS, load_texture, render_agent_in_step,
+                                                           render_background, tile_kinds, wall_textures)
+from mazerunner_sim.policies import PathFindingPolicy, PureRandomPolicy
+
+
+def test_background_matches_pasted_tiles():
+    """The background from the texture atlas is the same as pasting the textures of every tile."""
+    env = MazeRunnerEnv([Runner()], maze_size=6, seed=0)
+    path, leaf = load_texture("dirt"), load_texture("leaf")
+    textures = dict(wall_textures(), path=path, leaf=leaf)
+    safe_zone_texture = Image.new(mode="RGBA", size=path.size, color=(250, 100, 0, 100))
+    tile_width, tile_height = path.size
+
+    expected = Image.new(mode="RGB", size=(env.maze.shape[1] * tile_width, env.maze.shape[0] * tile_height))
+    for (y, x), kind in np.ndenumerate(tile_kinds(env.maze, env.leaves)):
+        position = (x * tile_width, y * tile_height)
+        texture = textures[TILE_KINDS[kind]]
+        if TILE_KINDS[kind] == 'leaf':
+            expected.paste(path, position, path)
+        expected.paste(texture, position, texture)
+        if env.safe_zone[y, x]:
+            expected.paste(safe_zone_texture, position, safe_zone_texture)
+
+    assert np.array_equal(np.array(render_background(env.maze, env.leaves, env.safe_zone)), np.array(expected))
+
+
+def test_incremental_frames_match_full_frames():
+    """Repainting only the tiles that changed gives the same frames as rendering every frame in full."""
+    env = MazeRunnerEnv([Runner(action_speed=0, memory_decay_percentage=10) for _ in range(4)], maze_size=8, day_length=15, seed=0)
+    policies = [PathFindingPolicy() if i % 2 else PureRandomPolicy() for i in range(4)]
+    renderer = IncrementalRenderer(env)
+    observations = env.get_observations(first_observation=True)
+    for t in range(90):
+        observations, _, done, _ = env.step({i: policies[i].decide_action(o) for i, o in observations.items()})
+        # Switch between following no runner and following runner 1 or 2
+        follow_runner_id = (None, 1, 2)[(t // 30) % 3]
+        assert np.array_equal(np.array(renderer.render(follow_runner_id)), np.array(render_agent_in_step(env, follow_runner_id)))
+        if done:
+            env.reset()
+            for policy in policies:
+                policy.reset()
+            observations = env.get_observations(first_observation=True)
@@ -0,0 +1,73 @@
+"""Tests of the path finding."""
+
+from queue import PriorityQueue
+
+import numpy as np
+
+from mazerunner_sim.envs.maze_generator import generate_maze_fast
+from mazerunner_sim.utils.pathfinder import compute_explore_paths, paths_origin_targets
+
+
+def neighbours(maze, tile):
+    """Yield the open tiles next to a tile, in the order the old searches visited them."""
+    x, y = tile
+    height, width = maze.shape
+    for next_tile in [(x, y - 1), (x - 1, y), (x + 1, y), (x, y + 1)]:
+        if 0 <= next_tile[0] < width and 0 <= next_tile[1] < height and maze[next_tile[1], next_tile[0]]:
+            yield next_tile
+
+
+def traceback(visited, end, origin):
+    """Trace a path back from the end to the origin, without the origin."""
+    path = [end]
+    while visited[end] != origin and end != origin:
+        end = visited[end]
+        path.append(end)
+    return path[::-1]
+
+
+def dijkstra_explore_paths(start, known_maze, explored):
+    """Find the paths to the edge of knowledge with the priority queue search used before the distance fields."""
+    edge_tiles, visited = [], {start: None}
+    padded = np.pad(explored, (1, 1), 'constant', constant_values=False)
+    queue = PriorityQueue()
+    queue.put((0, start))
+    while not queue.empty():
+        priority, tile = queue.get()
+        for next_tile in neighbours(known_maze, tile):
+            if next_tile not in visited:
+                x, y = next_tile[0] + 1, next_tile[1] + 1
+                if not (padded[y - 1, x] and padded[y, x - 1] and padded[y, x + 1] and padded[y + 1, x]):
+                    edge_tiles.append(next_tile)
+                queue.put((priority + 1, next_tile))
+                visited[next_tile] = tile
+    return [traceback(visited, tile, start) for tile in edge_tiles]
+
+
+def random_knowledge(seed):
+    """Generate a maze with a part of it known to a runner in its center."""
+    rng = np.random.default_rng(seed)
+    maze, safe_zone, _ = generate_maze_fast(8, 2, rng=rng)
+    explored = safe_zone | (rng.random(maze.shape) < 0.6)
+    start = tuple(int(c) for c in np.argwhere(safe_zone & maze)[0][::-1])
+    return maze, maze & explored, explored, start
+
+
+def test_explore_paths_match_dijkstra():
+    """The distance field gives the same paths to the edge of knowledge, in the same order, as the old search."""
+    for seed in range(30):
+        maze, known_maze, explored, start = random_knowledge(seed)
+        assert compute_explore_paths(start, known_maze, explored) == dijkstra_explore_paths(start, known_maze, explored)
+
+
+def test_paths_to_targets_are_shortest():
+    """The paths to many targets are walkable and as short as the old breadth-first distances."""
+    for seed in range(30):
+        maze, _, _, start = random_knowledge(seed)
+        # Breadth-first distances from the start with the old search, as the reference
+        distances = {tile: len(path) for path in dijkstra_explore_paths(start, maze, np.zeros_like(maze)) for tile in path[-1:]}
+        targets = list(distances)[::7]
+        for target, path in zip(targets, paths_origin_targets(start, targets, maze)):
+            assert path[-1] == target and len(path) == distances[target]
+            for a, b in zip([start] + path, path):
+                assert maze[b[1], b[0]] and abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1
@@ -0,0 +1,61 @@
+"""Tests of the streaming result writer."""
+
+import pyarrow as pa
+import pyarrow.feather as feather
+import pytest
+
+from mazerunner_sim.utils.result_writer import StreamingResultWriter
+
+
+def test_resume_keeps_the_written_results(tmp_path):
+    """A resumed batch knows which seeds are done and combines the old and the new results."""
+    filename = str(tmp_path / 'results.feather')
+    writer = StreamingResultWriter(filename, infer_rows=1)
+    for seed in range(3):
+        writer.write({'seed': seed, 'time': 10 * seed})
+    writer.close(finish=False)
+
+    with StreamingResultWriter(filename, resume=True) as writer:
+        assert writer.completed_seeds == {0, 1, 2}
+        for seed in range(3, 5):
+            writer.write({'seed': seed, 'time': 10 * seed})
+
+    assert feather.read_table(filename).to_pylist() == [{'seed': seed, 'time': 10 * seed} for seed in range(5)]
+    assert not writer.journal_parts()
+
+
+def test_types_are_promoted_across_parts(tmp_path):
+    """Results that don't fit the types so far go into a new part, the parts are combined with promoted types."""
+    filename = str(tmp_path / 'results.feather')
+    writer = StreamingResultWriter(filename, infer_rows=1)
+    writer.write({'seed': 0, 'exit': None, 'reward': 1})
+    writer.write({'seed': 1, 'exit': 3, 'reward': 2.5})
+    writer.write({'seed': 2, 'reward': 2})
+    writer.close(finish=False)
+    assert len(writer.journal_parts()) == 2
+
+    with StreamingResultWriter(filename, resume=True) as writer:
+        writer.write({'seed': 3, 'exit': None, 'reward': None})
+
+    table = feather.read_table(filename)
+    assert table.schema.field('exit').type == pa.int64() and table.schema.field('reward').type == pa.float64()
+    assert table.to_pylist() == [{'seed': 0, 'exit': None, 'reward': 1.0}, {'seed': 1, 'exit': 3, 'reward': 2.5},
+                                 {'seed': 2, 'exit': None, 'reward': 2.0}, {'seed': 3, 'exit': None, 'reward': None}]
+
+
+def test_values_that_are_sometimes_none_stay_in_one_part(tmp_path):
+    """The types are inferred from the first results, a column that's sometimes None doesn't start new parts."""
+    filename = str(tmp_path / 'results.feather')
+    writer = StreamingResultWriter(filename, infer_rows=4)
+    for seed in range(20):
+        writer.write({'seed': seed, 'exit': None if seed % 3 else seed})
+    writer.close(finish=False)
+    assert len(writer.journal_parts()) == 1
+
+
+def test_unknown_columns_are_refused(tmp_path):
+    """The columns are fixed by the first result."""
+    with pytest.raises(ValueError):
+        with StreamingResultWriter(str(tmp_path / 'results.feather')) as writer:
+            writer.write({'seed': 0, 'time': 1})
+            writer.write({'seed': 1, 'time': 1, 'reward': 2})
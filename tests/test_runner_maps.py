@@ -0,0 +1,53 @@
+"""Tests of the maps of the runners."""
+
+import numpy as np
+import pytest
+
+from mazerunner_sim.envs import MazeRunnerEnv, Runner
+from mazerunner_sim.policies import PathFindingPolicy, PureRandomPolicy
+
+MAP_FIELDS = ('explored', 'known_maze', 'known_leaves', 'edge_of_knowledge')
+
+
+def run_episode(policy_class, packed_maps: bool = False, observation_mode: str = 'copy', max_time: int = 300):
+    """Run a seeded episode and keep every observation, with a copy of its maps as they were when it was made."""
+    runners = [Runner(action_speed=0, memory_decay_percentage=5, packed_maps=packed_maps) for _ in range(3)]
+    env = MazeRunnerEnv(runners, maze_size=8, day_length=30, observation_mode=observation_mode, seed=1)
+    policies = [policy_class() for _ in runners]
+    for seed, policy in enumerate(policies):
+        policy.seed(seed)
+    observations = env.get_observations(first_observation=True)
+    kept = []
+    done = False
+    while not done and env.time < max_time:
+        for runner_id, observation in observations.items():
+            kept.append((runner_id, observation, [getattr(observation, field).copy() for field in MAP_FIELDS]))
+        observations, _, done, _ = env.step({i: policies[i].decide_action(o) for i, o in observations.items()})
+    return env, kept
+
+
+@pytest.mark.parametrize('policy_class', [PathFindingPolicy, PureRandomPolicy])
+def test_packed_maps_match_bool_maps(policy_class):
+    """Runners with packed maps see the same maps and take the same steps as runners with boolean maps."""
+    bool_env, bool_kept = run_episode(policy_class, packed_maps=False)
+    packed_env, packed_kept = run_episode(policy_class, packed_maps=True)
+    assert bool_env.time == packed_env.time
+    assert len(bool_kept) == len(packed_kept)
+    for (bool_id, _, bool_maps), (packed_id, _, packed_maps) in zip(bool_kept, packed_kept):
+        assert bool_id == packed_id
+        for bool_map, packed_map in zip(bool_maps, packed_maps):
+            assert np.array_equal(bool_map, packed_map)
+
+
+@pytest.mark.parametrize('packed_maps', [False, True])
+def test_snapshot_observations(packed_maps):
+    """Snapshot observations are read-only, equal to copied observations, and don't change when the runners move on."""
+    copy_env, copy_kept = run_episode(PureRandomPolicy, packed_maps=packed_maps)
+    snapshot_env, snapshot_kept = run_episode(PureRandomPolicy, packed_maps=packed_maps, observation_mode='snapshot')
+    assert copy_env.time == snapshot_env.time
+    assert len(copy_kept) == len(snapshot_kept)
+    for (_, _, copy_maps), (_, snapshot, snapshot_maps) in zip(copy_kept, snapshot_kept):
+        for field, copy_map, snapshot_map in zip(MAP_FIELDS, copy_maps, snapshot_maps):
+            assert not getattr(snapshot, field).flags.writeable
+            assert np.array_equal(getattr(snapshot, field), snapshot_map)
+            assert np.array_equal(copy_map, snapshot_map)
@@ -0,0 +1,40 @@
+"""Tests of the random streams of the episodes."""
+
+import random
+
+import numpy as np
+
+from mazerunner_sim.envs import MazeRunnerEnv, Runner
+
+# The mazes of two environments made one after the other after seeding the global random state with 0, before the
+# environments had random streams of their own: '#' is a wall, '.' an open tile and 'L' an open tile with a leaf
+BASELINE_MAZES = (
+    ('#######L###', '#L..L.L.LL#', '#.###L#L###', '#.#L#L#LLL#', '#.##.LL.#L#', '#LL.L.LLLL#',
+     '####L.L#LL#', '#.L.LLLL..#', '#.###L##LL#', '#...LL#LL.#', '###########'),
+    ('######L####', '#..LLLLLL.#', '#.###L#.#L#', '#L###..L#L#', '#.##L.LL#.#', '#...L.L.L.#',
+     '#L##LLL.#.#', '#L#.LL#.#L#', '#L###LL##L#', '#.LL#.L...#', '###########'),
+)
+# What the global random states drew next
+BASELINE_NEXT_DRAWS = (0.09121595383022585, 0.8694885305466322)
+
+
+def maze_rows(env):
+    """Write the maze and the leaves on its open tiles like `BASELINE_MAZES`."""
+    return tuple(''.join('L' if env.leaves[y, x] and env.maze[y, x] else '.' if env.maze[y, x] else '#' for x in range(env.maze.shape[1]))
+                 for y in range(env.maze.shape[0]))
+
+
+def test_unseeded_envs_keep_the_global_random_state():
+    """Environments without a seed don't draw from the global random state beyond their mazes."""
+    random.seed(0)
+    np.random.seed(0)
+    envs = [MazeRunnerEnv([Runner() for _ in range(2)], maze_size=5, center_size=2) for _ in range(2)]
+    assert tuple(maze_rows(env) for env in envs) == BASELINE_MAZES
+    assert (random.random(), np.random.rand()) == BASELINE_NEXT_DRAWS
+
+
+def test_unseeded_streams_differ():
+    """Streams derived from the same global random state are still different."""
+    np.random.seed(0)
+    first, second = MazeRunnerEnv([Runner()], maze_size=5, center_size=2), MazeRunnerEnv([Runner()], maze_size=5, center_size=2)
+    assert first.rng.integers(2 ** 32) != second.rng.integers(2 ** 32)
@@ -0,0 +1,58 @@
+"""Tests of the index of the tiles that can become a task."""
+
+import numpy as np
+
+from mazerunner_sim.utils.task_sampler import TaskSampler
+
+
+def assert_consistent(sampler: TaskSampler, candidates: np.array, explored: np.array):
+    """Check that the index holds exactly the unexplored candidates, and that every tile knows its slot."""
+    tiles = sampler._tiles[:sampler.size]
+    expected = np.flatnonzero(candidates & ~explored)
+    assert sorted(tiles.tolist()) == expected.tolist()
+    assert np.array_equal(sampler._slots[tiles], np.arange(sampler.size))
+    assert (np.delete(sampler._slots, tiles) == -1).all()
+
+
+def test_explore_keeps_the_index_consistent():
+    """Removing the explored tiles one block at a time keeps the same index as rebuilding it from the explored map."""
+    rng = np.random.default_rng(0)
+    candidates = rng.random((15, 12)) < 0.7
+    explored = rng.random(candidates.shape) < 0.2
+    sampler = TaskSampler(candidates)
+    sampler.update(explored)
+    assert_consistent(sampler, candidates, explored)
+
+    for _ in range(60):
+        x, y = rng.integers(12), rng.integers(15)
+        sampler.explore(x, y)
+        explored[max(y - 1, 0):y + 2, max(x - 1, 0):x + 2] = True
+        assert_consistent(sampler, candidates, explored)
+
+    tasks = sampler.sample(20, rng)
+    assert all(candidates[y, x] and not explored[y, x] for x, y in tasks)
+    sampler.update(explored)
+    assert_consistent(sampler, candidates, explored)
+
+
+def test_sample_from_empty_index():
+    """There are no tasks when every candidate is explored."""
+    candidates = np.ones((4, 4), dtype=bool)
+    sampler = TaskSampler(candidates)
+    sampler.update(candidates)
+    assert len(sampler) == 0 and sampler.sample(3, np.random.default_rng(0)) == []
+
+
+def test_explore_many_matches_one_at_a_time():
+    """Removing the blocks around many locations at once leaves the same tiles as removing them one at a time."""
+    rng = np.random.default_rng(1)
+    candidates = rng.random((15, 12)) < 0.7
+    explored = np.zeros(candidates.shape, dtype=bool)
+    sampler = TaskSampler(candidates)
+    sampler.update(explored)
+    for _ in range(10):
+        xs, ys = rng.integers(-1, 13, 5), rng.integers(-1, 16, 5)
+        sampler.explore_many(xs, ys)
+        for x, y in zip(xs, ys):
+            explored[max(y - 1, 0):max(y + 2, 0), max(x - 1, 0):max(x + 2, 0)] = True
+        assert_consistent(sampler, candidates, explored)
@@ -0,0 +1,38 @@
+"""Tests of the trajectory recorder."""
+
+import numpy as np
+import pyarrow as pa
+
+from mazerunner_sim.envs import MazeRunnerEnv, Runner
+from mazerunner_sim.policies import PathFindingPolicy, PureRandomPolicy
+from mazerunner_sim.utils.trajectory_recorder import TrajectoryRecorder
+
+
+def test_record_round_trip():
+    """A recording read back from a row of the batch results has the state of the environment at every recorded step."""
+    env = MazeRunnerEnv([Runner(action_speed=0, memory_decay_percentage=10) for _ in range(3)], maze_size=6, day_length=20, seed=0)
+    policies = [PathFindingPolicy(), PureRandomPolicy(), PureRandomPolicy()]
+    # A small capacity, so the buffers have to grow during the episode
+    recorder = TrajectoryRecorder(TrajectoryRecorder.COLUMNS, capacity=4)
+    expected = {column: [] for column in ('time', 'location', 'alive', 'explored', 'tasks')}
+
+    observations = env.get_observations(first_observation=True)
+    for _ in range(50):
+        recorder.record(env)
+        expected['time'].append(env.time)
+        expected['location'].append([tuple(r.location) for r in env.runners])
+        expected['alive'].append([r.alive for r in env.runners])
+        expected['explored'].append([r.explored.copy() for r in env.runners])
+        expected['tasks'].append([tuple(r.assigned_task) for r in env.runners])
+        observations, _, done, _ = env.step({i: policies[i].decide_action(o) for i, o in observations.items()})
+        if done:
+            break
+
+    # Through an arrow table, like the rows of the batch results
+    row = pa.Table.from_pylist([recorder.to_record()]).to_pylist()[0]
+    arrays = TrajectoryRecorder.from_record(row)
+
+    assert row['trajectory_length'] == len(expected['time'])
+    for column, values in expected.items():
+        assert np.array_equal(arrays[column], np.array(values)), column
+    assert np.array_equal(arrays['maze'], np.stack([env.maze, env.safe_zone, env.leaves]))
@@ -0,0 +1,67 @@
+"""Tests of the vectorized environment."""
+
+import copy
+
+import numpy as np
+import pytest
+
+from mazerunner_sim.envs import MazeRunnerEnv, Runner, VectorMazeRunnerEnv
+from mazerunner_sim.utils.observation_and_action import Action
+
+
+def random_actions(observations, rng):
+    """Random actions for the runners that got an observation, with task worths when there are tasks."""
+    return {runner_id: Action(int(rng.choice(5, p=[.3, .2, .2, .2, .1])), list(rng.random(len(o.tasks)) + 0.01))
+            for runner_id, o in observations.items()}
+
+
+def assert_same_observations(expected, actual, read_only):
+    """Check that two observations of every runner are the same, the distance oracles are on the same maze."""
+    assert expected.keys() == actual.keys()
+    for runner_id in expected:
+        for field in expected[runner_id]._fields:
+            if field == 'distance_oracle':
+                expected_oracle, actual_oracle = expected[runner_id].distance_oracle, actual[runner_id].distance_oracle
+                assert np.array_equal(expected_oracle.maze, actual_oracle.maze)
+                assert np.array_equal(expected_oracle.safe_zone, actual_oracle.safe_zone)
+            else:
+                assert np.array_equal(np.asarray(getattr(expected[runner_id], field)), np.asarray(getattr(actual[runner_id], field))), field
+        for field in ('explored', 'known_maze', 'known_leaves', 'edge_of_knowledge'):
+            assert getattr(actual[runner_id], field).flags.writeable != read_only
+
+
+@pytest.mark.parametrize('observation_mode', ['snapshot', 'copy'])
+def test_vector_env_matches_separate_envs(observation_mode):
+    """Stepping the vectorized environment is the same as stepping every environment on its own."""
+    n_envs, n_runners = 4, 3
+    envs = [MazeRunnerEnv([Runner(action_speed=i, memory_decay_percentage=10 * i) for i in range(n_runners)],
+                          maze_size=8, day_length=20, seed=seed) for seed in range(n_envs)]
+    separate = copy.deepcopy(envs)
+    vector = VectorMazeRunnerEnv(envs, observation_mode=observation_mode)
+    rng = np.random.default_rng(0)
+
+    observations = [env.get_observations(first_observation=True) for env in separate]
+    vector_observations = vector.get_observations(first_observation=True)
+    done = [False] * n_envs
+    kept = []
+    while not all(done):
+        for expected, actual in zip(observations, vector_observations):
+            assert_same_observations(expected, actual, read_only=observation_mode == 'snapshot')
+            # Keep the observations with a copy of their maps, to check at the end that they didn't change
+            kept.extend((o, o.explored.copy()) for o in actual.values())
+        actions = [random_actions(obs, rng) if not env_done else {} for obs, env_done in zip(observations, done)]
+        results = [env.step(env_actions) if not env_done else ({}, 0., True, {})
+                   for env, env_actions, env_done in zip(separate, actions, done)]
+        vector_observations, vector_rewards, vector_done, _ = vector.step(actions)
+        observations = [result[0] for result in results]
+        done = [result[2] for result in results]
+        assert np.allclose([result[1] for result in results], vector_rewards)
+        assert list(vector_done) == done
+
+    for env_id, env in enumerate(separate):
+        assert env.time == vector.time[env_id]
+        assert env.total_rewards_given == vector.total_rewards_given[env_id]
+        for runner_id, runner in enumerate(env.runners):
+            assert np.array_equal(runner.explored, vector.explored[env_id, runner_id])
+            assert runner.alive == vector.alive[env_id, runner_id]
+    assert kept and all(np.array_equal(o.explored, explored) for o, explored in kept)